@@ -1,19 +1,30 @@
 from uuid import UUID
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from ...database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ...database import get_async_db
 from ...models.user import User
 from ...schemas.user import UserRegister, UserRead
-from ...utils.security import get_password_hash, verify_password, create_access_token
-from ...dependencies.auth import get_current_user
+from ...utils.security import create_access_token
+from ...utils.hashing import password_hasher
+from ...dependencies.auth import get_current_user, load_profile_ids_async
 
 router = APIRouter()
 
+async def issue_token(db: AsyncSession, user: User) -> str:
+    profile_ids = await load_profile_ids_async(db, user.id)
+    return create_access_token(
+        subject=user.id,
+        extra={"email": user.email},
+        client_profile_id=profile_ids.client_id,
+        provider_profile_id=profile_ids.provider_id,
+    )
+
 @router.post("/register", response_model=UserRead, status_code=201)
-def register(payload: UserRegister, db: Session = Depends(get_db)):
+async def register(payload: UserRegister, db: AsyncSession = Depends(get_async_db)):
     email = payload.email.strip().lower()
-    existing = db.query(User).filter(User.email == email).first()
+    existing = (await db.execute(select(User.id).where(User.email == email))).first()
     if existing:
         raise HTTPException(status_code=409, detail="Email already exists")
 
@@ -28,37 +39,37 @@ def register(payload: UserRegister, db: Session = Depends(get_db)):
         email=email,
         full_name=payload.full_name.strip(),
         phone=payload.phone,
-        password_hash=get_password_hash(payload.password),
+        password_hash=await password_hasher.hash(payload.password),
         is_client=is_client,
         is_provider=is_provider,
         is_admin=False,
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return user
 
 # OAuth2 password flow (form-encoded): username=email, password=pass
 @router.post("/token")
-def token(form: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def token(form: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
     # username is email in our case
     email = form.username.strip().lower()
-    user = db.query(User).filter(User.email == email).first()
-    if not user or not verify_password(form.password, user.password_hash):
+    user = (await db.execute(select(User).where(User.email == email))).scalar_one_or_none()
+    if not user or not await password_hasher.verify(form.password, user.password_hash):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
 
-    access_token = create_access_token(subject=user.id, extra={"email": user.email})
+    access_token = await issue_token(db, user)
     return {"access_token": access_token, "token_type": "bearer"}
 
 # JSON login (if you want to call from your own form instead of OAuth2)
 @router.post("/login")
-def login(payload: dict, db: Session = Depends(get_db)):
+async def login(payload: dict, db: AsyncSession = Depends(get_async_db)):
     email = str(payload.get("email", "")).strip().lower()
     password = str(payload.get("password", ""))
-    user = db.query(User).filter(User.email == email).first()
-    if not user or not verify_password(password, user.password_hash):
+    user = (await db.execute(select(User).where(User.email == email))).scalar_one_or_none()
+    if not user or not await password_hasher.verify(password, user.password_hash):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
-    access_token = create_access_token(subject=user.id, extra={"email": user.email})
+    access_token = await issue_token(db, user)
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/me", response_model=UserRead)
@@ -1,14 +1,20 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from ...database import get_db
-from ...models.catalog import Category
+from fastapi import APIRouter, Request
+from ...config import settings
+from ...database import AsyncSessionLocal
 from ...schemas.category import CategoryRead
+from ...services.category_tree import category_tree
+from ...utils.http_cache import public_cache
 
 router = APIRouter()
 
 @router.get("/", response_model=list[CategoryRead])
-def list_categories(type: str | None = None, db: Session = Depends(get_db)):
-    q = db.query(Category)
-    if type:
-        q = q.filter(Category.type == type)
-    return q.order_by(Category.type, Category.name).all()
+async def list_categories(request: Request, type: str | None = None):
+    async def produce():
+        # no connection is checked out unless the tree needs loading
+        async with AsyncSessionLocal() as db:
+            tree = await category_tree.get(db)
+        return tree.listing(type), {}
+
+    return await public_cache.respond(
+        request, "categories", produce, settings.CATEGORIES_CACHE_MAX_AGE, settings.CATEGORIES_CACHE_STALE_SECONDS
+    )
@@ -0,0 +1,105 @@
+# app/api/v1/dispatch.py
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Optional, Set
+from uuid import UUID
+
+import numpy as np
+import sqlalchemy as sa
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from ...database import get_async_db
+from ...dependencies.auth import require_provider_profile
+from ...models.geo import Field
+from ...models.inventory import Listing, Machine
+from ...models.profile import ProviderProfile
+from ...models.workflow import Quote, QuoteStatus, RequestStatus, WorkRequest
+from ...schemas.dispatch import DispatchPlan
+from ...services.dispatch import DispatchJob, DispatchMachine, plan
+from ...services.job_duration import job_hours
+from ...utils.geo import point_latlon
+
+router = APIRouter()
+
+
+@router.get("/plan", response_model=DispatchPlan)
+async def dispatch_plan(
+    start: Optional[date] = Query(None, description="First day to plan; defaults to today"),
+    days: int = Query(7, ge=1, le=31),
+    db: AsyncSession = Depends(get_async_db),
+    provider_id: UUID = Depends(require_provider_profile),
+):
+    """Day-by-day routes for your active machines over the requests whose quote you won."""
+    base = (await db.execute(
+        sa.select(ProviderProfile.base_lat, ProviderProfile.base_lon).where(ProviderProfile.id == provider_id)
+    )).first()
+    if base is None or base.base_lat is None or base.base_lon is None:
+        raise HTTPException(status_code=400, detail="Set your base location on your provider profile first")
+
+    machines = (await db.execute(
+        sa.select(Machine.id, Machine.make, Machine.model, Machine.category_id,
+                  Machine.capacity_per_hour, Machine.working_width_m, Machine.power_hp)
+        .where(Machine.provider_id == provider_id, Machine.status == "active")
+    )).all()
+    column = {m.id: k for k, m in enumerate(machines)}
+    by_category: Dict[Optional[UUID], Set[UUID]] = defaultdict(set)
+    for m in machines:
+        by_category[m.category_id].add(m.id)
+
+    # accepted requests with this provider's accepted quote, and the machine the listing offered
+    ListingMachine = aliased(Machine)
+    rows = (await db.execute(
+        sa.select(
+            WorkRequest.id, WorkRequest.desired_date, WorkRequest.time_window,
+            Field.area_ha, Field.centroid, Listing.ref_machine_id, ListingMachine.category_id,
+        )
+        .join(Quote, sa.and_(
+            Quote.request_id == WorkRequest.id, Quote.provider_id == provider_id,
+            Quote.status == QuoteStatus.accepted,
+        ))
+        .join(Field, Field.id == WorkRequest.field_id)
+        .outerjoin(Listing, Listing.id == WorkRequest.listing_id)
+        .outerjoin(ListingMachine, ListingMachine.id == Listing.ref_machine_id)
+        .where(WorkRequest.status == RequestStatus.accepted)
+    )).all()
+
+    # machine x job hours, setup included
+    hours = job_hours(machines, [r.area_ha for r in rows])
+
+    jobs, unlocated = [], []
+    for i, r in enumerate(rows):
+        point = point_latlon(r.centroid)
+        if point is None:
+            unlocated.append({"request_id": r.id, "reason": "Field has no location"})
+            continue
+        # the listing's own machine, or any active machine of the same category
+        eligible = set(by_category.get(r.category_id, ())) if r.category_id is not None else set()
+        if r.ref_machine_id in column:
+            eligible.add(r.ref_machine_id)
+        known = hours[[column[m] for m in eligible] or slice(None), i]
+        known = known[np.isfinite(known)]
+        jobs.append(DispatchJob(
+            request_id=r.id,
+            lat=point[0],
+            lon=point[1],
+            # sized for the slowest machine that may get it, so no plan overruns the day
+            hours=float(known.max()) if known.size else float("nan"),
+            due=r.desired_date.date() if r.desired_date else None,
+            time_window=r.time_window,
+            machine_ids=eligible or None,
+        ))
+
+    result = await run_in_threadpool(
+        plan,
+        (float(base.base_lat), float(base.base_lon)),
+        [DispatchMachine(m.id, f"{m.make} {m.model}") for m in machines],
+        jobs,
+        start or date.today(),
+        days,
+    )
+    result["unassigned"] += unlocated
+    result["totals"]["jobs"] += len(unlocated)
+    return result
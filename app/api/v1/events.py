@@ -0,0 +1,53 @@
+# app/api/v1/events.py
+import asyncio
+
+from fastapi import APIRouter, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+
+from ...config import settings
+from ...dependencies.auth import AuthError, get_token_claims, resolve_profile_ids
+from ...utils.events import RESYNC, event_broker, scopes_for, sse_message
+
+router = APIRouter()
+
+
+@router.get("/stream")
+async def event_stream(
+    request: Request,
+    token: str = Query(..., description="Access token; EventSource cannot send an Authorization header"),
+):
+    """Server-Sent Events for the caller's requests (as client) and listings (as provider).
+
+    Event types: request.created, request.matched, quote.created, quote.withdrawn,
+    quote.accepted, and resync when events may have been missed and the page
+    should refetch.
+    """
+    # resolved once, off the request-scoped session, which would otherwise be held for the whole stream
+    ids = await run_in_threadpool(resolve_profile_ids, get_token_claims(token))
+    scopes = scopes_for(ids.client_id, ids.provider_id)
+    if not scopes:
+        raise AuthError(code=403, detail="No client or provider profile")
+
+    sub = event_broker.subscribe(scopes)
+
+    async def messages():
+        try:
+            yield f"retry: {int(settings.EVENTS_RETRY_MS)}\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(sub.queue.get(), timeout=settings.EVENTS_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"  # also how a dropped client is noticed
+                    continue
+                if event["type"] == RESYNC:
+                    sub.lagging = False
+                yield sse_message(event)
+        finally:
+            event_broker.unsubscribe(sub)
+
+    return StreamingResponse(
+        messages(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"},
+    )
@@ -1,53 +1,200 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+import uuid
+from typing import Any, Dict, List, Literal, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+import sqlalchemy as sa
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, defer, undefer
 from uuid import UUID
-from ...database import get_db
-from ...dependencies.auth import require_client
-from ...models.user import User
-from ...models.profile import ClientProfile
+from ...config import settings
+from ...database import get_db, get_async_db
+from ...dependencies.auth import require_client_profile, require_admin
 from ...models.geo import Field
-from ...schemas.field import FieldCreate, FieldUpdate, FieldRead
+from ...models.user import User
+from ...schemas.field import FieldCreate, FieldUpdate, FieldRead, FieldImportReport, FieldImportResult
+from ...utils.geojson_stream import StreamFormatError, iter_features
+from ...utils.geometry import GeometryError, compute_field_geometry, simplified_variants
+from ...utils.serialization import FastJSONResponse, orm_json, schema_fields
 
 router = APIRouter()
 
-def get_client_profile(db: Session, user_id: UUID) -> ClientProfile:
-    prof = db.query(ClientProfile).filter(ClientProfile.user_id == user_id).first()
-    if not prof:
-        raise HTTPException(status_code=403, detail="Client profile required")
-    return prof
+def recompute_field_geometries(db: Session, batch_size: int = 500) -> Dict[str, Any]:
+    """Recompute area/centroid/bbox of every stored field, one keyset batch at a time."""
+    updated, invalid = 0, []
+    last_id = None
+    while True:
+        stmt = sa.select(Field.id, Field.geojson).order_by(Field.id).limit(batch_size)
+        if last_id is not None:
+            stmt = stmt.where(Field.id > last_id)
+        rows = db.execute(stmt).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        changes = []
+        for row in rows:
+            try:
+                g = compute_field_geometry(row.geojson)
+            except GeometryError as e:
+                invalid.append({"id": str(row.id), "error": str(e)})
+                continue
+            changes.append({
+                "id": row.id, "area_ha": g.area_ha, "centroid": g.centroid, "bbox": g.bbox,
+                "geometry_variants": simplified_variants(row.geojson),
+            })
+        if changes:
+            db.execute(sa.update(Field), changes)  # executemany UPDATE by primary key
+            db.commit()
+            updated += len(changes)
+    return {"updated": updated, "invalid": invalid}
+
+FIELD_FIELDS = schema_fields(FieldRead)
+
+def field_read(f: Field, geojson: Any = None) -> Dict[str, Any]:
+    # built by hand so deferred geometry columns are not loaded behind our back
+    return {"id": f.id, "client_id": f.client_id, "name": f.name, "geojson": geojson,
+            "area_ha": f.area_ha, "centroid": f.centroid, "bbox": f.bbox}
 
 @router.get("/", response_model=list[FieldRead])
-def list_fields(db: Session = Depends(get_db), current: User = Depends(require_client)):
-    prof = get_client_profile(db, current.id)
-    return (
-        db.query(Field)
-        .filter(Field.client_id == prof.id)
-        .order_by(Field.created_at.desc())
-        .all()
-    )
+def list_fields(
+    geometry: Literal["none", "simplified", "full"] = Query("full", description="How much boundary to return"),
+    detail: Literal["high", "medium", "low"] = Query("medium", description="Simplification level for geometry=simplified"),
+    db: Session = Depends(get_db),
+    client_id: UUID = Depends(require_client_profile),
+):
+    q = db.query(Field).filter(Field.client_id == client_id).order_by(Field.created_at.desc())
+    if geometry == "full":
+        return orm_json(q.all(), FIELD_FIELDS)
+    if geometry == "none":
+        return FastJSONResponse([field_read(f) for f in q.options(defer(Field.geojson)).all()])
+
+    out = []
+    for f in q.options(defer(Field.geojson), undefer(Field.geometry_variants)).all():
+        variant = (f.geometry_variants or {}).get(detail)
+        # rows saved before variants existed fall back to the full boundary
+        geojson = {"type": "Feature", "properties": {}, "geometry": variant} if variant else f.geojson
+        out.append(field_read(f, geojson))
+    return FastJSONResponse(out)
 
 @router.post("/", response_model=FieldRead, status_code=201)
-def create_field(payload: FieldCreate, db: Session = Depends(get_db), current: User = Depends(require_client)):
-    prof = get_client_profile(db, current.id)
-    # Minimal validation: ensure a geometry exists
-    geom = payload.geojson.get("geometry") if isinstance(payload.geojson, dict) else None
-    if not geom:
-        raise HTTPException(status_code=400, detail="geojson.geometry is required")
+def create_field(payload: FieldCreate, db: Session = Depends(get_db), client_id: UUID = Depends(require_client_profile)):
+    # Area, centroid and bbox come from the boundary itself, not from the browser
+    try:
+        g = compute_field_geometry(payload.geojson)
+    except GeometryError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid field geometry: {e}")
 
     f = Field(
-        client_id=prof.id,
+        client_id=client_id,
         name=payload.name,
         geojson=payload.geojson,
-        area_ha=payload.area_ha,
-        centroid=payload.centroid
+        area_ha=g.area_ha,
+        centroid=g.centroid,
+        bbox=g.bbox,
+        geometry_variants=simplified_variants(payload.geojson),
     )
     db.add(f); db.commit(); db.refresh(f)
     return f
 
+def _feature_name(feature: Dict[str, Any], index: int) -> str:
+    props = feature.get("properties") or {}
+    for key in ("name", "Name", "NAME", "title"):
+        value = props.get(key) if isinstance(props, dict) else None
+        if value not in (None, ""):
+            return str(value)[:200]
+    return f"Field {index + 1}"
+
+def _prepare_import_batch(
+    client_id: UUID, batch: List[Tuple[int, Any]]
+) -> Tuple[List[Dict[str, Any]], List[FieldImportResult]]:
+    """Validate a batch of uploaded features; returns insert rows and one result per feature."""
+    rows, results = [], []
+    for index, feature in batch:
+        if isinstance(feature, Exception):
+            results.append(FieldImportResult(index=index, ok=False, error=f"Invalid feature: {feature}"))
+            continue
+        name = _feature_name(feature, index)
+        try:
+            g = compute_field_geometry(feature)
+            variants = simplified_variants(feature)
+        except GeometryError as e:
+            results.append(FieldImportResult(index=index, ok=False, name=name, error=f"Invalid field geometry: {e}"))
+            continue
+        row = {
+            "id": uuid.uuid4(), "client_id": client_id, "name": name, "geojson": feature,
+            "area_ha": g.area_ha, "centroid": g.centroid, "bbox": g.bbox, "geometry_variants": variants,
+        }
+        rows.append(row)
+        results.append(FieldImportResult(index=index, ok=True, id=row["id"], name=name, area_ha=g.area_ha))
+    return rows, results
+
+@router.post("/import", response_model=FieldImportReport)
+async def import_fields(
+    request: Request,
+    format: Optional[Literal["featurecollection", "ndjson"]] = Query(
+        None, description="Defaults to NDJSON for application/x-ndjson or application/geo+json-seq bodies"
+    ),
+    db: AsyncSession = Depends(get_async_db),
+    client_id: UUID = Depends(require_client_profile),
+):
+    """Import many fields from one FeatureCollection or newline-delimited Features.
+
+    The body is parsed as it arrives. Each feature is validated on its own and
+    valid ones are inserted in multi-row batches, so one bad parcel does not
+    reject the whole upload.
+    """
+    if format is None:
+        content_type = request.headers.get("content-type", "")
+        ndjson = "ndjson" in content_type or "json-seq" in content_type
+    else:
+        ndjson = format == "ndjson"
+
+    results: List[FieldImportResult] = []
+    batch: List[Tuple[int, Any]] = []
+
+    async def flush() -> None:
+        rows, batch_results = await run_in_threadpool(_prepare_import_batch, client_id, list(batch))
+        batch.clear()
+        if rows:
+            try:
+                await db.execute(sa.insert(Field), rows)  # one multi-row INSERT per batch
+                await db.commit()
+            except SQLAlchemyError:
+                await db.rollback()
+                for r in batch_results:
+                    if r.ok:
+                        r.ok, r.id, r.area_ha, r.error = False, None, None, "Could not be saved"
+        results.extend(batch_results)
+
+    seen = 0
+    try:
+        async for index, feature in iter_features(request.stream(), ndjson, settings.FIELD_IMPORT_MAX_FEATURE_BYTES):
+            if index >= settings.FIELD_IMPORT_MAX_FEATURES:
+                results.append(FieldImportResult(
+                    index=index, ok=False,
+                    error=f"Import limit of {settings.FIELD_IMPORT_MAX_FEATURES} features reached; the rest was not read",
+                ))
+                break
+            seen = index + 1
+            batch.append((index, feature))
+            if len(batch) >= settings.FIELD_IMPORT_BATCH_SIZE:
+                await flush()
+    except StreamFormatError as e:
+        if not seen:
+            raise HTTPException(status_code=400, detail=f"Unreadable upload: {e}")
+        if batch:
+            await flush()
+        results.append(FieldImportResult(index=seen, ok=False, error=f"Upload stopped: {e}"))
+    if batch:
+        await flush()
+
+    imported = sum(1 for r in results if r.ok)
+    return FieldImportReport(imported=imported, failed=len(results) - imported, results=results)
+
 @router.put("/{field_id}", response_model=FieldRead)
-def update_field(field_id: UUID, payload: FieldUpdate, db: Session = Depends(get_db), current: User = Depends(require_client)):
-    prof = get_client_profile(db, current.id)
-    f = db.query(Field).filter(Field.id == field_id, Field.client_id == prof.id).first()
+def update_field(field_id: UUID, payload: FieldUpdate, db: Session = Depends(get_db), client_id: UUID = Depends(require_client_profile)):
+    f = db.query(Field).filter(Field.id == field_id, Field.client_id == client_id).first()
     if not f:
         raise HTTPException(status_code=404, detail="Field not found")
     for k, v in payload.model_dump(exclude_unset=True).items():
@@ -56,9 +203,16 @@ def update_field(field_id: UUID, payload: FieldUpdate, db: Session = Depends(get
     return f
 
 @router.delete("/{field_id}", status_code=204)
-def delete_field(field_id: UUID, db: Session = Depends(get_db), current: User = Depends(require_client)):
-    prof = get_client_profile(db, current.id)
-    f = db.query(Field).filter(Field.id == field_id, Field.client_id == prof.id).first()
+def delete_field(field_id: UUID, db: Session = Depends(get_db), client_id: UUID = Depends(require_client_profile)):
+    f = db.query(Field).filter(Field.id == field_id, Field.client_id == client_id).first()
     if not f:
         raise HTTPException(status_code=404, detail="Field not found")
     db.delete(f); db.commit()
+
+@router.post("/recompute-geometry")
+def recompute_geometry(
+    batch_size: int = Query(500, ge=1, le=5000),
+    db: Session = Depends(get_db),
+    _: User = Depends(require_admin),
+):
+    return recompute_field_geometries(db, batch_size)
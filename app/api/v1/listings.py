@@ -1,19 +1,34 @@
 # app/api/v1/listings.py
 from __future__ import annotations
 
-from typing import List, Optional, Dict, Any
+import re
+from typing import List, Optional, Dict, Any, Tuple
 from uuid import UUID
 
 import sqlalchemy as sa
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from pydantic import BaseModel, Field, field_validator
-from sqlalchemy.orm import Session
-
-from ...database import get_db
-from ...dependencies.auth import require_provider
-from ...models.user import User
-from ...models.profile import ProviderProfile
-from ...models.inventory import Listing, PricingRule  # PricingRule has listing_id FK
+from sqlalchemy.dialects.postgresql import REGCONFIG, UUID as PGUUID
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, aliased
+
+from ...config import settings
+from ...database import AsyncSessionLocal, get_db, get_async_db
+from ...dependencies.auth import require_provider_profile, get_optional_token_claims
+from ...models.geo import Field as GeoField
+from ...models.catalog import Service
+from ...models.inventory import Listing, Machine
+from ...models.profile import ClientProfile
+from ...services.pricing import (
+    announce_pricing_change, estimate as estimate_prices, field_target, load_listing_pricing, pricing_cache,
+)
+from ...services.category_tree import category_tree
+from ...services.provider_index import provider_locator
+from ...utils import http_cache
+from ...utils.geo import point_latlon
+from ...utils.http_cache import public_cache
+from ...utils.pagination import decode_cursor, next_cursor
+from ...utils.serialization import FastJSONResponse
 
 router = APIRouter()
 
@@ -77,11 +92,25 @@ class ListingUpdate(BaseModel):
 
 
 # ---------------------------- Helpers -----------------------------------
-def get_provider_profile(db: Session, user_id: UUID) -> ProviderProfile:
-    prof = db.query(ProviderProfile).filter(ProviderProfile.user_id == user_id).first()
-    if not prof:
-        raise HTTPException(status_code=403, detail="Provider profile required")
-    return prof
+_SEARCH_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def search_tsquery(q: str) -> Optional[sa.ColumnElement]:
+    """Prefix-matching tsquery for free text, e.g. "john dee" -> 'john:* & dee:*'.
+
+    Only word characters reach to_tsquery, so user input cannot break its syntax.
+    """
+    tokens = _SEARCH_TOKEN.findall(q.lower())[:8]
+    if not tokens:
+        return None
+    expr = " & ".join(f"{t}:*" for t in tokens)
+    return sa.func.to_tsquery(sa.cast(settings.SEARCH_TEXT_CONFIG, REGCONFIG), expr)
+
+
+LISTING_BASE_COLUMNS = (
+    Listing.id, Listing.title, Listing.description, Listing.status, Listing.type,
+    Listing.ref_machine_id, Listing.ref_service_id, Listing.created_at, Listing.updated_at,
+)
 
 
 def shape_listing_base(l: Listing) -> Dict[str, Any]:
@@ -98,154 +127,263 @@ def shape_listing_base(l: Listing) -> Dict[str, Any]:
     }
 
 
-def shape_price(p: PricingRule) -> Dict[str, Any]:
-    return {
-        "id": str(p.id),
-        "listing_id": str(p.listing_id),
-        "unit": p.unit,
-        "base_price": float(p.base_price) if p.base_price is not None else None,
-        "min_qty": p.min_qty,
-        "transport_flat_fee": p.transport_flat_fee,
-        "transport_per_km": p.transport_per_km,
-        "currency": p.currency or "EUR",
-        "surcharges": p.surcharges,
-    }
-
-
-def prices_summary_text(prices: List[Dict[str, Any]]) -> str:
-    if not prices:
-        return "Ask for a quote"
-    parts: List[str] = []
-    for p in sorted(prices, key=lambda x: (x.get("unit") or "", x.get("base_price") or 0))[:3]:
-        bp = p.get("base_price")
-        cur = p.get("currency", "EUR")
-        unit = p.get("unit") or ""
-        seg = []
-        if bp is not None and unit:
-            text = f"{bp:g} {cur} / {unit}"
-            if p.get("min_qty") not in (None, 0):
-                text += f" (min {p['min_qty']})"
-            seg.append(text)
-        tf = p.get("transport_flat_fee")
-        tkm = p.get("transport_per_km")
-        if tf is not None or tkm is not None:
-            tparts = []
-            if tf is not None:
-                tparts.append(f"flat {tf:g} {cur}")
-            if tkm is not None:
-                tparts.append(f"{tkm:g} {cur}/km")
-            seg.append("transport: " + " + ".join(tparts))
-        if seg:
-            parts.append(" · ".join(seg))
-    return " · ".join(parts) if parts else "Ask for a quote"
-
-
 # --------------------------- PUBLIC (Marketplace) ------------------------
-@router.get("/public")
-def public_listings(
-    db: Session = Depends(get_db),
-    q: Optional[str] = Query(None, description="Search in title/description"),
-    include_pricing: bool = Query(True, description="Attach pricing rules"),
-    limit: int = Query(50, ge=1, le=200),
-    offset: int = Query(0, ge=0),
-    exclude_provider_id: Optional[UUID] = Query(None, description="Exclude listings from this provider id"),
+async def load_own_field(db: AsyncSession, claims: Optional[Dict[str, Any]], field_id: UUID, purpose: str):
+    """(area_ha, centroid) of one of the caller's fields."""
+    if not claims:
+        raise HTTPException(status_code=401, detail=f"Sign in to {purpose}")
+    row = (
+        await db.execute(
+            sa.select(GeoField.area_ha, GeoField.centroid)
+            .join(ClientProfile, ClientProfile.id == GeoField.client_id)
+            .where(GeoField.id == field_id, ClientProfile.user_id == UUID(str(claims["sub"])))
+        )
+    ).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Field not found")
+    return row
+
+
+async def resolve_near_point(
+    db: AsyncSession,
+    claims: Optional[Dict[str, Any]],
+    field_id: Optional[UUID],
+    lat: Optional[float],
+    lon: Optional[float],
+) -> Optional[Tuple[float, float]]:
+    """(lat, lon) for near-field mode: the centroid of one of the caller's fields, or explicit coordinates."""
+    if field_id is not None:
+        field = await load_own_field(db, claims, field_id, "search near a field")
+        point = point_latlon(field.centroid)
+        if point is None:
+            raise HTTPException(status_code=404, detail="Field not found or has no centroid")
+        return point
+    if lat is not None and lon is not None:
+        return lat, lon
+    if lat is not None or lon is not None:
+        raise HTTPException(status_code=400, detail="lat and lon must be given together")
+    return None
+
+
+def listing_category_condition(category_ids: List[UUID]):
+    """Listings whose machine or service is in one of `category_ids`, as a single `id IN (...)`.
+
+    Listings have no category column, so the ids are the UNION of listings on a
+    matching machine and on a matching service, each found through its ref index.
+    """
+    lst = aliased(Listing)  # not correlated with the outer Listing
+    by_machine = (
+        sa.select(lst.id).join(Machine, Machine.id == lst.ref_machine_id).where(Machine.category_id.in_(category_ids))
+    )
+    by_service = (
+        sa.select(lst.id).join(Service, Service.id == lst.ref_service_id).where(Service.category_id.in_(category_ids))
+    )
+    return Listing.id.in_(sa.union_all(by_machine, by_service))
+
+
+async def query_public_listings(
+    db: AsyncSession,
+    claims: Optional[Dict[str, Any]],
+    headers: Dict[str, str],
+    q: Optional[str],
+    include_pricing: bool,
+    limit: int,
+    offset: int,
+    cursor: Optional[str],
+    exclude_provider_id: Optional[UUID],
+    field_id: Optional[UUID],
+    lat: Optional[float],
+    lon: Optional[float],
+    estimate_field_id: Optional[UUID],
+    category_id: Optional[UUID],
+    include_descendants: bool,
 ) -> List[Dict[str, Any]]:
-    order_col = getattr(Listing, "created_at", Listing.id)
-    conditions = [sa.or_(Listing.status == "active", Listing.status.is_(None))]
+    """Marketplace page; response headers (X-Next-Cursor) are added to `headers`."""
+    # status is NOT NULL, so a plain equality lets PG use the partial feed index
+    conditions = [Listing.status == "active"]
     if exclude_provider_id:
         conditions.append(Listing.provider_id != exclude_provider_id)
-
-    stmt = (
-        sa.select(Listing)
-        .where(*conditions)
-        .order_by(sa.desc(order_col))
-        .limit(limit)
-        .offset(offset)
-    )
-
-    if q:
-        like = f"%{q.lower()}%"
-        stmt = stmt.where(
-            sa.or_(
-                sa.func.lower(Listing.title).like(like),
-                sa.func.lower(Listing.description).like(like),
+    if category_id is not None:
+        tree = await category_tree.get(db)
+        conditions.append(listing_category_condition(tree.resolve(category_id, include_descendants)))
+    tsquery = search_tsquery(q) if q else None
+    if tsquery is not None:
+        conditions.append(Listing.search_vector.bool_op("@@")(tsquery))
+
+    point = await resolve_near_point(db, claims, field_id, lat, lon)
+    distances: Dict[UUID, float] = {}
+
+    if point is not None:
+        # Near-field: providers whose radius covers the point, nearest first; pages by offset
+        index = await provider_locator.get(db)
+        reach = index.reachable(*point)
+        if not reach:
+            return []
+        # distances travel as a VALUES list, so PG filters, orders and pages; only one page is loaded
+        near = sa.values(
+            sa.column("provider_id", PGUUID(as_uuid=True)), sa.column("distance_km", sa.Float), name="near"
+        ).data(list(reach.items()))
+        stmt = (
+            sa.select(Listing, near.c.distance_km)
+            .join(near, near.c.provider_id == Listing.provider_id)
+            .where(
+                *conditions,
+                sa.or_(Listing.max_distance_km.is_(None), near.c.distance_km <= Listing.max_distance_km),
             )
+            .order_by(near.c.distance_km, Listing.created_at.desc(), Listing.id.desc())
+            .limit(limit)
+            .offset(offset)
+        )
+        page = (await db.execute(stmt)).all()
+        rows: List[Listing] = [l for l, _ in page]
+        distances = {l.id: round(d, 2) for l, d in page}
+    elif tsquery is not None:
+        # Relevance-ordered search over the GIN-indexed search_vector; pages by offset
+        rank = sa.func.ts_rank_cd(Listing.search_vector, tsquery)
+        stmt = (
+            sa.select(Listing)
+            .where(*conditions)
+            .order_by(rank.desc(), Listing.created_at.desc(), Listing.id.desc())
+            .limit(limit)
+            .offset(offset)
         )
+        rows = (await db.execute(stmt)).scalars().all()
+    else:
+        if cursor:
+            conditions.append(sa.tuple_(Listing.created_at, Listing.id) < decode_cursor(cursor))
+        stmt = (
+            sa.select(Listing)
+            .where(*conditions)
+            .order_by(Listing.created_at.desc(), Listing.id.desc())
+            .limit(limit)
+        )
+        if not cursor:
+            stmt = stmt.offset(offset)
+        rows = (await db.execute(stmt)).scalars().all()
+        cursor_out = next_cursor(rows, limit)
+        if cursor_out:
+            headers["X-Next-Cursor"] = cursor_out
 
-    rows: List[Listing] = db.execute(stmt).scalars().all()
     shaped = [shape_listing_base(r) for r in rows]
+    if distances:
+        for item, r in zip(shaped, rows):
+            item["distance_km"] = distances[r.id]
 
-    if not include_pricing or not rows:
+    if not rows:
         return shaped
-
     listing_ids = [r.id for r in rows]
-    by_listing: Dict[UUID, List[Dict[str, Any]]] = {}
-    if listing_ids:
-        rules = (
-            db.query(PricingRule)
-            .filter(PricingRule.listing_id.in_(listing_ids))
-            .all()
+
+    if estimate_field_id is not None:
+        field = await load_own_field(db, claims, estimate_field_id, "estimate prices for a field")
+        estimates = estimate_prices(
+            await load_listing_pricing(db, listing_ids), field_target(field.area_ha, field.centroid)
         )
-        for p in rules:
-            by_listing.setdefault(p.listing_id, []).append(shape_price(p))
+        for item, lid in zip(shaped, listing_ids):
+            item["estimate"] = estimates.get(lid)
 
-    for item in shaped:
-        lid = UUID(item["id"])
-        prices = by_listing.get(lid, [])
-        item["pricing"] = prices
-        item["prices_text"] = prices_summary_text(prices)
+    if not include_pricing:
+        return shaped
+
+    compiled = await pricing_cache.get_many(db, listing_ids)
+    for item, lid in zip(shaped, listing_ids):
+        item["pricing"] = compiled[lid].prices
+        item["prices_text"] = compiled[lid].summary
 
     return shaped
 
 
-@router.get("/public/{listing_id}")
-def public_get_one(
-    listing_id: UUID,
-    db: Session = Depends(get_db),
-    include_pricing: bool = Query(True),
-) -> Dict[str, Any]:
-    l = db.get(Listing, listing_id)
+@router.get("/public")
+async def public_listings(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    claims: Optional[Dict[str, Any]] = Depends(get_optional_token_claims),
+    q: Optional[str] = Query(None, description="Search in title/description"),
+    include_pricing: bool = Query(True, description="Attach pricing rules"),
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Keyset cursor from the X-Next-Cursor header (replaces offset; ignored with q)"),
+    exclude_provider_id: Optional[UUID] = Query(None, description="Exclude listings from this provider id"),
+    field_id: Optional[UUID] = Query(None, description="Near-field mode: only listings that reach this field of yours"),
+    lat: Optional[float] = Query(None, ge=-90, le=90, description="Near-field mode by coordinates (with lon)"),
+    lon: Optional[float] = Query(None, ge=-180, le=180),
+    estimate_field_id: Optional[UUID] = Query(None, description="Attach a price estimate for this field of yours to each listing"),
+    category_id: Optional[UUID] = Query(None, description="Only listings whose machine or service is in this category"),
+    include_descendants: bool = Query(False, description="With category_id: include its subcategories"),
+) -> List[Dict[str, Any]]:
+    params = dict(
+        q=q, include_pricing=include_pricing, limit=limit, offset=offset, cursor=cursor,
+        exclude_provider_id=exclude_provider_id, field_id=field_id, lat=lat, lon=lon,
+        estimate_field_id=estimate_field_id, category_id=category_id, include_descendants=include_descendants,
+    )
+    if field_id is not None or estimate_field_id is not None:
+        # depends on the caller's own fields: computed per request, never shared
+        headers: Dict[str, str] = {"Cache-Control": "private, no-store"}
+        items = await query_public_listings(db, claims, headers, **params)
+        response.headers.update(headers)
+        return items
+
+    async def produce():
+        headers: Dict[str, str] = {}
+        async with AsyncSessionLocal() as own_db:  # may outlive this request (background refresh)
+            items = await query_public_listings(own_db, None, headers, **params)
+        return items, headers
+
+    return await public_cache.respond(
+        request, "listings", produce, settings.LISTINGS_CACHE_MAX_AGE, settings.LISTINGS_CACHE_STALE_SECONDS
+    )
+
+
+async def query_public_listing(db: AsyncSession, listing_id: UUID, include_pricing: bool) -> Dict[str, Any]:
+    l = await db.get(Listing, listing_id)
     if not l or (l.status not in (None, "active")):
         raise HTTPException(status_code=404, detail="Listing not found")
     shaped = shape_listing_base(l)
 
     if include_pricing:
-        prices = [
-            shape_price(p) for p in db.query(PricingRule)
-            .filter(PricingRule.listing_id == listing_id)
-            .all()
-        ]
-        shaped["pricing"] = prices
-        shaped["prices_text"] = prices_summary_text(prices)
+        compiled = (await pricing_cache.get_many(db, [listing_id]))[listing_id]
+        shaped["pricing"] = compiled.prices
+        shaped["prices_text"] = compiled.summary
 
     return shaped
 
 
+@router.get("/public/{listing_id}")
+async def public_get_one(
+    request: Request,
+    listing_id: UUID,
+    include_pricing: bool = Query(True),
+) -> Dict[str, Any]:
+    async def produce():
+        async with AsyncSessionLocal() as db:
+            return await query_public_listing(db, listing_id, include_pricing), {}
+
+    return await public_cache.respond(
+        request, "listings", produce, settings.LISTINGS_CACHE_MAX_AGE, settings.LISTINGS_CACHE_STALE_SECONDS
+    )
+
+
 # --------------------------- PROVIDER CRUD -------------------------------
 @router.get("/", response_model=List[Dict[str, Any]])
 def my_listings(
     db: Session = Depends(get_db),
-    current: User = Depends(require_provider),
+    provider_id: UUID = Depends(require_provider_profile),
 ) -> List[Dict[str, Any]]:
-    prof = get_provider_profile(db, current.id)
-    order_col = getattr(Listing, "created_at", Listing.id)
-    rows = (
-        db.query(Listing)
-        .filter(Listing.provider_id == prof.id)
-        .order_by(sa.desc(order_col))
-        .all()
-    )
-    return [shape_listing_base(r) for r in rows]
+    # plain column rows: no ORM identity map, and shape_listing_base reads them by attribute
+    rows = db.execute(
+        sa.select(*LISTING_BASE_COLUMNS)
+        .where(Listing.provider_id == provider_id)
+        .order_by(Listing.created_at.desc())
+    ).all()
+    return FastJSONResponse([shape_listing_base(r) for r in rows])
 
 
 @router.post("/", response_model=Dict[str, Any], status_code=201)
 def create_listing(
     payload: ListingCreate,
     db: Session = Depends(get_db),
-    current: User = Depends(require_provider),
+    provider_id: UUID = Depends(require_provider_profile),
 ) -> Dict[str, Any]:
-    prof = get_provider_profile(db, current.id)
-
     # Infer type if not provided
     inferred_type = payload.type
     if inferred_type is None:
@@ -254,7 +392,7 @@ def create_listing(
         raise HTTPException(status_code=400, detail="Invalid listing type")
 
     l = Listing(
-        provider_id=prof.id,
+        provider_id=provider_id,
         title=payload.title,
         description=payload.description,
         ref_machine_id=payload.ref_machine_id,
@@ -263,26 +401,27 @@ def create_listing(
         type=inferred_type,  # NOT NULL in DB
     )
     db.add(l)
+    http_cache.announce(db, "listings")
     db.commit()
+    public_cache.bump("listings")
     db.refresh(l)
-    return shape_listing_base(l)
+    return FastJSONResponse(shape_listing_base(l), status_code=201)
 
 
 @router.get("/{listing_id}", response_model=Dict[str, Any])
 def get_my_listing(
     listing_id: UUID,
     db: Session = Depends(get_db),
-    current: User = Depends(require_provider),
+    provider_id: UUID = Depends(require_provider_profile),
 ) -> Dict[str, Any]:
-    prof = get_provider_profile(db, current.id)
     l = (
         db.query(Listing)
-        .filter(Listing.id == listing_id, Listing.provider_id == prof.id)
+        .filter(Listing.id == listing_id, Listing.provider_id == provider_id)
         .first()
     )
     if not l:
         raise HTTPException(status_code=404, detail="Listing not found")
-    return shape_listing_base(l)
+    return FastJSONResponse(shape_listing_base(l))
 
 
 @router.put("/{listing_id}", response_model=Dict[str, Any])
@@ -290,12 +429,11 @@ def update_listing(
     listing_id: UUID,
     payload: ListingUpdate,
     db: Session = Depends(get_db),
-    current: User = Depends(require_provider),
+    provider_id: UUID = Depends(require_provider_profile),
 ) -> Dict[str, Any]:
-    prof = get_provider_profile(db, current.id)
     l = (
         db.query(Listing)
-        .filter(Listing.id == listing_id, Listing.provider_id == prof.id)
+        .filter(Listing.id == listing_id, Listing.provider_id == provider_id)
         .first()
     )
     if not l:
@@ -314,24 +452,29 @@ def update_listing(
         raise HTTPException(status_code=400, detail="Invalid listing type")
 
     db.add(l)
+    http_cache.announce(db, "listings")
     db.commit()
+    public_cache.bump("listings")
     db.refresh(l)
-    return shape_listing_base(l)
+    return FastJSONResponse(shape_listing_base(l))
 
 
 @router.delete("/{listing_id}", status_code=204)
 def delete_listing(
     listing_id: UUID,
     db: Session = Depends(get_db),
-    current: User = Depends(require_provider),
+    provider_id: UUID = Depends(require_provider_profile),
 ):
-    prof = get_provider_profile(db, current.id)
     l = (
         db.query(Listing)
-        .filter(Listing.id == listing_id, Listing.provider_id == prof.id)
+        .filter(Listing.id == listing_id, Listing.provider_id == provider_id)
         .first()
     )
     if not l:
         raise HTTPException(status_code=404, detail="Listing not found")
     db.delete(l)
+    announce_pricing_change(db, listing_id)
+    http_cache.announce(db, "listings")
     db.commit()
+    pricing_cache.invalidate([listing_id])
+    public_cache.bump("listings")
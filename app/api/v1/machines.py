@@ -1,47 +1,107 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+import numpy as np
+import sqlalchemy as sa
 from sqlalchemy.orm import Session
 from uuid import UUID
 from ...database import get_db
+from ...models.geo import Field
 from ...models.inventory import Machine
-from ...models.profile import ProviderProfile
-from ...schemas.machine import MachineCreate, MachineUpdate, MachineRead
-from ...dependencies.auth import require_provider
-from ...models.user import User
+from ...models.workflow import RequestStatus, WorkRequest
+from ...schemas.machine import MachineCreate, MachineUpdate, MachineRead, JobHoursMatrix
+from ...dependencies.auth import ProfileIds, require_provider_profile
+from ...services.category_tree import category_tree
+from ...services.job_duration import job_hours, nominal_rate
+from ...services.request_access import visible_requests
+from ...utils.serialization import FastJSONResponse, orm_json, schema_fields
 
 router = APIRouter()
 
-def get_provider_profile(db: Session, user_id: UUID) -> ProviderProfile:
-    prof = db.query(ProviderProfile).filter(ProviderProfile.user_id == user_id).first()
-    if not prof:
-        raise HTTPException(status_code=403, detail="Provider profile required")
-    return prof
+MACHINE_FIELDS = schema_fields(MachineRead)
+MAX_ESTIMATE_REQUESTS = 500
 
 @router.get("/", response_model=list[MachineRead])
-def list_my_machines(db: Session = Depends(get_db), current: User = Depends(require_provider)):
-    prof = get_provider_profile(db, current.id)
-    return db.query(Machine).filter(Machine.provider_id == prof.id).all()
+def list_my_machines(
+    category_id: Optional[UUID] = Query(None, description="Only machines in this category"),
+    include_descendants: bool = Query(False, description="With category_id: include its subcategories"),
+    db: Session = Depends(get_db),
+    provider_id: UUID = Depends(require_provider_profile),
+):
+    query = db.query(Machine).filter(Machine.provider_id == provider_id)
+    if category_id is not None:
+        tree = category_tree.get_sync(db)
+        query = query.filter(Machine.category_id.in_(tree.resolve(category_id, include_descendants)))
+    return orm_json(query.all(), MACHINE_FIELDS)
+
+@router.get("/job-hours", response_model=JobHoursMatrix)
+def estimate_job_hours(
+    request_id: Optional[List[UUID]] = Query(
+        None, description="Requests to estimate; defaults to open and quoted requests on your listings or matched to you"
+    ),
+    machine_id: Optional[List[UUID]] = Query(None, description="Machines to estimate for; defaults to your active machines"),
+    db: Session = Depends(get_db),
+    provider_id: UUID = Depends(require_provider_profile),
+):
+    """Hours each of your machines would need for each request's field, in one matrix.
+
+    Requests you cannot see are left out rather than failing the call.
+    """
+    mq = sa.select(
+        Machine.id, Machine.capacity_per_hour, Machine.working_width_m, Machine.power_hp
+    ).where(Machine.provider_id == provider_id)
+    if machine_id:
+        mq = mq.where(Machine.id.in_(machine_id))
+    else:
+        mq = mq.where(Machine.status == "active")
+    machines = db.execute(mq.order_by(Machine.make, Machine.model, Machine.id)).all()
+
+    visible = visible_requests(ProfileIds(provider_id=provider_id))
+    rq = sa.select(WorkRequest.id, Field.area_ha).join(Field, Field.id == WorkRequest.field_id).where(visible)
+    if request_id:
+        wanted = list(dict.fromkeys(request_id))
+        if len(wanted) > MAX_ESTIMATE_REQUESTS:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_ESTIMATE_REQUESTS} request ids per call")
+        rq = rq.where(WorkRequest.id.in_(wanted))
+    else:
+        rq = (
+            rq.where(WorkRequest.status.in_([RequestStatus.open, RequestStatus.quoted]))
+            .order_by(WorkRequest.created_at.desc())
+            .limit(MAX_ESTIMATE_REQUESTS)
+        )
+    requests = db.execute(rq).all()
+
+    areas = [r.area_ha for r in requests]
+    rates = nominal_rate(
+        [m.capacity_per_hour for m in machines],
+        [m.working_width_m for m in machines],
+        [m.power_hp for m in machines],
+    )
+    return FastJSONResponse({
+        "machine_ids": [m.id for m in machines],
+        "request_ids": [r.id for r in requests],
+        "area_ha": areas,
+        "rate_ha_per_hour": np.round(rates, 2),
+        "hours": np.round(job_hours(machines, areas), 2),
+    })
 
 @router.post("/", response_model=MachineRead, status_code=201)
-def create_machine(payload: MachineCreate, db: Session = Depends(get_db), current: User = Depends(require_provider)):
-    prof = get_provider_profile(db, current.id)
-    m = Machine(provider_id=prof.id, **payload.model_dump(exclude_unset=True))
+def create_machine(payload: MachineCreate, db: Session = Depends(get_db), provider_id: UUID = Depends(require_provider_profile)):
+    m = Machine(provider_id=provider_id, **payload.model_dump(exclude_unset=True))
     db.add(m)
     db.commit()
     db.refresh(m)
-    return m
+    return orm_json(m, MACHINE_FIELDS, status_code=201)
 
 @router.get("/{machine_id}", response_model=MachineRead)
-def get_machine(machine_id: UUID, db: Session = Depends(get_db), current: User = Depends(require_provider)):
-    prof = get_provider_profile(db, current.id)
-    m = db.query(Machine).filter(Machine.id == machine_id, Machine.provider_id == prof.id).first()
+def get_machine(machine_id: UUID, db: Session = Depends(get_db), provider_id: UUID = Depends(require_provider_profile)):
+    m = db.query(Machine).filter(Machine.id == machine_id, Machine.provider_id == provider_id).first()
     if not m:
         raise HTTPException(status_code=404, detail="Machine not found")
-    return m
+    return orm_json(m, MACHINE_FIELDS)
 
 @router.put("/{machine_id}", response_model=MachineRead)
-def update_machine(machine_id: UUID, payload: MachineUpdate, db: Session = Depends(get_db), current: User = Depends(require_provider)):
-    prof = get_provider_profile(db, current.id)
-    m = db.query(Machine).filter(Machine.id == machine_id, Machine.provider_id == prof.id).first()
+def update_machine(machine_id: UUID, payload: MachineUpdate, db: Session = Depends(get_db), provider_id: UUID = Depends(require_provider_profile)):
+    m = db.query(Machine).filter(Machine.id == machine_id, Machine.provider_id == provider_id).first()
     if not m:
         raise HTTPException(status_code=404, detail="Machine not found")
     for k, v in payload.model_dump(exclude_unset=True).items():
@@ -49,12 +109,11 @@ def update_machine(machine_id: UUID, payload: MachineUpdate, db: Session = Depen
     db.add(m)
     db.commit()
     db.refresh(m)
-    return m
+    return orm_json(m, MACHINE_FIELDS)
 
 @router.delete("/{machine_id}", status_code=204)
-def delete_machine(machine_id: UUID, db: Session = Depends(get_db), current: User = Depends(require_provider)):
-    prof = get_provider_profile(db, current.id)
-    m = db.query(Machine).filter(Machine.id == machine_id, Machine.provider_id == prof.id).first()
+def delete_machine(machine_id: UUID, db: Session = Depends(get_db), provider_id: UUID = Depends(require_provider_profile)):
+    m = db.query(Machine).filter(Machine.id == machine_id, Machine.provider_id == provider_id).first()
     if not m:
         raise HTTPException(status_code=404, detail="Machine not found")
     db.delete(m)
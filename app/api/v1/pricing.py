@@ -4,26 +4,28 @@ from __future__ import annotations
 from typing import List, Optional
 from uuid import UUID
 
+import sqlalchemy as sa
 from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from ...database import get_db
-from ...dependencies.auth import require_provider
-from ...models.user import User
-from ...models.profile import ProviderProfile
+from ...database import get_db, get_async_db
+from ...dependencies.auth import ProfileIds, get_profile_ids, require_provider_profile
+from ...models.geo import Field
 from ...models.inventory import PricingRule, Listing
+from ...models.workflow import WorkRequest
 from ...schemas.pricing import (
-    PricingCreate, PricingPut, PricingUpdate, PricingRead
+    PricingCreate, PricingPut, PricingUpdate, PricingRead, PriceEstimateRequest, PriceEstimate
 )
+from ...services.pricing import (
+    announce_pricing_change, estimate, field_target, load_listing_pricing, pricing_cache
+)
+from ...services.request_access import visible_requests
+from ...utils import http_cache
+from ...utils.http_cache import public_cache
 
 router = APIRouter()
 
-def get_provider_profile(db: Session, user_id: UUID) -> ProviderProfile:
-    prof = db.query(ProviderProfile).filter(ProviderProfile.user_id == user_id).first()
-    if not prof:
-        raise HTTPException(status_code=403, detail="Provider profile required")
-    return prof
-
 def assert_listing_ownership(db: Session, provider_id: UUID, listing_id: UUID):
     # listing must exist and belong to current provider
     lst = db.query(Listing).filter(Listing.id == listing_id, Listing.provider_id == provider_id).first()
@@ -33,11 +35,10 @@ def assert_listing_ownership(db: Session, provider_id: UUID, listing_id: UUID):
 @router.get("/", response_model=List[PricingRead])
 def list_pricing_rules(
     db: Session = Depends(get_db),
-    current: User = Depends(require_provider),
+    provider_id: UUID = Depends(require_provider_profile),
     listing_id: Optional[UUID] = Query(None, description="Filter by listing"),
 ) -> List[PricingRead]:
-    prof = get_provider_profile(db, current.id)
-    q = db.query(PricingRule).join(Listing, PricingRule.listing_id == Listing.id).filter(Listing.provider_id == prof.id)
+    q = db.query(PricingRule).join(Listing, PricingRule.listing_id == Listing.id).filter(Listing.provider_id == provider_id)
     if listing_id:
         q = q.filter(PricingRule.listing_id == listing_id)
     return q.order_by(PricingRule.unit.asc()).all()
@@ -46,11 +47,10 @@ def list_pricing_rules(
 def create_pricing_rule(
     payload: PricingCreate,
     db: Session = Depends(get_db),
-    current: User = Depends(require_provider),
+    provider_id: UUID = Depends(require_provider_profile),
 ) -> PricingRead:
-    prof = get_provider_profile(db, current.id)
     # validation: listing exists and is owned by provider
-    assert_listing_ownership(db, prof.id, payload.listing_id)
+    assert_listing_ownership(db, provider_id, payload.listing_id)
 
     pr = PricingRule(
         listing_id=payload.listing_id,
@@ -63,7 +63,11 @@ def create_pricing_rule(
         surcharges=payload.surcharges,
     )
     db.add(pr)
+    http_cache.announce(db, "listings")  # listing pages embed their pricing
+    changed = announce_pricing_change(db, pr.listing_id)
     db.commit()
+    pricing_cache.invalidate(changed)
+    public_cache.bump("listings")
     db.refresh(pr)
     return pr
 
@@ -72,17 +76,17 @@ def put_pricing_rule(
     pricing_id: UUID,
     payload: PricingPut,
     db: Session = Depends(get_db),
-    current: User = Depends(require_provider),
+    provider_id: UUID = Depends(require_provider_profile),
 ) -> PricingRead:
-    prof = get_provider_profile(db, current.id)
     pr = db.query(PricingRule).filter(PricingRule.id == pricing_id).first()
     if not pr:
         raise HTTPException(status_code=404, detail="Pricing rule not found")
+    old_listing_id = pr.listing_id
 
     # ensure old listing belongs to provider (and if changing listing_id, ensure new one too)
-    assert_listing_ownership(db, prof.id, pr.listing_id)
+    assert_listing_ownership(db, provider_id, pr.listing_id)
     if payload.listing_id != pr.listing_id:
-        assert_listing_ownership(db, prof.id, payload.listing_id)
+        assert_listing_ownership(db, provider_id, payload.listing_id)
 
     pr.listing_id = payload.listing_id
     pr.unit = payload.unit
@@ -93,7 +97,13 @@ def put_pricing_rule(
     pr.currency = payload.currency or "EUR"
     pr.surcharges = payload.surcharges
 
-    db.add(pr); db.commit(); db.refresh(pr)
+    db.add(pr)
+    http_cache.announce(db, "listings")
+    changed = announce_pricing_change(db, old_listing_id, pr.listing_id)
+    db.commit()
+    pricing_cache.invalidate(changed)
+    public_cache.bump("listings")
+    db.refresh(pr)
     return pr
 
 @router.patch("/{pricing_id}", response_model=PricingRead)
@@ -101,40 +111,88 @@ def patch_pricing_rule(
     pricing_id: UUID,
     payload: PricingUpdate,
     db: Session = Depends(get_db),
-    current: User = Depends(require_provider),
+    provider_id: UUID = Depends(require_provider_profile),
 ) -> PricingRead:
-    prof = get_provider_profile(db, current.id)
     pr = db.query(PricingRule).filter(PricingRule.id == pricing_id).first()
     if not pr:
         raise HTTPException(status_code=404, detail="Pricing rule not found")
 
     # ownership of current listing
-    assert_listing_ownership(db, prof.id, pr.listing_id)
+    assert_listing_ownership(db, provider_id, pr.listing_id)
+    old_listing_id = pr.listing_id
 
     data = payload.model_dump(exclude_unset=True)
 
     # if moving to another listing, validate the new one belongs to provider
     if "listing_id" in data and data["listing_id"] != pr.listing_id:
-        assert_listing_ownership(db, prof.id, data["listing_id"])
+        assert_listing_ownership(db, provider_id, data["listing_id"])
         pr.listing_id = data["listing_id"]
 
     for k in ("unit", "base_price", "min_qty", "transport_flat_fee", "transport_per_km", "currency", "surcharges"):
         if k in data:
             setattr(pr, k, data[k] if k != "currency" else (data[k] or "EUR"))
 
-    db.add(pr); db.commit(); db.refresh(pr)
+    db.add(pr)
+    http_cache.announce(db, "listings")
+    changed = announce_pricing_change(db, old_listing_id, pr.listing_id)
+    db.commit()
+    pricing_cache.invalidate(changed)
+    public_cache.bump("listings")
+    db.refresh(pr)
     return pr
 
 @router.delete("/{pricing_id}", status_code=204)
 def delete_pricing_rule(
     pricing_id: UUID,
     db: Session = Depends(get_db),
-    current: User = Depends(require_provider),
+    provider_id: UUID = Depends(require_provider_profile),
 ):
-    prof = get_provider_profile(db, current.id)
     pr = db.query(PricingRule).filter(PricingRule.id == pricing_id).first()
     if not pr:
         raise HTTPException(status_code=404, detail="Pricing rule not found")
     # ensure ownership
-    assert_listing_ownership(db, prof.id, pr.listing_id)
-    db.delete(pr); db.commit()
+    assert_listing_ownership(db, provider_id, pr.listing_id)
+    db.delete(pr)
+    http_cache.announce(db, "listings")
+    changed = announce_pricing_change(db, pr.listing_id)
+    db.commit()
+    pricing_cache.invalidate(changed)
+    public_cache.bump("listings")
+
+
+@router.post("/estimate", response_model=List[PriceEstimate])
+async def estimate_prices(
+    payload: PriceEstimateRequest,
+    db: AsyncSession = Depends(get_async_db),
+    profiles: ProfileIds = Depends(get_profile_ids),
+) -> List[PriceEstimate]:
+    """Itemised estimates for many listings against one field, in a single pass."""
+    listing_ids = list(dict.fromkeys(payload.listing_ids))
+    if payload.request_id:
+        # the request's client, the listing owner, or a provider matched to it
+        req = (await db.execute(
+            sa.select(WorkRequest).where(WorkRequest.id == payload.request_id, visible_requests(profiles))
+        )).scalar_one_or_none()
+        if req is None:
+            raise HTTPException(status_code=404, detail="Request not found")
+        if not listing_ids and req.listing_id:
+            listing_ids = [req.listing_id]
+        field_id, client_id, desired_date = req.field_id, None, req.desired_date
+    elif payload.field_id:
+        field_id, client_id, desired_date = payload.field_id, profiles.client_id, None
+    else:
+        raise HTTPException(status_code=400, detail="field_id or request_id is required")
+
+    stmt = sa.select(Field.area_ha, Field.centroid).where(Field.id == field_id)
+    if client_id is not None or payload.request_id is None:
+        stmt = stmt.where(Field.client_id == client_id)
+    f = (await db.execute(stmt)).first()
+    if not f:
+        raise HTTPException(status_code=404, detail="Field not found")
+    if not listing_ids:
+        raise HTTPException(status_code=400, detail="listing_ids is required")
+
+    target = field_target(f.area_ha, f.centroid, payload.surcharges, desired_date)
+    inputs = await load_listing_pricing(db, listing_ids)
+    estimates = estimate(inputs, target)
+    return [estimates[lid] for lid in listing_ids if lid in estimates]
@@ -10,7 +10,9 @@ from ...schemas.profile import (
     ProviderProfileCreate, ProviderProfileUpdate, ProviderProfileRead
 )
 from ...schemas.user import UserRead, UserUpdateMe
-from ...dependencies.auth import get_current_user, require_client, require_provider
+from ...dependencies.auth import get_current_user, require_client, require_provider, invalidate_user
+from ...services.matching import match_index
+from ...services.provider_index import announce_provider_change, provider_locator
 
 router = APIRouter()
 
@@ -27,6 +29,7 @@ def update_me(payload: UserUpdateMe, db: Session = Depends(get_db), current: Use
         current.phone = payload.phone.strip() if payload.phone else None
     db.add(current)
     db.commit()
+    invalidate_user(current.id)
     db.refresh(current)
     return current
 
@@ -77,11 +80,16 @@ def create_provider_profile(payload: ProviderProfileCreate, db: Session = Depend
         user_id=current.id,
         business_name=(payload.business_name or None),
         tax_id=(payload.tax_id or None),
-        service_radius_km=payload.service_radius_km
+        service_radius_km=payload.service_radius_km,
+        base_lat=payload.base_lat,
+        base_lon=payload.base_lon,
     )
     db.add(prof)
+    announce_provider_change(db)
     db.commit()
     db.refresh(prof)
+    provider_locator.invalidate()
+    match_index.invalidate()
     return prof
 
 @router.put("/me/provider-profile", response_model=ProviderProfileRead)
@@ -96,8 +104,13 @@ def update_provider_profile(payload: ProviderProfileUpdate, db: Session = Depend
         prof.tax_id = payload.tax_id or None
     if payload.service_radius_km is not None:
         prof.service_radius_km = payload.service_radius_km
+    if payload.base_lat is not None and payload.base_lon is not None:
+        prof.base_lat, prof.base_lon = payload.base_lat, payload.base_lon
 
     db.add(prof)
+    announce_provider_change(db)
     db.commit()
     db.refresh(prof)
+    provider_locator.invalidate()
+    match_index.invalidate()
     return prof
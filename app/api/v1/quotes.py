@@ -1,24 +1,31 @@
 # app/api/v1/quotes.py
 import decimal
+from typing import Dict, List, Literal, Optional, Union
 from uuid import UUID
+import sqlalchemy as sa
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
 
-from ...database import get_db
-from ...dependencies.auth import require_user, require_provider
-from ...models.user import User
-from ...models.workflow import WorkRequest, Quote, QuoteItem, QuoteStatus, RequestStatus
-from ...models.profile import ProviderProfile
+from ...database import get_db, get_async_db
+from ...dependencies.auth import ProfileIds, get_profile_ids, require_client_profile, require_provider_profile
+from ...models.workflow import WorkRequest, Quote, QuoteItem, QuoteStatus, RequestMatch, RequestStatus
 from ...models.inventory import Listing
-from ...schemas.quotes import QuoteCreate, QuoteRead
+from ...services.quote_expiry import is_lapsed, live_status
+from ...services.request_access import visible_quotes, visible_requests
+from ...schemas.quotes import QuoteCreate, QuoteItemIn, QuoteRead, QuoteSummary
+from ...utils import events
+from ...utils.events import client_scope, event_broker, provider_scope
+from ...utils.serialization import FastJSONResponse, orm_dict, schema_fields
 
 router = APIRouter()
 
-def get_provider_profile(db: Session, user_id: UUID) -> ProviderProfile:
-    prof = db.query(ProviderProfile).filter(ProviderProfile.user_id == user_id).first()
-    if not prof:
-        raise HTTPException(status_code=403, detail="Provider profile required")
-    return prof
+QuoteView = Literal["full", "summary"]
+VIEW_QUERY = Query("full", description="summary: totals, status, provider and item_count, without items or message")
+QUOTE_FIELDS = tuple(f for f in schema_fields(QuoteRead) if f != "items")
+QUOTE_ITEM_FIELDS = schema_fields(QuoteItemIn)
+SUMMARY_COLUMNS = tuple(getattr(Quote, f) for f in schema_fields(QuoteSummary) if f != "item_count")
+MAX_BATCH_REQUESTS = 200
 
 def d(v) -> decimal.Decimal:
     if v is None: return decimal.Decimal("0")
@@ -29,18 +36,21 @@ def d(v) -> decimal.Decimal:
 def create_quote(
     payload: QuoteCreate,
     db: Session = Depends(get_db),
-    current: User = Depends(require_provider),
+    provider_id: UUID = Depends(require_provider_profile),
 ):
-    prof = get_provider_profile(db, current.id)
 
     req = db.query(WorkRequest).filter(WorkRequest.id == payload.request_id).first()
     if not req:
         raise HTTPException(status_code=404, detail="Request not found")
 
-    # Provider must own the listing on the request
+    # Provider must own the listing on the request, or have been matched to the request
     lst = db.query(Listing).filter(Listing.id == req.listing_id).first()
-    if not lst or lst.provider_id != prof.id:
-        raise HTTPException(status_code=403, detail="You don't own this listing/request")
+    if not lst or lst.provider_id != provider_id:
+        matched = db.query(RequestMatch.request_id).filter(
+            RequestMatch.request_id == req.id, RequestMatch.provider_id == provider_id
+        ).first()
+        if not matched:
+            raise HTTPException(status_code=403, detail="You don't own this listing/request")
 
     if req.status not in (RequestStatus.open, RequestStatus.quoted):
         raise HTTPException(status_code=400, detail=f"Cannot quote a request with status {req.status}")
@@ -65,7 +75,7 @@ def create_quote(
 
     q = Quote(
         request_id=req.id,
-        provider_id=prof.id,
+        provider_id=provider_id,
         currency=payload.currency.upper(),
         message=payload.message,
         subtotal=subtotal,
@@ -83,54 +93,134 @@ def create_quote(
         req.status = RequestStatus.quoted
         db.add(req)
 
+    db.flush()
+    event = events.make_event(
+        "quote.created", [client_scope(req.client_id), provider_scope(provider_id)],
+        quote_id=q.id, request_id=req.id, total=q.total, currency=q.currency, request_status=req.status,
+    )
+    events.announce(db, event)
     db.commit()
+    event_broker.publish(event)
     db.refresh(q)
     return q
 
-@router.get("/for-request/{request_id}", response_model=list[QuoteRead])
-def quotes_for_request(
+async def load_quotes(
+    db: AsyncSession, request_ids: List[UUID], view: QuoteView, profiles: ProfileIds
+) -> List[dict]:
+    """The caller's visible quotes for all `request_ids` in one statement (two for the full view), newest first."""
+    if not request_ids:
+        return []
+    if view == "summary":
+        item_count = (
+            sa.select(sa.func.count(QuoteItem.id))
+            .where(QuoteItem.quote_id == Quote.id)
+            .scalar_subquery()
+        )
+        rows = (await db.execute(
+            sa.select(*SUMMARY_COLUMNS, item_count.label("item_count"))
+            .where(Quote.request_id.in_(request_ids), visible_quotes(profiles))
+            .order_by(Quote.created_at.desc())
+        )).all()
+        return [live_status(dict(r._mapping)) for r in rows]
+
+    # items come in one IN query for the whole batch; async sessions cannot lazy-load them anyway
+    quotes = (await db.execute(
+        sa.select(Quote)
+        .where(Quote.request_id.in_(request_ids), visible_quotes(profiles))
+        .options(selectinload(Quote.items))
+        .order_by(Quote.created_at.desc())
+    )).scalars().all()
+    out = []
+    for q in quotes:
+        data = orm_dict(q, QUOTE_FIELDS)
+        data["items"] = [orm_dict(it, QUOTE_ITEM_FIELDS) for it in q.items]
+        out.append(live_status(data))
+    return out
+
+
+@router.get("/for-request/{request_id}", response_model=Union[List[QuoteRead], List[QuoteSummary]])
+async def quotes_for_request(
     request_id: UUID,
-    db: Session = Depends(get_db),
-    current: User = Depends(require_user),
+    view: QuoteView = VIEW_QUERY,
+    db: AsyncSession = Depends(get_async_db),
+    profiles: ProfileIds = Depends(get_profile_ids),
 ):
-    # Either the client who created it or the provider who owns listing can see quotes
-    req = db.query(WorkRequest).filter(WorkRequest.id == request_id).first()
-    if not req:
-        raise HTTPException(status_code=404, detail="Request not found")
+    # the client sees every offer; a provider (listing owner or matched) only their own
+    found = (await db.execute(
+        sa.select(WorkRequest.id).where(WorkRequest.id == request_id, visible_requests(profiles))
+    )).scalar_one_or_none()
+    if found is None:
+        exists = await db.get(WorkRequest, request_id)
+        raise HTTPException(status_code=403 if exists else 404, detail="Not allowed" if exists else "Request not found")
+    return FastJSONResponse(await load_quotes(db, [request_id], view, profiles))
 
-    # If you keep client_profile_id on WorkRequest, adapt this check
-    if current.id != req.client_id:
-        # check provider ownership
-        lst = db.query(Listing).filter(Listing.id == req.listing_id).first()
-        prof = db.query(ProviderProfile).filter(ProviderProfile.user_id == current.id).first()
-        if not (lst and prof and lst.provider_id == prof.id):
-            raise HTTPException(status_code=403, detail="Not allowed")
 
-    rows = db.query(Quote).filter(Quote.request_id == request_id).order_by(Quote.created_at.desc()).all()
-    return rows
+@router.get("/for-requests", response_model=Union[Dict[UUID, List[QuoteRead]], Dict[UUID, List[QuoteSummary]]])
+async def quotes_for_requests(
+    request_id: Optional[List[UUID]] = Query(
+        None, description="Requests to fetch quotes for; defaults to your own open and quoted requests"
+    ),
+    view: QuoteView = VIEW_QUERY,
+    db: AsyncSession = Depends(get_async_db),
+    profiles: ProfileIds = Depends(get_profile_ids),
+):
+    """Quotes for many requests in one round trip, keyed by request id.
+
+    Requests the caller cannot see are left out rather than failing the batch.
+    """
+    if request_id:
+        wanted = list(dict.fromkeys(request_id))
+        if len(wanted) > MAX_BATCH_REQUESTS:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_REQUESTS} request ids per call")
+        stmt = sa.select(WorkRequest.id).where(WorkRequest.id.in_(wanted), visible_requests(profiles))
+    elif profiles.client_id is not None:
+        stmt = (
+            sa.select(WorkRequest.id)
+            .where(
+                WorkRequest.client_id == profiles.client_id,
+                WorkRequest.status.in_([RequestStatus.open, RequestStatus.quoted]),
+            )
+            .order_by(WorkRequest.created_at.desc())
+            .limit(MAX_BATCH_REQUESTS)
+        )
+    else:
+        raise HTTPException(status_code=400, detail="request_id is required")
+
+    ids = list((await db.execute(stmt)).scalars())
+    grouped: Dict[UUID, List[dict]] = {rid: [] for rid in ids}
+    for q in await load_quotes(db, ids, view, profiles):
+        grouped[q["request_id"]].append(q)
+    return FastJSONResponse(grouped)
+
 
 @router.post("/{quote_id}/withdraw", status_code=204)
 def withdraw_quote(
     quote_id: UUID,
     db: Session = Depends(get_db),
-    current: User = Depends(require_provider),
+    provider_id: UUID = Depends(require_provider_profile),
 ):
-    prof = get_provider_profile(db, current.id)
-    q = db.query(Quote).filter(Quote.id == quote_id, Quote.provider_id == prof.id).first()
+    q = db.query(Quote).filter(Quote.id == quote_id, Quote.provider_id == provider_id).first()
     if not q:
         raise HTTPException(status_code=404, detail="Quote not found")
     if q.status != QuoteStatus.offered:
         raise HTTPException(status_code=400, detail="Only offered quotes can be withdrawn")
     q.status = QuoteStatus.withdrawn
     db.add(q)
+    client_id = db.query(WorkRequest.client_id).filter(WorkRequest.id == q.request_id).scalar()
+    event = events.make_event(
+        "quote.withdrawn", [client_scope(client_id), provider_scope(provider_id)],
+        quote_id=q.id, request_id=q.request_id,
+    )
+    events.announce(db, event)
     db.commit()
+    event_broker.publish(event)
     return
 
 @router.post("/{quote_id}/accept", status_code=200, response_model=QuoteRead)
 def accept_quote(
     quote_id: UUID,
     db: Session = Depends(get_db),
-    current: User = Depends(require_user),
+    client_id: UUID = Depends(require_client_profile),
 ):
     q = db.query(Quote).filter(Quote.id == quote_id).first()
     if not q:
@@ -140,11 +230,13 @@ def accept_quote(
     if not req:
         raise HTTPException(status_code=404, detail="Related request not found")
     # Client who owns the request only
-    if req.client_id != current.id:
+    if req.client_id != client_id:
         raise HTTPException(status_code=403, detail="Not allowed")
 
     if q.status != QuoteStatus.offered:
         raise HTTPException(status_code=400, detail="Cannot accept this quote")
+    if is_lapsed(q.status, q.expires_at):
+        raise HTTPException(status_code=400, detail="This quote has expired")
 
     # Accept this one, reject others (unique partial index enforces single accepted)
     q.status = QuoteStatus.accepted
@@ -156,6 +248,12 @@ def accept_quote(
     req.status = RequestStatus.accepted
     db.add(req)
 
+    event = events.make_event(
+        "quote.accepted", [client_scope(client_id), provider_scope(q.provider_id)],
+        quote_id=q.id, request_id=req.id, request_status=req.status,
+    )
+    events.announce(db, event)
     db.commit()
+    event_broker.publish(event)
     db.refresh(q)
     return q
@@ -1,66 +1,133 @@
 # app/api/v1/requests.py
 from __future__ import annotations
 
-from typing import List
+from typing import List, Optional
 from uuid import UUID
 
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+import sqlalchemy as sa
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
 
-from ...database import get_db
-from ...dependencies.auth import require_client, require_provider
-from ...models.user import User
-from ...models.profile import ClientProfile, ProviderProfile
+from ...database import get_db, get_async_db
+from ...dependencies.auth import ProfileIds, require_client_profile, require_provider_profile
 from ...models.geo import Field                       # adjust path if different
 from ...models.inventory import Listing               # used to validate listing_id
-from ...models.workflow import WorkRequest, RequestStatus
-from ...schemas.request import WorkRequestCreate, WorkRequestUpdate, WorkRequestRead
+from ...models.workflow import WorkRequest, RequestStatus, Quote, RequestMatch
+from ...config import settings
+from ...services.matching import match_request
+from ...services.quote_expiry import live_status
+from ...services.request_access import FeedSource, feed_select, visible_requests
+from ...schemas.field import FieldSummary
+from ...schemas.listing import ListingRead
+from ...schemas.quotes import QuoteItemIn, QuoteRead
+from ...schemas.request import (
+    WorkRequestCreate, WorkRequestUpdate, WorkRequestRead, WorkRequestExpanded, ProviderRequestFeed, RequestMatchRead
+)
+from ...utils import events
+from ...utils.events import client_scope, event_broker, provider_scope
+from ...utils.pagination import decode_cursor, next_cursor
+from ...utils.serialization import orm_dict, schema_fields
 
 router = APIRouter()
 
+EXPANSIONS = ("listing", "field", "quotes", "quote_items")
+REQUEST_FIELDS = schema_fields(WorkRequestRead)
+LISTING_FIELDS = schema_fields(ListingRead)
+FIELD_SUMMARY_FIELDS = schema_fields(FieldSummary)
+QUOTE_FIELDS = tuple(f for f in schema_fields(QuoteRead) if f != "items")
+QUOTE_ITEM_FIELDS = schema_fields(QuoteItemIn)
+MATCH_FIELDS = schema_fields(RequestMatchRead)
 
-# ------------------------- Helpers -------------------------
-def get_client_profile(db: Session, user_id: UUID) -> ClientProfile:
-    prof = db.query(ClientProfile).filter(ClientProfile.user_id == user_id).first()
-    if not prof:
-        raise HTTPException(status_code=403, detail="Client profile required")
-    return prof
+EXPAND_QUERY = Query(None, description=f"Comma-separated related objects to embed: {', '.join(EXPANSIONS)}")
 
-def get_provider_profile(db: Session, user_id: UUID) -> ProviderProfile:
-    prof = db.query(ProviderProfile).filter(ProviderProfile.user_id == user_id).first()
-    if not prof:
-        raise HTTPException(status_code=403, detail="Provider profile required")
-    return prof
+
+def parse_expand(raw: Optional[str]) -> set[str]:
+    wanted = {e.strip() for e in (raw or "").split(",") if e.strip()}
+    unknown = wanted - set(EXPANSIONS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown expand value(s) {sorted(unknown)}; use {list(EXPANSIONS)}")
+    if "quote_items" in wanted:
+        wanted.add("quotes")
+    return wanted
+
+
+def expand_options(expand: set[str], provider_id: Optional[UUID] = None) -> list:
+    """One extra IN query per expansion, however many requests are on the page.
+
+    With `provider_id` (provider callers) embedded quotes are limited to that
+    provider's own; competitors' offers are only for the requesting client.
+    """
+    opts = []
+    if "listing" in expand:
+        opts.append(selectinload(WorkRequest.listing).load_only(
+            *(getattr(Listing, f) for f in LISTING_FIELDS)
+        ))
+    if "field" in expand:
+        # geometry stays behind: the summary is enough to label a row
+        opts.append(selectinload(WorkRequest.field).load_only(
+            *(getattr(Field, f) for f in FIELD_SUMMARY_FIELDS)
+        ))
+    if "quotes" in expand:
+        relation = WorkRequest.quotes
+        if provider_id is not None:
+            relation = relation.and_(Quote.provider_id == provider_id)
+        quotes = selectinload(relation)
+        if "quote_items" in expand:
+            quotes = quotes.selectinload(Quote.items)
+        opts.append(quotes)
+    return opts
+
+
+def expanded_dict(req: WorkRequest, expand: set[str]) -> dict:
+    """Request columns plus the requested relations; relations not asked for are never touched."""
+    data = orm_dict(req, REQUEST_FIELDS)
+    if "listing" in expand:
+        data["listing"] = orm_dict(req.listing, LISTING_FIELDS) if req.listing else None
+    if "field" in expand:
+        data["field"] = orm_dict(req.field, FIELD_SUMMARY_FIELDS) if req.field else None
+    if "quotes" in expand:
+        quotes = []
+        for q in req.quotes:
+            quote = orm_dict(q, QUOTE_FIELDS)
+            if "quote_items" in expand:
+                quote["items"] = [orm_dict(it, QUOTE_ITEM_FIELDS) for it in q.items]
+            quotes.append(live_status(quote))
+        data["quotes"] = quotes
+    return data
 
 
 # ---------------------- Client endpoints -------------------
-@router.get("/me", response_model=List[WorkRequestRead])
+@router.get("/me", response_model=List[WorkRequestExpanded], response_model_exclude_unset=True)
 def list_my_requests(
+    expand: Optional[str] = EXPAND_QUERY,
     db: Session = Depends(get_db),
-    current: User = Depends(require_client),
+    client_id: UUID = Depends(require_client_profile),
 ):
-    cprof = get_client_profile(db, current.id)
-    return (
+    wanted = parse_expand(expand)
+    rows = (
         db.query(WorkRequest)
-        .filter(WorkRequest.client_id == cprof.id)
+        .filter(WorkRequest.client_id == client_id)
+        .options(*expand_options(wanted))
         .order_by(WorkRequest.created_at.desc())
         .all()
     )
+    return [expanded_dict(r, wanted) for r in rows]
 
 
 @router.post("/", response_model=WorkRequestRead, status_code=201)
 def create_request(
     payload: WorkRequestCreate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
-    current: User = Depends(require_client),
+    client_id: UUID = Depends(require_client_profile),
 ):
-    cprof = get_client_profile(db, current.id)
 
     # 1) Field must belong to this client
     field = (
         db.query(Field)
-        .filter(Field.id == payload.field_id, Field.client_id == cprof.id)
+        .filter(Field.id == payload.field_id, Field.client_id == client_id)
         .first()
     )
     if not field:
@@ -73,7 +140,7 @@ def create_request(
 
     # 3) Create WorkRequest; set status explicitly to 'open'
     req = WorkRequest(
-        client_id=cprof.id,
+        client_id=client_id,
         listing_id=payload.listing_id,
         field_id=payload.field_id,
         desired_date=payload.desired_date,
@@ -82,7 +149,17 @@ def create_request(
         status=RequestStatus.open,  # enum-safe
     )
     db.add(req)
+    db.flush()
+    event = events.make_event(
+        "request.created", [client_scope(client_id), provider_scope(listing.provider_id)],
+        request_id=req.id, listing_id=req.listing_id, status=req.status,
+    )
+    events.announce(db, event)
     db.commit()
+    event_broker.publish(event)
+    if settings.MATCHING_ENABLED:
+        # after the response: rank providers for the request and fill their match feeds
+        background_tasks.add_task(match_request, req.id)
     db.refresh(req)
     return req
 
@@ -92,12 +169,11 @@ def update_my_request(
     request_id: UUID,
     payload: WorkRequestUpdate,
     db: Session = Depends(get_db),
-    current: User = Depends(require_client),
+    client_id: UUID = Depends(require_client_profile),
 ):
-    cprof = get_client_profile(db, current.id)
     req = (
         db.query(WorkRequest)
-        .filter(WorkRequest.id == request_id, WorkRequest.client_id == cprof.id)
+        .filter(WorkRequest.id == request_id, WorkRequest.client_id == client_id)
         .first()
     )
     if not req:
@@ -116,16 +192,84 @@ def update_my_request(
 
 
 # --------------------- Provider endpoints ------------------
+def parse_statuses(raw: str) -> List[RequestStatus]:
+    try:
+        return [RequestStatus(s.strip()) for s in raw.split(",") if s.strip()]
+    except ValueError:
+        raise HTTPException(
+            status_code=400, detail=f"status must be a comma-separated list of {[s.value for s in RequestStatus]}"
+        )
+
+
+@router.get("/provider", response_model=ProviderRequestFeed, response_model_exclude_unset=True)
+async def provider_request_feed(
+    status: str = Query("open,quoted", description="Comma-separated statuses"),
+    source: FeedSource = Query(
+        "listings", description="listings: requests on your listings; matches: requests you were matched to"
+    ),
+    expand: Optional[str] = EXPAND_QUERY,
+    listing_id: Optional[UUID] = Query(None, description="Only requests for (or matched through) this listing of yours"),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    db: AsyncSession = Depends(get_async_db),
+    provider_id: UUID = Depends(require_provider_profile),
+):
+    """Requests for the caller as a provider, newest first, plus counts per status."""
+    wanted = parse_expand(expand)
+    columns = [WorkRequest, Listing.title] + ([RequestMatch] if source == "matches" else [])
+    conditions = [WorkRequest.status.in_(parse_statuses(status))]
+    if cursor:
+        conditions.append(sa.tuple_(WorkRequest.created_at, WorkRequest.id) < decode_cursor(cursor))
+    rows = (await db.execute(
+        feed_select(source, provider_id, listing_id, *columns)
+        .where(*conditions)
+        .options(*expand_options(wanted, provider_id))
+        .order_by(WorkRequest.created_at.desc(), WorkRequest.id.desc())
+        .limit(limit)
+    )).all()
+
+    counts = (await db.execute(
+        feed_select(source, provider_id, listing_id, WorkRequest.status, sa.func.count())
+        .group_by(WorkRequest.status)
+    )).all()
+
+    items = []
+    for row in rows:
+        item = {**expanded_dict(row[0], wanted), "listing_title": row[1]}
+        if source == "matches":
+            item["match"] = orm_dict(row[2], MATCH_FIELDS)
+        items.append(item)
+    return ProviderRequestFeed(
+        items=items,
+        counts={s.value: 0 for s in RequestStatus} | {getattr(st, "value", st): n for st, n in counts},
+        next_cursor=next_cursor([row[0] for row in rows], limit),
+    )
+
+
 @router.get("/open", response_model=List[WorkRequestRead])
-def list_open_requests_for_providers(
-    db: Session = Depends(get_db),
-    current: User = Depends(require_provider),
+async def list_open_requests_for_providers(
+    response: Response,
+    limit: int = Query(100, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="Keyset cursor from the X-Next-Cursor header"),
+    db: AsyncSession = Depends(get_async_db),
+    provider_id: UUID = Depends(require_provider_profile),
 ):
+    """Open and quoted requests this provider may act on: on their listings or matched to them."""
     # Enum-safe filter: translates to request_status enum in PG
-    rows = (
-        db.query(WorkRequest)
-        .filter(WorkRequest.status.in_([RequestStatus.open, RequestStatus.quoted]))
-        .order_by(WorkRequest.created_at.desc())
-        .all()
+    conditions = [
+        WorkRequest.status.in_([RequestStatus.open, RequestStatus.quoted]),
+        visible_requests(ProfileIds(provider_id=provider_id)),
+    ]
+    if cursor:
+        conditions.append(sa.tuple_(WorkRequest.created_at, WorkRequest.id) < decode_cursor(cursor))
+    result = await db.execute(
+        sa.select(WorkRequest)
+        .where(*conditions)
+        .order_by(WorkRequest.created_at.desc(), WorkRequest.id.desc())
+        .limit(limit)
     )
+    rows = result.scalars().all()
+    cursor_out = next_cursor(rows, limit)
+    if cursor_out:
+        response.headers["X-Next-Cursor"] = cursor_out
     return rows
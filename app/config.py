@@ -9,9 +9,85 @@ class Settings:
         _url = _url.replace("postgres://", "postgresql://", 1)
     DATABASE_URL: str = _url
 
+    # 🏊 Connection pool (applies to the sync and the async engine separately)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_RECYCLE_SECONDS: int = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+    DB_POOL_TIMEOUT_SECONDS: float = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+    # always | idle (only connections idle longer than DB_POOL_PRE_PING_IDLE_SECONDS) | never
+    DB_POOL_PRE_PING: str = os.getenv("DB_POOL_PRE_PING", "idle").strip().lower()
+    DB_POOL_PRE_PING_IDLE_SECONDS: float = float(os.getenv("DB_POOL_PRE_PING_IDLE_SECONDS", "30"))
+    # PgBouncer transaction pooling: never use server-side prepared statements
+    DB_PGBOUNCER: bool = os.getenv("DB_PGBOUNCER", "false").lower() in ("1", "true", "yes")
+
+    # 🔎 Marketplace full-text search. The text search config is baked into the
+    # listings.search_vector generated column; changing it means re-creating that column.
+    SEARCH_TEXT_CONFIG: str = os.getenv("SEARCH_TEXT_CONFIG", "english")
+
+    # 📍 Provider location index (near-field marketplace search)
+    PROVIDER_INDEX_TTL_SECONDS: float = float(os.getenv("PROVIDER_INDEX_TTL_SECONDS", "300"))
+    PROVIDER_INDEX_CELL_DEG: float = float(os.getenv("PROVIDER_INDEX_CELL_DEG", "0.5"))
+
+    # 💶 Compiled pricing rules per listing (per worker; writes invalidate via LISTEN/NOTIFY)
+    PRICING_CACHE_MAXSIZE: int = int(os.getenv("PRICING_CACHE_MAXSIZE", "20000"))
+    PRICING_CACHE_TTL_SECONDS: float = float(os.getenv("PRICING_CACHE_TTL_SECONDS", "600"))
+    # Cross-worker cache invalidation; turn off where the DB role may not LISTEN
+    PG_NOTIFY_ENABLED: bool = os.getenv("PG_NOTIFY_ENABLED", "true").lower() in ("1", "true", "yes")
+    # LISTEN needs a session-level connection: behind PgBouncer point this at Postgres directly
+    PG_LISTEN_URL: str = os.getenv("PG_LISTEN_URL", "")
+
+    # 🗄️ HTTP response cache for public marketplace endpoints (seconds)
+    HTTP_CACHE_MAXSIZE: int = int(os.getenv("HTTP_CACHE_MAXSIZE", "2000"))
+    LISTINGS_CACHE_MAX_AGE: float = float(os.getenv("LISTINGS_CACHE_MAX_AGE", "15"))
+    LISTINGS_CACHE_STALE_SECONDS: float = float(os.getenv("LISTINGS_CACHE_STALE_SECONDS", "60"))
+    CATEGORIES_CACHE_MAX_AGE: float = float(os.getenv("CATEGORIES_CACHE_MAX_AGE", "300"))
+    CATEGORIES_CACHE_STALE_SECONDS: float = float(os.getenv("CATEGORIES_CACHE_STALE_SECONDS", "3600"))
+    # In-memory category tree (reloaded on NOTIFY from the categories trigger, or after this long)
+    CATEGORY_TREE_TTL_SECONDS: float = float(os.getenv("CATEGORY_TREE_TTL_SECONDS", "600"))
+
+    # 🗺️ Bulk field import (POST /fields/import)
+    FIELD_IMPORT_MAX_FEATURES: int = int(os.getenv("FIELD_IMPORT_MAX_FEATURES", "5000"))
+    FIELD_IMPORT_BATCH_SIZE: int = int(os.getenv("FIELD_IMPORT_BATCH_SIZE", "200"))
+    FIELD_IMPORT_MAX_FEATURE_BYTES: int = int(os.getenv("FIELD_IMPORT_MAX_FEATURE_BYTES", str(5 * 1024 * 1024)))
+
+    # ⏳ Quote expiry sweeper (moves offered quotes past expires_at to expired)
+    QUOTE_EXPIRY_ENABLED: bool = os.getenv("QUOTE_EXPIRY_ENABLED", "true").lower() in ("1", "true", "yes")
+    QUOTE_EXPIRY_INTERVAL_SECONDS: float = float(os.getenv("QUOTE_EXPIRY_INTERVAL_SECONDS", "60"))
+    QUOTE_EXPIRY_BATCH_SIZE: int = int(os.getenv("QUOTE_EXPIRY_BATCH_SIZE", "500"))
+    QUOTE_EXPIRY_MAX_BATCHES: int = int(os.getenv("QUOTE_EXPIRY_MAX_BATCHES", "20"))  # per run
+
+    # 📡 Server-Sent Events (/events/stream)
+    EVENTS_HEARTBEAT_SECONDS: float = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "20"))
+    EVENTS_RETRY_MS: int = int(os.getenv("EVENTS_RETRY_MS", "5000"))
+
+    # 🤝 Request-to-provider matching (ranked on request creation, stored in request_matches)
+    MATCHING_ENABLED: bool = os.getenv("MATCHING_ENABLED", "true").lower() in ("1", "true", "yes")
+    MATCH_TOP_K: int = int(os.getenv("MATCH_TOP_K", "20"))
+    MATCH_INDEX_TTL_SECONDS: float = float(os.getenv("MATCH_INDEX_TTL_SECONDS", "300"))
+    MATCH_INDEX_CELL_DEG: float = float(os.getenv("MATCH_INDEX_CELL_DEG", "0.5"))
+
+    # 📏 Provider-to-field distance matrices (per worker LRU; matrices above MAX_CELLS are not cached)
+    DISTANCE_CACHE_SIZE: int = int(os.getenv("DISTANCE_CACHE_SIZE", "512"))
+    DISTANCE_CACHE_MAX_CELLS: int = int(os.getenv("DISTANCE_CACHE_MAX_CELLS", "10000"))
+    DISTANCE_CACHE_TTL_SECONDS: float = float(os.getenv("DISTANCE_CACHE_TTL_SECONDS", "3600"))
+    # Road km per great-circle km; an optional CSV (lat,lon,factor per grid cell) overrides it locally
+    DISTANCE_ROAD_FACTOR: float = float(os.getenv("DISTANCE_ROAD_FACTOR", "1.3"))
+    DISTANCE_ROAD_FACTORS_PATH: str = os.getenv("DISTANCE_ROAD_FACTORS_PATH", "")
+    DISTANCE_ROAD_FACTOR_CELL_DEG: float = float(os.getenv("DISTANCE_ROAD_FACTOR_CELL_DEG", "0.5"))
+
     # 🔐 Auth
     SECRET_KEY: str = os.getenv("SECRET_KEY", "change-me-in-prod")
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
 
+    # 👤 Authenticated-user cache (per worker)
+    USER_CACHE_MAXSIZE: int = int(os.getenv("USER_CACHE_MAXSIZE", "10000"))
+    USER_CACHE_TTL_SECONDS: float = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+
+    # 🔑 Password hashing pool ("process" uses all cores; "thread" for constrained hosts)
+    PASSWORD_HASH_EXECUTOR: str = os.getenv("PASSWORD_HASH_EXECUTOR", "process")
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+    PASSWORD_HASH_MAX_PENDING: int = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(4 * PASSWORD_HASH_WORKERS)))
+    PASSWORD_HASH_TIMEOUT_SECONDS: float = float(os.getenv("PASSWORD_HASH_TIMEOUT_SECONDS", "10"))
+
 settings = Settings()
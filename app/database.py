@@ -1,6 +1,10 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from .config import settings
+from .utils import metrics
+from .utils.db_pool import install_idle_pre_ping, instrumented_pool_class, pool_snapshot
 
 # Normalize DSN for psycopg v3 or psycopg2
 dsn = settings.DATABASE_URL
@@ -13,11 +17,47 @@ if "+psycopg" not in dsn and dsn.startswith("postgresql://"):
 connect_args = {}
 if dsn.startswith("postgresql+psycopg://"):
     connect_args = {"sslmode": "require"}
+    if settings.DB_PGBOUNCER:
+        connect_args["prepare_threshold"] = None  # psycopg v3: no server-side prepares
 
-engine = create_engine(dsn, connect_args=connect_args, pool_pre_ping=True)
+PRE_PING_MODES = ("always", "idle", "never")
+if settings.DB_POOL_PRE_PING not in PRE_PING_MODES:
+    # fail at startup: anything unrecognised would otherwise quietly mean "never"
+    raise ValueError(
+        f"DB_POOL_PRE_PING must be one of {', '.join(PRE_PING_MODES)}; got {settings.DB_POOL_PRE_PING!r}"
+    )
+
+def _pool_kwargs(pool_class):
+    return {
+        "poolclass": instrumented_pool_class(pool_class),
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING == "always",
+    }
+
+engine = create_engine(dsn, connect_args=connect_args, **_pool_kwargs(QueuePool))
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine on the same DSN (psycopg v3 drives both); routes migrate to it one by one
+async_engine = create_async_engine(dsn, connect_args=connect_args, **_pool_kwargs(AsyncAdaptedQueuePool))
+
+if settings.DB_POOL_PRE_PING == "idle":
+    install_idle_pre_ping(engine, settings.DB_POOL_PRE_PING_IDLE_SECONDS)
+    install_idle_pre_ping(async_engine.sync_engine, settings.DB_POOL_PRE_PING_IDLE_SECONDS)
+
+metrics.register("db_pool", lambda: {
+    "sync": pool_snapshot(engine),
+    "async": pool_snapshot(async_engine.sync_engine),
+})
+
+# plain libpq conninfo for the LISTEN connection (utils.pgnotify), outside the pools
+listen_conninfo = settings.PG_LISTEN_URL or engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 # Dependency for FastAPI
@@ -27,3 +67,7 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,33 +1,179 @@
+from typing import Any, Dict, NamedTuple, Optional
 from uuid import UUID
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from ..database import get_db
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, make_transient_to_detached
+from ..database import SessionLocal, get_db
 from ..models.user import User
+from ..models.profile import ClientProfile, ProviderProfile
+from ..utils.cache import TTLCache
+from ..utils import metrics
+from ..utils.pgnotify import notify_stmt, pg_listener
 from ..utils.security import decode_token
 from ..config import settings
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_PREFIX}/auth/token")
+oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_PREFIX}/auth/token", auto_error=False)
+
+# token subject (user id) -> column snapshot of the User row
+USER_CACHE_CHANNEL = "user_cache"
+
+user_cache = TTLCache(maxsize=settings.USER_CACHE_MAXSIZE, ttl=settings.USER_CACHE_TTL_SECONDS)
+metrics.register("user_cache", user_cache.stats)
 
 class AuthError(HTTPException):
     def __init__(self, code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials"):
         super().__init__(status_code=code, detail=detail, headers={"WWW-Authenticate": "Bearer"})
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+def get_token_claims(token: str = Depends(oauth2_scheme)) -> Dict[str, Any]:
     try:
         payload = decode_token(token)
-        sub = payload.get("sub")
-        if not sub:
-            raise AuthError()
-        user_id = UUID(str(sub))
     except Exception:
         raise AuthError()
+    if not payload.get("sub"):
+        raise AuthError()
+    return payload
+
+def get_optional_token_claims(token: Optional[str] = Depends(oauth2_scheme_optional)) -> Optional[Dict[str, Any]]:
+    """Claims for public routes that personalise results when a token is sent."""
+    return get_token_claims(token) if token else None
+
+def get_current_user(claims: Dict[str, Any] = Depends(get_token_claims), db: Session = Depends(get_db)) -> User:
+    try:
+        user_id = UUID(str(claims["sub"]))
+    except Exception:
+        raise AuthError()
+
+    snapshot = user_cache.get(user_id)
+    if snapshot is not None:
+        return _attach_snapshot(db, snapshot)
 
-    user = db.query(User).get(user_id)
+    user = db.get(User, user_id)
     if not user:
         raise AuthError()
+    user_cache.set(user_id, _snapshot(user))
     return user
 
+def _snapshot(user: User) -> Dict[str, Any]:
+    return {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs}
+
+def _attach_snapshot(db: Session, snapshot: Dict[str, Any]) -> User:
+    # Rebuild a persistent User from cached column values without a SELECT.
+    # A fresh instance per request keeps sessions from sharing ORM state.
+    existing = db.identity_map.get(inspect(User).identity_key_from_primary_key((snapshot["id"],)))
+    if existing is not None:
+        return existing
+    user = User(**snapshot)
+    make_transient_to_detached(user)
+    db.add(user)
+    return user
+
+def invalidate_user(user_id: UUID) -> None:
+    user_cache.pop(user_id)
+
+# Any flushed UPDATE/DELETE of a user (profile edits, role changes) drops the cached copy here
+# and, through a NOTIFY that is only delivered if the write commits, in every other worker.
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_on_write(mapper, connection, target: User) -> None:
+    invalidate_user(target.id)
+    connection.execute(notify_stmt(USER_CACHE_CHANNEL, str(target.id)))
+
+def _on_user_notify(payload: Optional[str]) -> None:
+    if payload is None:
+        user_cache.clear()  # (re)connected: invalidations may have been missed
+        return
+    try:
+        invalidate_user(UUID(payload))
+    except ValueError:
+        pass
+
+pg_listener.subscribe(USER_CACHE_CHANNEL, _on_user_notify)
+
+# ----- Profiles -----
+class ProfileIds(NamedTuple):
+    client_id: Optional[UUID] = None
+    provider_id: Optional[UUID] = None
+
+def _profile_ids_select(user_id: UUID):
+    return (
+        select(ClientProfile.id, ProviderProfile.id)
+        .select_from(User)
+        .outerjoin(ClientProfile, ClientProfile.user_id == User.id)
+        .outerjoin(ProviderProfile, ProviderProfile.user_id == User.id)
+        .where(User.id == user_id)
+    )
+
+def load_profile_ids(db: Session, user_id: UUID) -> ProfileIds:
+    """Resolve both profile ids of a user with a single query."""
+    row = db.execute(_profile_ids_select(user_id)).first()
+    return ProfileIds(*row) if row else ProfileIds()
+
+async def load_profile_ids_async(db: AsyncSession, user_id: UUID) -> ProfileIds:
+    row = (await db.execute(_profile_ids_select(user_id))).first()
+    return ProfileIds(*row) if row else ProfileIds()
+
+def _claim_uuid(claims: Dict[str, Any], key: str) -> Optional[UUID]:
+    try:
+        return UUID(str(claims[key])) if claims.get(key) else None
+    except ValueError:
+        return None
+
+def resolve_profile_ids(claims: Dict[str, Any]) -> ProfileIds:
+    """Profile ids from the token, or one lookup on a short-lived session (for long-lived streams)."""
+    ids = ProfileIds(_claim_uuid(claims, "cpid"), _claim_uuid(claims, "ppid"))
+    if None in ids:
+        with SessionLocal() as db:
+            ids = load_profile_ids(db, UUID(str(claims["sub"])))
+    return ids
+
+class RequestProfiles:
+    """Profile ids of the caller, taken from the token and looked up at most once per request.
+
+    Tokens issued before a profile existed carry no id for it, so a missing id
+    triggers one joined lookup that fills in both.
+    """
+
+    def __init__(self, db: Session, user_id: UUID, claims: Dict[str, Any]):
+        self._db = db
+        self._user_id = user_id
+        self._ids = ProfileIds(_claim_uuid(claims, "cpid"), _claim_uuid(claims, "ppid"))
+        self._loaded = False
+
+    def _resolve(self) -> ProfileIds:
+        if not self._loaded and None in self._ids:
+            self._ids = load_profile_ids(self._db, self._user_id)
+            self._loaded = True
+        return self._ids
+
+    @property
+    def client_id(self) -> Optional[UUID]:
+        return self._ids.client_id or self._resolve().client_id
+
+    @property
+    def provider_id(self) -> Optional[UUID]:
+        return self._ids.provider_id or self._resolve().provider_id
+
+def get_request_profiles(
+    claims: Dict[str, Any] = Depends(get_token_claims),
+    current: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+) -> RequestProfiles:
+    return RequestProfiles(db, current.id, claims)
+
+# Sync dependencies: any fallback lookup runs in the threadpool, which keeps async routes off the DB
+def get_profile_ids(profiles: RequestProfiles = Depends(get_request_profiles)) -> ProfileIds:
+    """Both profile ids, resolved up front; for async routes that must not touch the sync Session."""
+    return ProfileIds(profiles.client_id, profiles.provider_id)
+
+def get_client_profile_id(profiles: RequestProfiles = Depends(get_request_profiles)) -> Optional[UUID]:
+    return profiles.client_id
+
+def get_provider_profile_id(profiles: RequestProfiles = Depends(get_request_profiles)) -> Optional[UUID]:
+    return profiles.provider_id
+
 def require_client(current: User = Depends(get_current_user)) -> User:
     if not current.is_client:
         raise HTTPException(status_code=403, detail="Client role required")
@@ -38,6 +184,22 @@ def require_provider(current: User = Depends(get_current_user)) -> User:
         raise HTTPException(status_code=403, detail="Provider role required")
     return current
 
+def require_client_profile(
+    _: User = Depends(require_client),
+    profiles: RequestProfiles = Depends(get_request_profiles),
+) -> UUID:
+    if profiles.client_id is None:
+        raise HTTPException(status_code=403, detail="Client profile required")
+    return profiles.client_id
+
+def require_provider_profile(
+    _: User = Depends(require_provider),
+    profiles: RequestProfiles = Depends(get_request_profiles),
+) -> UUID:
+    if profiles.provider_id is None:
+        raise HTTPException(status_code=403, detail="Provider profile required")
+    return profiles.provider_id
+
 def require_admin(current: User = Depends(get_current_user)) -> User:
     if not current.is_admin:
         raise HTTPException(status_code=403, detail="Admin role required")
@@ -1,4 +1,7 @@
-from fastapi import FastAPI
+import logging
+
+from fastapi import Depends, FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from .config import settings
 from .api.v1 import users
@@ -11,13 +14,70 @@ from .api.v1 import categories as categories_routes
 from .api.v1 import fields as fields_routes
 from .api.v1 import requests as requests_routes
 from .api.v1 import quotes as quotes_routes
+from .api.v1 import events as events_routes
+from .api.v1 import dispatch as dispatch_routes
 from .web import router as web_router
+from .utils import metrics
+from .dependencies.auth import require_admin
+from .models.user import User
+from .database import AsyncSessionLocal, connect_args, listen_conninfo
+from .utils.hashing import HasherBusy, password_hasher
+from .utils.pgnotify import pg_listener
+from .services.quote_expiry import quote_expiry
+from .services.category_tree import category_tree
 
 
+log = logging.getLogger(__name__)
 
 app = FastAPI(title=settings.PROJECT_NAME)
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
+
+@app.exception_handler(HasherBusy)
+def hasher_busy_handler(request: Request, exc: HasherBusy):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Authentication is busy, please retry shortly"},
+        headers={"Retry-After": "2"},
+    )
+
+
+@app.on_event("shutdown")
+def shutdown_password_hasher():
+    password_hasher.shutdown()
+
+
+@app.on_event("startup")
+def start_pg_listener():
+    if settings.PG_NOTIFY_ENABLED:
+        pg_listener.start(listen_conninfo, connect_args)
+
+
+@app.on_event("shutdown")
+def stop_pg_listener():
+    pg_listener.stop()
+
+
+@app.on_event("startup")
+async def start_quote_expiry():
+    if settings.QUOTE_EXPIRY_ENABLED:
+        quote_expiry.start()
+
+
+@app.on_event("shutdown")
+async def stop_quote_expiry():
+    await quote_expiry.stop()
+
+
+@app.on_event("startup")
+async def load_category_tree():
+    try:
+        async with AsyncSessionLocal() as db:
+            await category_tree.get(db)
+    except Exception:  # the first request that needs it loads it instead
+        log.warning("Category tree not loaded at startup", exc_info=True)
+
+
 app.include_router(web_router, tags=["web"])
 app.include_router(auth_routes.router, prefix=f"{settings.API_V1_PREFIX}/auth", tags=["auth"])
 app.include_router(users.router, prefix=f"{settings.API_V1_PREFIX}/users", tags=["users"])
@@ -33,8 +93,16 @@ app.include_router(categories_routes.router, prefix=f"{settings.API_V1_PREFIX}/c
 app.include_router(fields_routes.router,   prefix=f"{settings.API_V1_PREFIX}/fields",   tags=["fields"])
 app.include_router(requests_routes.router, prefix=f"{settings.API_V1_PREFIX}/requests", tags=["requests"])
 app.include_router(quotes_routes.router,   prefix=f"{settings.API_V1_PREFIX}/quotes",   tags=["quotes"])
+app.include_router(events_routes.router,   prefix=f"{settings.API_V1_PREFIX}/events",   tags=["events"])
+app.include_router(dispatch_routes.router, prefix=f"{settings.API_V1_PREFIX}/dispatch", tags=["dispatch"])
 
 
 @app.get("/healthz")
 def healthz():
     return {"ok": True}
+
+
+@app.get("/metrics")
+def metrics_snapshot(_: User = Depends(require_admin)):
+    """Pool, cache and queue internals: admins only."""
+    return metrics.collect()
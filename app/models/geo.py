@@ -1,6 +1,7 @@
 import uuid
 from sqlalchemy import Column, String, Numeric, DateTime, ForeignKey, text
 from sqlalchemy.dialects.postgresql import UUID as PGUUID, JSONB
+from sqlalchemy.orm import deferred
 from ..database import Base
 
 class Field(Base):
@@ -13,6 +14,9 @@ class Field(Base):
     geojson = Column(JSONB, nullable=False)          # full Feature or just geometry; we’re sending Feature
     area_ha = Column(Numeric(12, 4), nullable=False) # cached area in hectares (frontend or server)
     centroid = Column(JSONB, nullable=True)          # GeoJSON Point
+    bbox = Column(JSONB, nullable=True)              # [min_lon, min_lat, max_lon, max_lat]
+    # simplified copies of the geometry keyed by detail level ("high" | "medium" | "low")
+    geometry_variants = deferred(Column(JSONB, nullable=True))
 
     created_at = Column(DateTime(timezone=True), nullable=False, server_default=text("now()"))
     updated_at = Column(DateTime(timezone=True), nullable=False, server_default=text("now()"))
\ No newline at end of file
@@ -1,7 +1,9 @@
 import uuid
 import enum 
-from sqlalchemy import Column, String, Integer, Numeric, Boolean, DateTime, ForeignKey, Text, CheckConstraint, text, Float
-from sqlalchemy.dialects.postgresql import UUID as PGUUID, ENUM as PGEnum, JSONB
+from sqlalchemy import Column, String, Integer, Numeric, Boolean, DateTime, ForeignKey, Text, CheckConstraint, Computed, Index, text, Float
+from sqlalchemy.dialects.postgresql import UUID as PGUUID, ENUM as PGEnum, JSONB, TSVECTOR
+from sqlalchemy.orm import deferred
+from ..config import settings
 from ..database import Base
 
 class Machine(Base):
@@ -35,6 +37,9 @@ class Machine(Base):
 
     __table_args__ = (
         CheckConstraint("status IN ('active','paused','retired')", name="machines_status_ck"),
+        # category subtree filters: marketplace-wide, and within one provider's fleet
+        Index("ix_machines_category_id", category_id),
+        Index("ix_machines_provider_category", provider_id, category_id),
     )
 
 class ListingType(str, enum.Enum):
@@ -59,11 +64,26 @@ class Listing(Base):
     status = Column(String, nullable=False, server_default=text("'active'"))
     max_distance_km = Column(Numeric(6,2))
 
+    # maintained by Postgres; deferred so regular listing reads don't fetch it
+    search_vector = deferred(Column(TSVECTOR, Computed(
+        f"setweight(to_tsvector('{settings.SEARCH_TEXT_CONFIG}', coalesce(title, '')), 'A') || "
+        f"setweight(to_tsvector('{settings.SEARCH_TEXT_CONFIG}', coalesce(description, '')), 'B')",
+        persisted=True,
+    )))
+
     created_at = Column(DateTime(timezone=True), nullable=False, server_default=text("now()"))
     updated_at = Column(DateTime(timezone=True), nullable=False, server_default=text("now()"))
 
     __table_args__ = (
         CheckConstraint("status IN ('active','paused','archived')", name="listings_status_ck"),
+        Index("ix_listings_search_vector", "search_vector", postgresql_using="gin"),
+        # marketplace feed: keyset on (created_at, id) over active listings
+        Index("ix_listings_active_created_at_id", created_at.desc(), id.desc(),
+              postgresql_where=text("status = 'active'")),
+        Index("ix_listings_provider_id", provider_id),
+        # category filters reach listings through their machine or service
+        Index("ix_listings_ref_machine_id", ref_machine_id),
+        Index("ix_listings_ref_service_id", ref_service_id),
     )
 
 class PricingUnit(str, enum.Enum):
@@ -29,6 +29,8 @@ class ProviderProfile(Base):
     tax_id = Column(String)
     verification_status = Column(String, server_default=text("'submitted'"))
     service_radius_km = Column(Numeric(6, 2), server_default=text("50"))
+    base_lat = Column(Numeric(9, 6))   # where machines start from (WGS84)
+    base_lon = Column(Numeric(9, 6))
 
     rating_avg = Column(Numeric(3, 2), server_default=text("0"))
     rating_count = Column(Integer, nullable=False, server_default=text("0"))
@@ -1,6 +1,6 @@
 import uuid
 import enum 
-from sqlalchemy import Column, String, Text, DateTime, Numeric, ForeignKey, CheckConstraint, text, Enum as PgEnum, JSON, TIMESTAMP
+from sqlalchemy import Column, String, Text, DateTime, Numeric, Integer, Float, ForeignKey, CheckConstraint, text, Enum as PgEnum, JSON, TIMESTAMP
 from sqlalchemy.dialects.postgresql import UUID as PGUUID, JSONB
 from sqlalchemy.orm import relationship
 from ..database import Base
@@ -14,6 +14,8 @@ class RequestStatus(str, enum.Enum):
     rejected = "rejected"
     open = "open"
     quoted = "quoted"
+    accepted = "accepted"
+    cancelled = "cancelled"
 
 
 class WorkRequest(Base):
@@ -37,7 +39,16 @@ class WorkRequest(Base):
     created_at = Column(DateTime(timezone=True), nullable=False, server_default=text("now()"))
     updated_at = Column(DateTime(timezone=True), nullable=False, server_default=text("now()"))
 
-    __table_args__ = (CheckConstraint("status IN ('open','quoted','accepted','cancelled')", name="work_requests_status_ck"),)
+    # read-side only, loaded on demand with selectinload (?expand= on request reads)
+    listing = relationship("Listing", viewonly=True)
+    field = relationship("Field", viewonly=True)
+    quotes = relationship("Quote", viewonly=True, order_by="Quote.created_at.desc()")
+
+    __table_args__ = (
+        CheckConstraint("status IN ('open','quoted','accepted','cancelled')", name="work_requests_status_ck"),
+        # provider inbox: requests on my listings by status, newest first
+        sa.Index("ix_work_requests_listing_status_created", listing_id, status, created_at.desc(), id.desc()),
+    )
 
 
 
@@ -69,6 +80,13 @@ class Quote(Base):
 
     items = relationship("QuoteItem", back_populates="quote", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # quotes for one or many requests, newest first
+        sa.Index("ix_quotes_request_created", request_id, created_at.desc()),
+        # expiry sweeper: only live offers are indexed
+        sa.Index("ix_quotes_offered_expires_at", expires_at, postgresql_where=sa.text("status = 'offered'")),
+    )
+
 class QuoteItem(Base):
     __tablename__ = "quote_items"
     id = Column(PGUUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
@@ -80,4 +98,29 @@ class QuoteItem(Base):
     unit_price = Column(Numeric(12,2))
     line_total = Column(Numeric(12,2), nullable=False)
 
-    quote = relationship("Quote", back_populates="items")
\ No newline at end of file
+    quote = relationship("Quote", back_populates="items")
+
+    __table_args__ = (
+        sa.Index("ix_quote_items_quote_id", quote_id),
+    )
+
+
+class RequestMatch(Base):
+    """A provider ranked for a work request by the matching engine (best listing per provider)."""
+    __tablename__ = "request_matches"
+    request_id = Column(PGUUID(as_uuid=True), ForeignKey("work_requests.id", ondelete="CASCADE"), primary_key=True)
+    provider_id = Column(PGUUID(as_uuid=True), ForeignKey("provider_profiles.id", ondelete="CASCADE"), primary_key=True)
+    listing_id = Column(PGUUID(as_uuid=True), ForeignKey("listings.id", ondelete="CASCADE"), nullable=False)
+
+    rank = Column(Integer, nullable=False)        # 1 = best
+    score = Column(Float, nullable=False)         # 0..1
+    distance_km = Column(Float)
+    est_total = Column(Float)                     # indicative, from the listing's cheapest rule
+    currency = Column(String(3))
+
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=sa.text("now()"))
+
+    __table_args__ = (
+        # provider feed: my matches, newest first
+        sa.Index("ix_request_matches_provider_created", provider_id, created_at.desc()),
+    )
@@ -1,3 +1,4 @@
+from typing import Optional
 from uuid import UUID
 from pydantic import BaseModel, ConfigDict
 
@@ -6,3 +7,4 @@ class CategoryRead(BaseModel):
     id: UUID
     type: str
     name: str
+    parent_id: Optional[UUID] = None
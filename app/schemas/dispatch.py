@@ -0,0 +1,41 @@
+from datetime import date
+from typing import List, Optional
+from uuid import UUID
+from pydantic import BaseModel
+
+class DispatchStop(BaseModel):
+    request_id: UUID
+    start: str                  # "HH:MM"
+    end: str
+    work_hours: float
+    travel_km: float            # from the previous stop (or base)
+    time_window: Optional[str] = None
+    delay_days: int = 0         # days after the desired date
+
+class MachineDayPlan(BaseModel):
+    machine_id: UUID
+    label: str = ""
+    stops: List[DispatchStop]
+    work_hours: float
+    travel_km: float
+    travel_hours: float
+    back_at: str
+
+class DispatchDay(BaseModel):
+    date: date
+    machines: List[MachineDayPlan]
+
+class DispatchUnassigned(BaseModel):
+    request_id: UUID
+    reason: str
+
+class DispatchTotals(BaseModel):
+    jobs: int
+    planned: int
+    work_hours: float
+    travel_km: float
+
+class DispatchPlan(BaseModel):
+    days: List[DispatchDay]
+    unassigned: List[DispatchUnassigned]
+    totals: DispatchTotals
@@ -1,20 +1,14 @@
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 from uuid import UUID
-from pydantic import BaseModel, ConfigDict, field_validator
+from pydantic import BaseModel, ConfigDict
 
 class FieldCreate(BaseModel):
     name: str
     geojson: Dict[str, Any]              # { type: "Feature", geometry: {...} }
-    area_ha: float
+    # Accepted for older clients but ignored: area and centroid are computed server-side
+    area_ha: Optional[float] = None
     centroid: Optional[Dict[str, Any]] = None
 
-    @field_validator("area_ha")
-    @classmethod
-    def positive_area(cls, v: float) -> float:
-        if v <= 0:
-            raise ValueError("area_ha must be > 0")
-        return v
-
 class FieldUpdate(BaseModel):
     name: Optional[str] = None
 
@@ -23,6 +17,28 @@ class FieldRead(BaseModel):
     id: UUID
     client_id: UUID
     name: str
-    geojson: Dict[str, Any]
+    geojson: Optional[Dict[str, Any]] = None   # omitted with ?geometry=none
+    area_ha: float
+    centroid: Optional[Dict[str, Any]] = None
+    bbox: Optional[List[float]] = None
+
+class FieldSummary(BaseModel):
+    """A field without its geometry, for embedding in other reads."""
+    id: UUID
+    name: str
     area_ha: float
     centroid: Optional[Dict[str, Any]] = None
+    bbox: Optional[List[float]] = None
+
+class FieldImportResult(BaseModel):
+    index: int                           # position of the feature in the upload
+    ok: bool
+    id: Optional[UUID] = None
+    name: Optional[str] = None
+    area_ha: Optional[float] = None
+    error: Optional[str] = None
+
+class FieldImportReport(BaseModel):
+    imported: int
+    failed: int
+    results: List[FieldImportResult]
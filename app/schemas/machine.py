@@ -46,3 +46,11 @@ class MachineRead(BaseModel):
     telemetry_enabled: Optional[bool] = None
     notes: Optional[str] = None
     status: str
+
+class JobHoursMatrix(BaseModel):
+    """hours[i][j]: machine_ids[i] on request_ids[j], setup included; null when unknown."""
+    machine_ids: list[UUID]
+    request_ids: list[UUID]
+    area_ha: list[Optional[float]]
+    rate_ha_per_hour: list[Optional[float]]  # nominal, per machine
+    hours: list[list[Optional[float]]]
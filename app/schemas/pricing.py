@@ -1,7 +1,9 @@
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from uuid import UUID
 from pydantic import BaseModel, Field, field_validator
 
+from .quotes import QuoteItemIn
+
 ALLOWED_UNITS = {"hour", "hectare", "km", "job"}
 
 class PricingBase(BaseModel):
@@ -85,3 +87,24 @@ class PricingRead(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class PriceEstimateRequest(BaseModel):
+    """Estimate listings for one of your fields, or for a work request (client or provider)."""
+    listing_ids: List[UUID] = Field(default_factory=list, max_length=200)  # defaults to the request's listing
+    field_id: Optional[UUID] = None
+    request_id: Optional[UUID] = None
+    surcharges: List[str] = Field(default_factory=list, description='Surcharge keys that apply, e.g. ["night"]')
+
+
+class PriceEstimate(BaseModel):
+    listing_id: UUID
+    rule_id: Optional[UUID] = None
+    currency: Optional[str] = None
+    subtotal: Optional[float] = None
+    transport_fee: Optional[float] = None
+    total: Optional[float] = None
+    distance_km: Optional[float] = None
+    out_of_range: bool = False
+    items: List[QuoteItemIn] = []
+    reason: Optional[str] = None  # why no estimate could be made
@@ -1,6 +1,6 @@
 from typing import Optional
 from uuid import UUID
-from pydantic import BaseModel, ConfigDict, conint, condecimal
+from pydantic import BaseModel, ConfigDict, confloat, conint, condecimal
 
 # ----- Client -----
 class ClientProfileCreate(BaseModel):
@@ -23,11 +23,15 @@ class ProviderProfileCreate(BaseModel):
     business_name: Optional[str] = None
     tax_id: Optional[str] = None
     service_radius_km: Optional[condecimal(max_digits=6, decimal_places=2)] = None
+    base_lat: Optional[confloat(ge=-90, le=90)] = None
+    base_lon: Optional[confloat(ge=-180, le=180)] = None
 
 class ProviderProfileUpdate(BaseModel):
     business_name: Optional[str] = None
     tax_id: Optional[str] = None
     service_radius_km: Optional[condecimal(max_digits=6, decimal_places=2)] = None
+    base_lat: Optional[confloat(ge=-90, le=90)] = None
+    base_lon: Optional[confloat(ge=-180, le=180)] = None
 
 class ProviderProfileRead(BaseModel):
     model_config = ConfigDict(from_attributes=True)
@@ -37,5 +41,7 @@ class ProviderProfileRead(BaseModel):
     tax_id: Optional[str] = None
     verification_status: Optional[str] = None
     service_radius_km: Optional[condecimal(max_digits=6, decimal_places=2)] = None
+    base_lat: Optional[float] = None
+    base_lon: Optional[float] = None
     rating_avg: Optional[condecimal(max_digits=3, decimal_places=2)] = None
     rating_count: int
@@ -1,4 +1,5 @@
 # app/schemas/quotes.py
+from datetime import datetime
 from uuid import UUID
 from typing import Optional, List, Literal
 from pydantic import BaseModel, Field, conlist, condecimal
@@ -30,9 +31,24 @@ class QuoteRead(BaseModel):
     surcharges: Optional[dict] = None
     total: float
     status: str
-    expires_at: Optional[str] = None
+    expires_at: Optional[datetime] = None
+    created_at: Optional[datetime] = None
     items: list[QuoteItemIn] = []
     message: Optional[str] = None
 
     class Config:
         from_attributes = True
+
+class QuoteSummary(BaseModel):
+    """A quote without its items or message, for comparing offers."""
+    id: UUID
+    request_id: UUID
+    provider_id: UUID
+    currency: str
+    subtotal: float
+    transport_fee: Optional[float] = None
+    total: float
+    status: str
+    expires_at: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+    item_count: int
@@ -1,8 +1,12 @@
 from uuid import UUID
-from typing import Optional
+from typing import Dict, List, Optional
 from pydantic import BaseModel, ConfigDict
 from datetime import datetime
 
+from .field import FieldSummary
+from .listing import ListingRead
+from .quotes import QuoteRead
+
 class WorkRequestCreate(BaseModel):
     listing_id: UUID                  # now required
     field_id: UUID
@@ -24,3 +28,27 @@ class WorkRequestRead(BaseModel):
     time_window: Optional[str] = None
     notes: Optional[str] = None
     status: str
+    created_at: Optional[datetime] = None
+
+class WorkRequestExpanded(WorkRequestRead):
+    # present only when asked for with ?expand=listing,field,quotes,quote_items
+    listing: Optional[ListingRead] = None
+    field: Optional[FieldSummary] = None
+    quotes: Optional[List[QuoteRead]] = None
+
+class RequestMatchRead(BaseModel):
+    listing_id: UUID                  # your listing that matched
+    rank: int
+    score: float
+    distance_km: Optional[float] = None
+    est_total: Optional[float] = None
+    currency: Optional[str] = None
+
+class ProviderRequestRead(WorkRequestExpanded):
+    listing_title: Optional[str] = None
+    match: Optional[RequestMatchRead] = None   # with ?source=matches
+
+class ProviderRequestFeed(BaseModel):
+    items: List[ProviderRequestRead]
+    counts: Dict[str, int]            # per status over the whole source (ignores the status filter)
+    next_cursor: Optional[str] = None
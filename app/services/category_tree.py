@@ -0,0 +1,142 @@
+"""In-memory category tree with precomputed ancestor and descendant sets.
+
+Categories are few and change rarely, so every worker keeps the whole tree:
+the rows /categories serves, plus each category's ancestors and descendants.
+"Tillage and everything under it" is then a set lookup, and filters become
+one `category_id IN (...)` over an indexed column.
+
+The tree is loaded at startup and rebuilt after a change: a trigger on the
+categories table (see setup.py) sends NOTIFY on CATEGORY_CHANNEL, which marks
+the tree stale in every worker and drops cached /categories and listing
+responses. A TTL covers workers that miss the notification.
+"""
+import asyncio
+import time
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models.catalog import Category
+from ..utils import metrics
+from ..utils.http_cache import public_cache
+from ..utils.pgnotify import pg_listener
+
+CATEGORY_CHANNEL = "categories_changed"
+
+CategoryRow = Tuple[UUID, str, str, Optional[UUID]]  # id, type, name, parent_id
+
+
+class CategoryTree:
+    def __init__(self, rows: Iterable[CategoryRow]):
+        rows = sorted(rows, key=lambda r: (r[1], r[2]))
+        self.rows: List[Dict[str, Any]] = [
+            {"id": cid, "type": type_, "name": name, "parent_id": parent_id}
+            for cid, type_, name, parent_id in rows
+        ]
+        parent = {cid: parent_id for cid, _, _, parent_id in rows}
+        # a parent that is missing (or points back into a cycle) ends the chain
+        self.ancestors: Dict[UUID, Tuple[UUID, ...]] = {}
+        for cid in parent:
+            chain: List[UUID] = []
+            p = parent[cid]
+            while p is not None and p in parent and p != cid and p not in chain:
+                chain.append(p)
+                p = parent[p]
+            self.ancestors[cid] = tuple(chain)  # nearest first
+        below: Dict[UUID, set] = {cid: set() for cid in parent}
+        for cid, chain in self.ancestors.items():
+            for a in chain:
+                below[a].add(cid)
+        self.descendants: Dict[UUID, FrozenSet[UUID]] = {cid: frozenset(s) for cid, s in below.items()}
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __contains__(self, category_id: UUID) -> bool:
+        return category_id in self.descendants
+
+    def listing(self, type_: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Rows ordered by type, name (optionally of one type)."""
+        return [r for r in self.rows if r["type"] == type_] if type_ else self.rows
+
+    def subtree(self, category_id: UUID) -> FrozenSet[UUID]:
+        """The category and all its descendants; just itself when not (yet) in the tree."""
+        return self.descendants.get(category_id, frozenset()) | {category_id}
+
+    def resolve(self, category_id: UUID, include_descendants: bool) -> List[UUID]:
+        """category_id values to filter on with a single IN."""
+        return sorted(self.subtree(category_id), key=str) if include_descendants else [category_id]
+
+
+class CategoryTreeHolder:
+    """The current CategoryTree; reloaded when older than the TTL or after a change."""
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._tree: Optional[CategoryTree] = None
+        self._loaded_at = 0.0
+        self._lock = asyncio.Lock()
+        self.reloads = 0
+
+    def invalidate(self, payload: Optional[str] = None) -> None:
+        self._loaded_at = 0.0
+        public_cache.bump("categories", "listings")
+
+    def _fresh(self) -> bool:
+        return self._tree is not None and time.monotonic() - self._loaded_at < self.ttl_seconds
+
+    def _set(self, rows: Iterable[CategoryRow]) -> CategoryTree:
+        self._tree = CategoryTree(rows)
+        self.reloads += 1
+        return self._tree
+
+    async def get(self, db: AsyncSession) -> CategoryTree:
+        if self._fresh():
+            return self._tree
+        async with self._lock:
+            if not self._fresh():
+                self._loaded_at = time.monotonic()  # changes during the load mark it stale again
+                self._set((await db.execute(category_rows_stmt())).all())
+        return self._tree
+
+    def get_sync(self, db: Session) -> CategoryTree:
+        """get() for sync routes; a concurrent reload just loads the same rows twice."""
+        if self._fresh():
+            return self._tree
+        self._loaded_at = time.monotonic()
+        return self._set(db.execute(category_rows_stmt()).all())
+
+    def stats(self) -> Dict[str, Any]:
+        tree = self._tree
+        return {
+            "categories": len(tree) if tree is not None else 0,
+            "roots": sum(1 for a in tree.ancestors.values() if not a) if tree is not None else 0,
+            "depth": max((len(a) for a in tree.ancestors.values()), default=-1) + 1 if tree is not None else 0,
+            "age_seconds": round(time.monotonic() - self._loaded_at, 1) if tree is not None else None,
+            "reloads": self.reloads,
+        }
+
+
+def category_rows_stmt() -> sa.Select:
+    return sa.select(Category.id, Category.type, Category.name, Category.parent_id)
+
+
+def notify_trigger_ddl() -> List[str]:
+    """Statements that make any write to categories NOTIFY CATEGORY_CHANNEL (re-runnable)."""
+    return [
+        f"""CREATE OR REPLACE FUNCTION notify_categories_changed() RETURNS trigger AS $$
+            BEGIN PERFORM pg_notify('{CATEGORY_CHANNEL}', TG_OP); RETURN NULL; END
+            $$ LANGUAGE plpgsql""",
+        "DROP TRIGGER IF EXISTS categories_notify ON categories",
+        """CREATE TRIGGER categories_notify AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON categories
+            FOR EACH STATEMENT EXECUTE FUNCTION notify_categories_changed()""",
+    ]
+
+
+category_tree = CategoryTreeHolder(ttl_seconds=settings.CATEGORY_TREE_TTL_SECONDS)
+metrics.register("category_tree", category_tree.stats)
+pg_listener.subscribe(CATEGORY_CHANNEL, category_tree.invalidate)
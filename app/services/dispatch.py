@@ -0,0 +1,250 @@
+"""Day plans for a provider's machines over their accepted jobs.
+
+Jobs become due on their desired date (undated jobs are due at once) and
+may slip to later days of the horizon when machines are full. Each day,
+routes are grown in parallel nearest-neighbour fashion: the (machine, job)
+pair with the least added road distance is appended until no machine can
+fit another job, including the drive back to base, in its working day. Each
+route is then shortened with 2-opt. Time windows are kept as an order
+(morning before afternoon before evening); flexible jobs go anywhere.
+
+Distances are great-circle kilometres times the road factor of the distance
+service; everything works on one NumPy matrix over base + jobs, so a few
+hundred jobs plan well under a second.
+"""
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Set
+from uuid import UUID
+
+import numpy as np
+
+from .distance import distance_matrix
+from .pricing import WORKDAY_HOURS
+
+ROAD_SPEED_KMH = 40.0      # machines on the road
+DAY_START_HOUR = 8.0
+WINDOW_RANK = {"morning": 0, "afternoon": 1, "evening": 2}
+
+
+@dataclass
+class DispatchJob:
+    request_id: UUID
+    lat: float
+    lon: float
+    hours: float                          # work on the field, travel excluded
+    due: Optional[date] = None            # desired date; None = any day
+    time_window: Optional[str] = None
+    machine_ids: Optional[Set[UUID]] = None  # machines that can do it; None = any
+
+
+@dataclass
+class DispatchMachine:
+    machine_id: UUID
+    label: str = ""
+
+
+@dataclass
+class Route:
+    machine_id: UUID
+    stops: List[int] = field(default_factory=list)  # job indices, in order
+    work_hours: float = 0.0
+    out_km: float = 0.0                              # base -> last stop, while the route grows
+
+
+def road_matrix(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    return distance_matrix.matrix(lat, lon, lat, lon, road=True)
+
+
+def tour_km(dist: np.ndarray, stops: Sequence[int]) -> float:
+    """Base (node 0) -> stops (job i is node i + 1) -> base."""
+    if not stops:
+        return 0.0
+    nodes = np.concatenate(([0], np.asarray(stops) + 1, [0]))
+    return float(dist[nodes[:-1], nodes[1:]].sum())
+
+
+def windows_ordered(ranks: np.ndarray) -> bool:
+    ranked = ranks[ranks >= 0]
+    return bool(np.all(ranked[1:] >= ranked[:-1]))
+
+
+def two_opt(dist: np.ndarray, stops: List[int], ranks: np.ndarray) -> List[int]:
+    """Reverse segments while that shortens the closed tour and keeps the window order."""
+    if len(stops) < 3:
+        return stops
+    tour = np.concatenate(([0], np.asarray(stops) + 1, [0]))
+    n = len(tour)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, n - 2):
+            # gain of reversing tour[i..j] for every j at once
+            j = np.arange(i + 1, n - 1)
+            delta = (
+                dist[tour[i - 1], tour[j]] + dist[tour[i], tour[j + 1]]
+                - dist[tour[i - 1], tour[i]] - dist[tour[j], tour[j + 1]]
+            )
+            for k in np.argsort(delta):
+                if delta[k] >= -1e-9:
+                    break
+                jj = int(j[k])
+                candidate = tour.copy()
+                candidate[i:jj + 1] = candidate[i:jj + 1][::-1]
+                if windows_ordered(ranks[candidate[1:-1] - 1]):
+                    tour = candidate
+                    improved = True
+                    break
+    return (tour[1:-1] - 1).tolist()
+
+
+def plan_day(
+    dist: np.ndarray,
+    jobs: Sequence[DispatchJob],
+    pool: List[int],
+    machines: Sequence[DispatchMachine],
+    ranks: np.ndarray,
+    workday_hours: float,
+) -> List[Route]:
+    """Fill one day's routes from `pool` (job indices); placed jobs are removed from it."""
+    routes = [Route(m.machine_id) for m in machines]
+    hours = np.array([j.hours for j in jobs])
+    home = dist[0, 1:]                     # job -> base
+    open_routes = set(range(len(routes)))
+    pool_arr = np.array(pool, dtype=np.intp)
+    placed = np.zeros(len(jobs), dtype=bool)
+    eligible = np.array([
+        [j.machine_ids is None or m.machine_id in j.machine_ids for m in machines] for j in jobs
+    ], dtype=bool).reshape(len(jobs), len(machines))
+
+    while open_routes and pool_arr.size:
+        best = None
+        for r in list(open_routes):
+            route = routes[r]
+            last = route.stops[-1] + 1 if route.stops else 0
+            used = route.work_hours + route.out_km / ROAD_SPEED_KMH
+            cand = pool_arr[~placed[pool_arr] & eligible[pool_arr, r]]
+            if route.stops and cand.size:
+                # keep the window order: nothing ranked below the route's latest ranked stop
+                floor = max((ranks[s] for s in route.stops if ranks[s] >= 0), default=-1)
+                cand = cand[(ranks[cand] < 0) | (ranks[cand] >= floor)]
+            if cand.size == 0:
+                open_routes.discard(r)
+                continue
+            add = dist[last, cand + 1]
+            fits = used + (add + home[cand]) / ROAD_SPEED_KMH + hours[cand] <= workday_hours
+            if not fits.any():
+                open_routes.discard(r)
+                continue
+            key = np.where(fits, add, np.inf)
+            k = int(np.argmin(key))
+            if best is None or key[k] < best[0]:
+                best = (float(key[k]), r, int(cand[k]))
+        if best is None:
+            break
+        added, r, j = best
+        routes[r].stops.append(j)
+        routes[r].work_hours += float(hours[j])
+        routes[r].out_km += added
+        placed[j] = True
+        pool_arr = pool_arr[~placed[pool_arr]]
+
+    pool[:] = pool_arr.tolist()
+    for route in routes:
+        route.stops = two_opt(dist, route.stops, ranks)
+    return routes
+
+
+def clock(hours: float) -> str:
+    minutes = int(round(hours * 60))
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def plan(
+    base: Sequence[float],
+    machines: Sequence[DispatchMachine],
+    jobs: Sequence[DispatchJob],
+    start: date,
+    days: int,
+    workday_hours: float = WORKDAY_HOURS,
+) -> Dict[str, Any]:
+    """Per-day, per-machine routes for `jobs` over `days` days from `start`, plus what did not fit."""
+    unassigned: List[Dict[str, Any]] = []
+    plannable: List[int] = []
+    for i, j in enumerate(jobs):
+        if not machines:
+            unassigned.append({"request_id": j.request_id, "reason": "No active machines"})
+        elif not (j.hours > 0) or not np.isfinite(j.hours):
+            unassigned.append({"request_id": j.request_id, "reason": "Job duration unknown"})
+        elif j.hours > workday_hours:
+            unassigned.append({"request_id": j.request_id, "reason": "Longer than a working day"})
+        elif j.machine_ids is not None and not (j.machine_ids & {m.machine_id for m in machines}):
+            unassigned.append({"request_id": j.request_id, "reason": "No suitable active machine"})
+        else:
+            plannable.append(i)
+
+    lat = np.array([base[0]] + [j.lat for j in jobs], dtype=float)
+    lon = np.array([base[1]] + [j.lon for j in jobs], dtype=float)
+    dist = road_matrix(lat, lon)
+    ranks = np.array([WINDOW_RANK.get((j.time_window or "").lower(), -1) for j in jobs], dtype=np.intp)
+
+    labels = {m.machine_id: m.label for m in machines}
+    out_days = []
+    waiting = sorted(plannable, key=lambda i: (jobs[i].due or start, i))
+    total_km = total_work = 0.0
+    for offset in range(days):
+        if not waiting:
+            break
+        day = start + timedelta(days=offset)
+        pool = [i for i in waiting if (jobs[i].due or start) <= day]
+        if not pool:
+            continue
+        routes = plan_day(dist, jobs, pool, machines, ranks, workday_hours)
+        left = set(pool)
+        waiting = [i for i in waiting if (jobs[i].due or start) > day or i in left]
+
+        day_machines = []
+        for route in routes:
+            if not route.stops:
+                continue
+            t, prev, stops = DAY_START_HOUR, 0, []
+            for s in route.stops:
+                leg = float(dist[prev, s + 1])
+                t += leg / ROAD_SPEED_KMH
+                stops.append({
+                    "request_id": jobs[s].request_id,
+                    "start": clock(t),
+                    "end": clock(t + jobs[s].hours),
+                    "work_hours": round(jobs[s].hours, 2),
+                    "travel_km": round(leg, 1),
+                    "time_window": jobs[s].time_window,
+                    "delay_days": (day - jobs[s].due).days if jobs[s].due and jobs[s].due < day else 0,
+                })
+                t += jobs[s].hours
+                prev = s + 1
+            km = tour_km(dist, route.stops)
+            total_km += km
+            total_work += route.work_hours
+            day_machines.append({
+                "machine_id": route.machine_id,
+                "label": labels.get(route.machine_id, ""),
+                "stops": stops,
+                "work_hours": round(route.work_hours, 2),
+                "travel_km": round(km, 1),
+                "travel_hours": round(km / ROAD_SPEED_KMH, 2),
+                "back_at": clock(t + float(dist[prev, 0]) / ROAD_SPEED_KMH),
+            })
+        if day_machines:
+            out_days.append({"date": day, "machines": day_machines})
+
+    unassigned += [{"request_id": jobs[i].request_id, "reason": "No capacity in the planning horizon"} for i in waiting]
+    return {
+        "days": out_days,
+        "unassigned": unassigned,
+        "totals": {
+            "jobs": len(jobs),
+            "planned": len(jobs) - len(unassigned),
+            "work_hours": round(total_work, 2),
+            "travel_km": round(total_km, 1),
+        },
+    }
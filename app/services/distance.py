@@ -0,0 +1,168 @@
+"""Provider-to-field distance matrices, cached per worker.
+
+`distance_matrix.matrix(src_lat, src_lon, dst_lat, dst_lon)` gives great-circle
+kilometres between every source (usually provider bases) and every
+destination (usually field centroids) as one (S, D) array. Coordinates are
+rounded to COORD_DECIMALS (about 11 m) first; the rounded arrays are hashed
+into the cache key, so repeating a batch, such as pricing the same field
+against the same listings, is a dict lookup. Large matrices are computed in
+row blocks with the cosines taken once per point, so 10k x 1k needs no
+Python loop over pairs and a bounded amount of scratch memory.
+
+With `road=True` distances are multiplied by a road factor: the mean of the
+factors of the cells the two ends fall in, read from the optional CSV at
+DISTANCE_ROAD_FACTORS_PATH (`lat,lon,factor` rows, one per grid cell of
+DISTANCE_ROAD_FACTOR_CELL_DEG), else DISTANCE_ROAD_FACTOR everywhere.
+
+Returned arrays are shared between callers and read-only; NaN coordinates
+give NaN distances.
+"""
+import csv
+import hashlib
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from ..config import settings
+from ..utils import metrics
+from ..utils.cache import TTLCache
+from ..utils.geo import EARTH_RADIUS_KM
+
+log = logging.getLogger(__name__)
+
+COORD_DECIMALS = 4
+BLOCK_CELLS = 1_000_000  # pairs per block when computing large matrices
+
+
+class RoadFactors:
+    """Road km per great-circle km, per grid cell; `default` outside the table."""
+
+    def __init__(self, default: float, cell_deg: float, table: Optional[Dict[Tuple[int, int], float]] = None):
+        self.default = default
+        self.cell_deg = cell_deg
+        self.cells = len(table or {})
+        if table:
+            ys, xs = zip(*table)
+            self.y0, self.x0 = min(ys), min(xs)
+            self.grid = np.full((max(ys) - self.y0 + 1, max(xs) - self.x0 + 1), default)
+            for (y, x), f in table.items():
+                self.grid[y - self.y0, x - self.x0] = f
+        else:
+            self.y0 = self.x0 = 0
+            self.grid = None
+
+    @classmethod
+    def from_csv(cls, path: str, default: float, cell_deg: float) -> "RoadFactors":
+        table: Dict[Tuple[int, int], float] = {}
+        with open(path, newline="") as fh:
+            for row in csv.DictReader(fh):
+                try:
+                    lat, lon, factor = float(row["lat"]), float(row["lon"]), float(row["factor"])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                if factor >= 1.0:
+                    table[(int(np.floor(lat / cell_deg)), int(np.floor(lon / cell_deg)))] = factor
+        return cls(default, cell_deg, table)
+
+    def at(self, lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+        if self.grid is None:
+            return np.full(np.shape(lat), self.default)
+        with np.errstate(invalid="ignore"):
+            y = np.floor(lat / self.cell_deg) - self.y0
+            x = np.floor(lon / self.cell_deg) - self.x0
+        inside = (y >= 0) & (y < self.grid.shape[0]) & (x >= 0) & (x < self.grid.shape[1])
+        out = np.full(np.shape(lat), self.default)
+        out[inside] = self.grid[y[inside].astype(np.intp), x[inside].astype(np.intp)]
+        return out
+
+
+def _rounded(values: Any) -> np.ndarray:
+    return np.round(np.atleast_1d(np.asarray(values, dtype=float)), COORD_DECIMALS)
+
+
+def great_circle_matrix(src_lat, src_lon, dst_lat, dst_lon) -> np.ndarray:
+    """(S, D) haversine km, computed in row blocks of about BLOCK_CELLS pairs."""
+    lat1, lon1 = np.radians(src_lat)[:, None], np.radians(src_lon)[:, None]
+    lat2, lon2 = np.radians(dst_lat)[None, :], np.radians(dst_lon)[None, :]
+    cos1, cos2 = np.cos(lat1), np.cos(lat2)
+    out = np.empty((lat1.shape[0], lat2.shape[1]))
+    step = max(1, BLOCK_CELLS // max(1, lat2.shape[1]))
+    for start in range(0, out.shape[0], step):
+        rows = slice(start, start + step)
+        a = np.sin((lat2 - lat1[rows]) / 2.0) ** 2
+        a += cos1[rows] * cos2 * np.sin((lon2 - lon1[rows]) / 2.0) ** 2
+        np.clip(a, 0.0, 1.0, out=a)
+        out[rows] = 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+    return out
+
+
+class DistanceMatrixCache:
+    def __init__(self, road_factors: RoadFactors, maxsize: int, max_cells: int, ttl_seconds: float):
+        self.road_factors = road_factors
+        self.max_cells = max_cells
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl_seconds)
+        self.computed_cells = 0
+
+    def matrix(self, src_lat, src_lon, dst_lat, dst_lon, road: bool = False) -> np.ndarray:
+        """(S, D) km between sources and destinations (rounded); read-only."""
+        coords = [_rounded(v) for v in (src_lat, src_lon, dst_lat, dst_lon)]
+        if coords[0].shape != coords[1].shape or coords[2].shape != coords[3].shape:
+            raise ValueError("latitude and longitude arrays differ in length")
+        cells = coords[0].size * coords[2].size
+        key = None
+        if cells <= self.max_cells:
+            h = hashlib.blake2b(digest_size=16)
+            for c in coords:
+                h.update(c.tobytes())
+                h.update(b"|")
+            key = (road, coords[0].size, h.digest())
+            hit = self._cache.get(key)
+            if hit is not None:
+                return hit
+
+        dist = great_circle_matrix(*coords)
+        if road:
+            factor = self.road_factors.at(coords[0], coords[1])[:, None] + self.road_factors.at(coords[2], coords[3])[None, :]
+            dist *= factor / 2.0
+        dist.setflags(write=False)
+        self.computed_cells += cells
+        if key is not None:
+            self._cache.set(key, dist)
+        return dist
+
+    def to_point(self, src_lat, src_lon, lat: float, lon: float, road: bool = False) -> np.ndarray:
+        """(S,) km from every source to one point."""
+        return self.matrix(src_lat, src_lon, [lat], [lon], road)[:, 0]
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._cache.stats(),
+            "max_cells": self.max_cells,
+            "computed_cells": self.computed_cells,
+            "road_factor": self.road_factors.default,
+            "road_factor_cells": self.road_factors.cells,
+        }
+
+
+def load_road_factors() -> RoadFactors:
+    default, cell_deg = settings.DISTANCE_ROAD_FACTOR, settings.DISTANCE_ROAD_FACTOR_CELL_DEG
+    path = settings.DISTANCE_ROAD_FACTORS_PATH
+    if path:
+        try:
+            return RoadFactors.from_csv(path, default, cell_deg)
+        except OSError:
+            log.warning("Road factor table %s unreadable; using %.2f everywhere", path, default)
+    return RoadFactors(default, cell_deg)
+
+
+distance_matrix = DistanceMatrixCache(
+    load_road_factors(),
+    maxsize=settings.DISTANCE_CACHE_SIZE,
+    max_cells=settings.DISTANCE_CACHE_MAX_CELLS,
+    ttl_seconds=settings.DISTANCE_CACHE_TTL_SECONDS,
+)
+metrics.register("distance_matrix", distance_matrix.stats)
@@ -0,0 +1,94 @@
+"""Job duration estimates for (machine, field) pairs.
+
+A machine's nominal work rate (ha/h) is its stated capacity_per_hour or,
+failing that, working width x working speed / 10 x field efficiency. The
+working speed follows the power available per metre of width: a wide
+implement behind a small tractor goes slower than the default, a narrow one
+behind a big tractor faster, within sensible bounds.
+
+Nominal rates are taken as what the machine does on a typical field. Small
+fields lose a larger share of the time to turns and headlands, large ones
+less, so the rate is scaled by the field's efficiency relative to the
+typical one. Dispatch adds a fixed setup time per job (unloading, hitching,
+calibrating); price quantities do not.
+
+Every function broadcasts, so machines shaped (M, 1) against areas shaped
+(1, N) give the whole M x N hour matrix in one call. Unknown inputs are NaN
+and stay NaN in the result.
+"""
+from typing import Any, Optional, Sequence
+
+import numpy as np
+
+DEFAULT_WORK_SPEED_KMH = 8.0
+MIN_WORK_SPEED_KMH = 4.0
+MAX_WORK_SPEED_KMH = 12.0
+REFERENCE_HP_PER_M = 25.0        # power per metre of width at which the default speed holds
+
+TYPICAL_FIELD_EFFICIENCY = 0.75  # what stated and width-based rates assume
+MAX_FIELD_EFFICIENCY = 0.85      # large, regular fields
+MIN_FIELD_EFFICIENCY = 0.55      # tiny plots, mostly turning
+SMALL_FIELD_HA = 5.0             # scale of the drop-off; a field this size is about typical
+
+SETUP_HOURS = 0.25               # per job, on top of work on the field
+
+
+def _floats(values: Any) -> np.ndarray:
+    """Float array from numbers / Decimals / None (None -> NaN)."""
+    if isinstance(values, np.ndarray):
+        return values.astype(float, copy=False)
+    if values is None or np.isscalar(values):
+        return np.array(np.nan if values is None else float(values))
+    return np.array([np.nan if v is None else float(v) for v in values], dtype=float)
+
+
+def _positive(a: np.ndarray) -> np.ndarray:
+    return np.where(a > 0, a, np.nan)
+
+
+def work_speed_kmh(working_width_m: Any, power_hp: Any = None) -> np.ndarray:
+    """Working speed from power per metre of width; the default where power is unknown."""
+    width = _positive(_floats(working_width_m))
+    power = _positive(_floats(power_hp))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        speed = DEFAULT_WORK_SPEED_KMH * np.sqrt(power / width / REFERENCE_HP_PER_M)
+    speed = np.clip(speed, MIN_WORK_SPEED_KMH, MAX_WORK_SPEED_KMH)
+    return np.where(np.isfinite(speed), speed, DEFAULT_WORK_SPEED_KMH)
+
+
+def nominal_rate(capacity_per_hour: Any, working_width_m: Any, power_hp: Any = None) -> np.ndarray:
+    """ha/h on a typical field: stated capacity, else width-based; NaN where neither is known."""
+    stated = _positive(_floats(capacity_per_hour))
+    width = _positive(_floats(working_width_m))
+    from_width = width * work_speed_kmh(width, power_hp) / 10.0 * TYPICAL_FIELD_EFFICIENCY
+    return np.where(np.isfinite(stated), stated, from_width)
+
+
+def machine_rate(capacity_per_hour: Any, working_width_m: Any, power_hp: Any = None) -> Optional[float]:
+    """nominal_rate() for one machine, None when unknown."""
+    rate = float(nominal_rate(capacity_per_hour, working_width_m, power_hp))
+    return rate if np.isfinite(rate) else None
+
+
+def field_efficiency(area_ha: Any) -> np.ndarray:
+    area = np.maximum(_floats(area_ha), 0.0)
+    return MAX_FIELD_EFFICIENCY - (MAX_FIELD_EFFICIENCY - MIN_FIELD_EFFICIENCY) * np.exp(-area / SMALL_FIELD_HA)
+
+
+def work_hours(rate_ha_h: Any, area_ha: Any, setup_hours: float = 0.0) -> np.ndarray:
+    """Hours to work `area_ha` at nominal `rate_ha_h`, plus `setup_hours` for any non-empty job."""
+    rate = _positive(_floats(rate_ha_h))
+    area = np.maximum(_floats(area_ha), 0.0)
+    effective = rate * field_efficiency(area) / TYPICAL_FIELD_EFFICIENCY
+    return area / effective + np.where(area > 0, setup_hours, 0.0)
+
+
+def job_hours(machines: Sequence[Any], areas_ha: Any, setup_hours: float = SETUP_HOURS) -> np.ndarray:
+    """(len(machines), len(areas)) hours; machines are Machine-like rows with
+    capacity_per_hour, working_width_m and power_hp."""
+    rate = nominal_rate(
+        [m.capacity_per_hour for m in machines],
+        [m.working_width_m for m in machines],
+        [m.power_hp for m in machines],
+    ).reshape(-1, 1)
+    return work_hours(rate, _floats(list(areas_ha)).reshape(1, -1), setup_hours)
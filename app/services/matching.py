@@ -0,0 +1,396 @@
+"""Request-to-provider matching.
+
+MatchIndex holds every active listing of a provider with a base location as
+flat NumPy arrays, bucketed by (category, lat/lon cell). Matching a request
+only visits the buckets of its category that lie within the largest reach
+in that category, then scores that candidate set in one vectorised pass:
+
+- distance: how far inside the listing's reach (service radius, capped by
+  the listing's max_distance_km) the field is;
+- suitability: machine capacity against the field area (hours of work);
+- price: the cheapest indicative total of the listing's pricing rules.
+
+A request whose listing has no category (or that has no listing) is matched
+against listings of every category: nothing says which kind of work it is,
+and the score still favours close, capable and cheap providers. Listings
+without a category only ever match such requests.
+
+Rules are stored CSR-style (per-listing offsets into flat rule arrays), so
+candidate prices come out of the same formula estimate() uses, without
+Python loops. Surcharges are left out: they are for the quote, not the rank.
+
+The best listing per provider is kept and the top MATCH_TOP_K providers are
+written to request_matches, which feeds /requests/provider?source=matches.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+import numpy as np
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..database import AsyncSessionLocal
+from ..models.catalog import Service
+from ..models.geo import Field
+from ..models.inventory import Listing, Machine, PricingRule
+from ..models.profile import ProviderProfile
+from ..models.workflow import RequestMatch, RequestStatus, WorkRequest
+from ..utils import events, metrics
+from ..utils.geo import KM_PER_DEG_LAT, haversine_km, point_latlon
+from ..utils.http_cache import HTTP_CACHE_CHANNEL
+from ..utils.pgnotify import pg_listener
+from .job_duration import machine_rate, work_hours
+from .pricing import PRICING_CHANNEL, UNIT_CODES, WORKDAY_HOURS
+from .provider_index import PROVIDER_CHANNEL
+
+log = logging.getLogger(__name__)
+
+# score = sum(weight * component), every component in 0..1
+WEIGHT_DISTANCE = 0.40
+WEIGHT_SUITABILITY = 0.25
+WEIGHT_PRICE = 0.35
+UNKNOWN_SUITABILITY = 0.5  # listings without machine specs are neither favoured nor buried
+
+DEFAULT_SERVICE_RADIUS_KM = 50.0
+NO_CATEGORY = -1
+
+
+@dataclass
+class MatchTarget:
+    category_id: Optional[UUID]
+    lat: float
+    lon: float
+    area_ha: float
+
+
+class MatchIndex:
+    def __init__(self, cell_deg: float):
+        self.cell_deg = cell_deg
+        self.listing_ids: List[UUID] = []
+        self.provider_ids: List[UUID] = []
+        self.provider_code = np.empty(0, dtype=np.intp)
+        self.category = np.empty(0, dtype=np.intp)
+        self.lat = np.empty(0)
+        self.lon = np.empty(0)
+        self.reach_km = np.empty(0)
+        self.cap = np.empty(0)
+        self.category_codes: Dict[Optional[UUID], int] = {}
+        self._cells: Dict[Tuple[int, int, int], np.ndarray] = {}
+        self._category_reach: Dict[int, float] = {}
+        # rules of listing i are rule_*[rule_start[i]:rule_start[i + 1]]
+        self.rule_start = np.zeros(1, dtype=np.intp)
+        self.rule_unit = np.empty(0, dtype=np.intp)
+        self.rule_price = np.empty(0)
+        self.rule_min_qty = np.empty(0)
+        self.rule_flat = np.empty(0)
+        self.rule_per_km = np.empty(0)
+        self.rule_currency: List[str] = []
+
+    @classmethod
+    def build(
+        cls,
+        listings: Iterable[Tuple[UUID, UUID, Optional[UUID], float, float, float, Optional[float]]],
+        rules: Iterable[Tuple[UUID, str, float, Optional[float], Optional[float], Optional[float], Optional[str]]],
+        cell_deg: float,
+    ) -> "MatchIndex":
+        """listings: (listing_id, provider_id, category_id, lat, lon, reach_km, capacity_ha_h);
+        rules: (listing_id, unit, base_price, min_qty, transport_flat_fee, transport_per_km, currency)."""
+        idx = cls(cell_deg)
+        listings = list(listings)
+        if not listings:
+            return idx
+        n = len(listings)
+        idx.listing_ids = [r[0] for r in listings]
+        providers: Dict[UUID, int] = {}
+        idx.provider_code = np.array([providers.setdefault(r[1], len(providers)) for r in listings], dtype=np.intp)
+        idx.provider_ids = list(providers)
+        idx.category_codes = {None: NO_CATEGORY}
+        cat = idx.category = np.array(
+            [idx.category_codes.setdefault(r[2], len(idx.category_codes) - 1) for r in listings], dtype=np.intp
+        )
+        idx.lat = np.array([r[3] for r in listings], dtype=float)
+        idx.lon = np.array([r[4] for r in listings], dtype=float)
+        idx.reach_km = np.array([r[5] for r in listings], dtype=float)
+        idx.cap = np.array([np.nan if r[6] is None else r[6] for r in listings], dtype=float)
+
+        cy = np.floor(idx.lat / cell_deg).astype(np.intp)
+        cx = np.floor(idx.lon / cell_deg).astype(np.intp)
+        order = np.lexsort((cx, cy, cat))
+        keys = np.stack([cat[order], cy[order], cx[order]], axis=1)
+        bounds = np.flatnonzero(np.any(np.diff(keys, axis=0) != 0, axis=1)) + 1
+        for part in np.split(order, bounds):
+            k = part[0]
+            idx._cells[(int(cat[k]), int(cy[k]), int(cx[k]))] = part
+        for code in np.unique(cat).tolist():
+            idx._category_reach[code] = float(idx.reach_km[cat == code].max())
+
+        # rules grouped per listing (CSR)
+        position = {lid: i for i, lid in enumerate(idx.listing_ids)}
+        kept = [
+            (position[r[0]], UNIT_CODES[u], r) for r in rules
+            if r[0] in position and r[2] is not None
+            and (u := getattr(r[1], "value", r[1])) in UNIT_CODES
+        ]
+        kept.sort(key=lambda t: t[0])
+        owners = np.array([k[0] for k in kept], dtype=np.intp)
+        idx.rule_start = np.searchsorted(owners, np.arange(n + 1)).astype(np.intp)
+        idx.rule_unit = np.array([k[1] for k in kept], dtype=np.intp)
+        idx.rule_price = np.array([float(k[2][2]) for k in kept])
+        idx.rule_min_qty = np.array([float(k[2][3] or 0) for k in kept])
+        idx.rule_flat = np.array([float(k[2][4] or 0) for k in kept])
+        idx.rule_per_km = np.array([float(k[2][5] or 0) for k in kept])
+        idx.rule_currency = [k[2][6] or "EUR" for k in kept]
+        return idx
+
+    def __len__(self) -> int:
+        return len(self.listing_ids)
+
+    def candidates(self, category_id: Optional[UUID], lat: float, lon: float) -> np.ndarray:
+        """Listings in the cells around the point; every category when `category_id` is None."""
+        if category_id is None:
+            codes = list(self._category_reach)
+        else:
+            code = self.category_codes.get(category_id)
+            codes = [code] if code in self._category_reach else []
+        if not codes:
+            return np.empty(0, dtype=np.intp)
+        reach = max(self._category_reach[c] for c in codes)
+        dlat = reach / KM_PER_DEG_LAT
+        dlon = reach / (KM_PER_DEG_LAT * max(np.cos(np.radians(lat)), 0.01))
+        y0, y1 = int(np.floor((lat - dlat) / self.cell_deg)), int(np.floor((lat + dlat) / self.cell_deg))
+        x0, x1 = int(np.floor((lon - dlon) / self.cell_deg)), int(np.floor((lon + dlon) / self.cell_deg))
+        parts = [
+            self._cells[(code, y, x)]
+            for code in codes
+            for y in range(y0, y1 + 1)
+            for x in range(x0, x1 + 1)
+            if (code, y, x) in self._cells
+        ]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.intp)
+
+    def cheapest(self, cand: np.ndarray, dist: np.ndarray, area_ha: float) -> Tuple[np.ndarray, np.ndarray]:
+        """(total, rule index) of the cheapest fully priced rule per candidate; NaN / -1 where none."""
+        m = cand.size
+        starts = self.rule_start[cand]
+        counts = self.rule_start[cand + 1] - starts
+        best = np.full(m, np.nan)
+        best_rule = np.full(m, -1, dtype=np.intp)
+        total_rules = int(counts.sum())
+        if total_rules == 0:
+            return best, best_rule
+        owner = np.repeat(np.arange(m), counts)
+        # flat positions of every candidate's rules: its start plus 0..count-1
+        rule = np.repeat(starts, counts) + (np.arange(total_rules) - np.repeat(np.cumsum(counts) - counts, counts))
+
+        unit = self.rule_unit[rule]
+        d = dist[owner]
+        hours = work_hours(self.cap[cand][owner], area_ha)
+        qty = np.select(
+            [unit == 0, unit == 1, unit == 2, unit == 3],
+            [np.full(total_rules, area_ha), hours, np.ceil(hours / WORKDAY_HOURS), d],
+            default=1.0,
+        )
+        qty = np.maximum(qty, self.rule_min_qty[rule])
+        total = qty * self.rule_price[rule] + self.rule_flat[rule] + self.rule_per_km[rule] * d
+        total = np.where(np.isfinite(total), total, np.inf)
+
+        order = np.lexsort((total, owner))
+        heads = order[np.unique(owner[order], return_index=True)[1]]
+        ok = np.isfinite(total[heads])
+        best[owner[heads[ok]]] = total[heads[ok]]
+        best_rule[owner[heads[ok]]] = rule[heads[ok]]
+        return best, best_rule
+
+    def match(self, target: MatchTarget, top_k: int) -> List[Dict[str, Any]]:
+        """Best listing per provider that can reach the field, highest score first."""
+        cand = self.candidates(target.category_id, target.lat, target.lon)
+        if cand.size == 0:
+            return []
+        dist = haversine_km(target.lat, target.lon, self.lat[cand], self.lon[cand])
+        inside = dist <= self.reach_km[cand]
+        cand, dist = cand[inside], dist[inside]
+        if cand.size == 0:
+            return []
+
+        reach = self.reach_km[cand]
+        distance_score = np.where(reach > 0, 1.0 - dist / np.where(reach > 0, reach, 1.0), 1.0)
+        hours = work_hours(self.cap[cand], target.area_ha)
+        suitability = np.where(np.isfinite(hours), 1.0 / (1.0 + hours / WORKDAY_HOURS), UNKNOWN_SUITABILITY)
+        price, rule = self.cheapest(cand, dist, target.area_ha)
+        priced = np.isfinite(price) & (price > 0)
+        price_score = np.zeros(cand.size)
+        if priced.any():
+            price_score[priced] = price[priced].min() / price[priced]
+        score = WEIGHT_DISTANCE * distance_score + WEIGHT_SUITABILITY * suitability + WEIGHT_PRICE * price_score
+
+        # one listing per provider: the best-scoring one
+        order = np.argsort(-score, kind="stable")
+        firsts = np.sort(np.unique(self.provider_code[cand[order]], return_index=True)[1])
+        picks = order[firsts][:top_k]
+        return [
+            {
+                "provider_id": self.provider_ids[self.provider_code[cand[k]]],
+                "listing_id": self.listing_ids[cand[k]],
+                "rank": rank,
+                "score": round(float(score[k]), 4),
+                "distance_km": round(float(dist[k]), 2),
+                "est_total": round(float(price[k]), 2) if np.isfinite(price[k]) else None,
+                "currency": self.rule_currency[rule[k]] if rule[k] >= 0 else None,
+            }
+            for rank, k in enumerate(picks.tolist(), start=1)
+        ]
+
+
+class MatchIndexHolder:
+    """The current MatchIndex; rebuilt when older than the TTL or after a listing, pricing or provider profile change."""
+
+    def __init__(self, ttl_seconds: float, cell_deg: float):
+        self.ttl_seconds = ttl_seconds
+        self.cell_deg = cell_deg
+        self._index: Optional[MatchIndex] = None
+        self._built_at = 0.0
+        self._lock = asyncio.Lock()
+        self.rebuilds = 0
+        self.last_build_ms = 0.0
+
+    def invalidate(self, payload: Optional[str] = None) -> None:
+        self._built_at = 0.0
+
+    def _fresh(self) -> bool:
+        return self._index is not None and time.monotonic() - self._built_at < self.ttl_seconds
+
+    async def get(self, db: AsyncSession) -> MatchIndex:
+        if self._fresh():
+            return self._index
+        async with self._lock:
+            if not self._fresh():
+                started = time.perf_counter()
+                self._built_at = time.monotonic()  # changes during the load mark it stale again
+                self._index = await load_match_index(db, self.cell_deg)
+                self.rebuilds += 1
+                self.last_build_ms = round((time.perf_counter() - started) * 1000, 1)
+        return self._index
+
+    def stats(self) -> Dict[str, Any]:
+        idx = self._index
+        return {
+            "listings": len(idx) if idx is not None else 0,
+            "cells": len(idx._cells) if idx is not None else 0,
+            "categories": len(idx._category_reach) if idx is not None else 0,
+            "age_seconds": round(time.monotonic() - self._built_at, 1) if idx is not None else None,
+            "rebuilds": self.rebuilds,
+            "last_build_ms": self.last_build_ms,
+            **match_stats,
+        }
+
+
+async def load_match_index(db: AsyncSession, cell_deg: float) -> MatchIndex:
+    reach = sa.func.coalesce(ProviderProfile.service_radius_km, DEFAULT_SERVICE_RADIUS_KM)
+    rows = (await db.execute(
+        sa.select(
+            Listing.id, Listing.provider_id,
+            sa.func.coalesce(Machine.category_id, Service.category_id),
+            ProviderProfile.base_lat, ProviderProfile.base_lon,
+            sa.case(
+                (Listing.max_distance_km.is_not(None), sa.func.least(reach, Listing.max_distance_km)),
+                else_=reach,
+            ),
+            Machine.capacity_per_hour, Machine.working_width_m, Machine.power_hp,
+        )
+        .join(ProviderProfile, ProviderProfile.id == Listing.provider_id)
+        .outerjoin(Machine, Machine.id == Listing.ref_machine_id)
+        .outerjoin(Service, Service.id == Listing.ref_service_id)
+        .where(
+            Listing.status == "active",
+            ProviderProfile.base_lat.is_not(None),
+            ProviderProfile.base_lon.is_not(None),
+        )
+    )).all()
+    rules = (await db.execute(
+        sa.select(
+            PricingRule.listing_id, PricingRule.unit, PricingRule.base_price, PricingRule.min_qty,
+            PricingRule.transport_flat_fee, PricingRule.transport_per_km, PricingRule.currency,
+        ).where(PricingRule.listing_id.in_(sa.select(Listing.id).where(Listing.status == "active")))
+    )).all()
+    # building is pure Python over every listing and rule (~0.5 s at 50k): keep it off the event loop
+    return await asyncio.to_thread(_build_index, rows, rules, cell_deg)
+
+
+def _build_index(rows: List[Any], rules: List[Any], cell_deg: float) -> MatchIndex:
+    listings = [
+        (lid, pid, cat, float(lat), float(lon), float(r), machine_rate(cap, width, power))
+        for lid, pid, cat, lat, lon, r, cap, width, power in rows
+    ]
+    return MatchIndex.build(listings, rules, cell_deg)
+
+
+async def load_match_target(db: AsyncSession, request_id: UUID) -> Optional[MatchTarget]:
+    """What to match for an open or quoted request; None if it is closed or its field has no centroid."""
+    row = (await db.execute(
+        sa.select(
+            WorkRequest.status, Field.area_ha, Field.centroid,
+            sa.func.coalesce(Machine.category_id, Service.category_id),
+        )
+        .join(Field, Field.id == WorkRequest.field_id)
+        .outerjoin(Listing, Listing.id == WorkRequest.listing_id)
+        .outerjoin(Machine, Machine.id == Listing.ref_machine_id)
+        .outerjoin(Service, Service.id == Listing.ref_service_id)
+        .where(WorkRequest.id == request_id)
+    )).first()
+    if row is None or row[0] not in (RequestStatus.open, RequestStatus.quoted):
+        return None
+    point = point_latlon(row[2])
+    if point is None:
+        return None
+    return MatchTarget(category_id=row[3], lat=point[0], lon=point[1], area_ha=float(row[1] or 0))
+
+
+match_stats = {"runs": 0, "matched": 0, "last_match_ms": 0.0, "errors": 0}
+
+
+async def match_request(request_id: UUID) -> List[Dict[str, Any]]:
+    """Rank providers for a request, replace its stored matches and tell the matched providers."""
+    try:
+        async with AsyncSessionLocal() as db:
+            target = await load_match_target(db, request_id)
+            if target is None:
+                return []
+            index = await match_index.get(db)
+            started = time.perf_counter()
+            matches = index.match(target, settings.MATCH_TOP_K)
+            match_stats["last_match_ms"] = round((time.perf_counter() - started) * 1000, 3)
+
+            await db.execute(sa.delete(RequestMatch).where(RequestMatch.request_id == request_id))
+            event = None
+            if matches:
+                await db.execute(sa.insert(RequestMatch), [{"request_id": request_id, **m} for m in matches])
+                event = events.make_event(
+                    "request.matched", [events.provider_scope(m["provider_id"]) for m in matches],
+                    request_id=request_id,
+                )
+                await db.execute(events.event_notify_stmt(event))
+            await db.commit()
+        if event is not None:
+            events.event_broker.publish(event)
+        match_stats["runs"] += 1
+        match_stats["matched"] += len(matches)
+        return matches
+    except Exception:
+        match_stats["errors"] += 1
+        log.warning("matching request %s failed", request_id, exc_info=True)
+        return []
+
+
+match_index = MatchIndexHolder(
+    ttl_seconds=settings.MATCH_INDEX_TTL_SECONDS,
+    cell_deg=settings.MATCH_INDEX_CELL_DEG,
+)
+metrics.register("matching", match_index.stats)
+pg_listener.subscribe(PRICING_CHANNEL, match_index.invalidate)
+pg_listener.subscribe(HTTP_CACHE_CHANNEL, match_index.invalidate)
+pg_listener.subscribe(PROVIDER_CHANNEL, match_index.invalidate)
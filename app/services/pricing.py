@@ -0,0 +1,385 @@
+"""Listing pricing: compiled rule cache, summaries and price estimates.
+
+Pricing rules are compiled once per listing (rule tuples, the shaped JSON and
+the one-line summary) and kept in a per-worker cache. Writes invalidate it
+locally and, through NOTIFY on PRICING_CHANNEL, in every other worker.
+
+Estimates evaluate all rules of all candidate listings together as NumPy
+arrays; per listing the cheapest rule that can be fully priced wins and is
+expanded into quote-item lines.
+"""
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+from uuid import UUID
+
+import numpy as np
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models.inventory import Listing, Machine, PricingRule
+from ..models.profile import ProviderProfile
+from ..utils import metrics
+from ..utils.cache import TTLCache
+from ..utils.geo import point_latlon
+from ..utils.pgnotify import notify_stmt, pg_listener
+from .distance import distance_matrix
+from .job_duration import machine_rate, work_hours
+
+PRICING_CHANNEL = "pricing_rules"
+
+WORKDAY_HOURS = 8.0
+
+UNIT_CODES = {"hectare": 0, "hour": 1, "day": 2, "km": 3, "job": 4}
+
+
+# ---------------------------------------------------------------------------
+# Compiled rules, shaping and the per-listing cache
+# ---------------------------------------------------------------------------
+class CompiledRule(NamedTuple):
+    id: UUID
+    listing_id: UUID
+    unit: str
+    base_price: float
+    min_qty: Optional[float]
+    transport_flat_fee: Optional[float]
+    transport_per_km: Optional[float]
+    currency: str
+    surcharges: Optional[Dict[str, Any]]
+
+
+@dataclass(frozen=True)
+class ListingPrices:
+    rules: Tuple[CompiledRule, ...]
+    prices: List[Dict[str, Any]]  # shared between requests: read-only
+    summary: str
+
+
+def shape_price(p: Any) -> Dict[str, Any]:
+    return {
+        "id": str(p.id),
+        "listing_id": str(p.listing_id),
+        "unit": getattr(p.unit, "value", p.unit),
+        "base_price": float(p.base_price) if p.base_price is not None else None,
+        "min_qty": p.min_qty,
+        "transport_flat_fee": p.transport_flat_fee,
+        "transport_per_km": p.transport_per_km,
+        "currency": p.currency or "EUR",
+        "surcharges": p.surcharges,
+    }
+
+
+def prices_summary_text(prices: List[Dict[str, Any]]) -> str:
+    if not prices:
+        return "Ask for a quote"
+    parts: List[str] = []
+    for p in sorted(prices, key=lambda x: (x.get("unit") or "", x.get("base_price") or 0))[:3]:
+        bp = p.get("base_price")
+        cur = p.get("currency", "EUR")
+        unit = p.get("unit") or ""
+        seg = []
+        if bp is not None and unit:
+            text = f"{bp:g} {cur} / {unit}"
+            if p.get("min_qty") not in (None, 0):
+                text += f" (min {p['min_qty']})"
+            seg.append(text)
+        tf = p.get("transport_flat_fee")
+        tkm = p.get("transport_per_km")
+        if tf is not None or tkm is not None:
+            tparts = []
+            if tf is not None:
+                tparts.append(f"flat {tf:g} {cur}")
+            if tkm is not None:
+                tparts.append(f"{tkm:g} {cur}/km")
+            seg.append("transport: " + " + ".join(tparts))
+        if seg:
+            parts.append(" · ".join(seg))
+    return " · ".join(parts) if parts else "Ask for a quote"
+
+
+def compile_listing(rules: Sequence[CompiledRule]) -> ListingPrices:
+    rules = tuple(sorted(rules, key=lambda r: (r.unit, r.base_price)))
+    prices = [shape_price(r) for r in rules]
+    return ListingPrices(rules=rules, prices=prices, summary=prices_summary_text(prices))
+
+
+class PricingRuleCache:
+    """listing_id -> ListingPrices, filled with one IN query for all misses of a call."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    def invalidate(self, listing_ids: Optional[Iterable[UUID]] = None) -> None:
+        # bumping the generation stops loads that started before this from being stored
+        with self._lock:
+            self._generation += 1
+        if listing_ids is None:
+            self._cache.clear()
+        else:
+            for lid in listing_ids:
+                self._cache.pop(lid)
+
+    def on_notify(self, payload: Optional[str]) -> None:
+        try:
+            ids = [UUID(p) for p in payload.split(",")] if payload else None
+        except ValueError:
+            ids = None
+        self.invalidate(ids)
+
+    async def get_many(self, db: AsyncSession, listing_ids: Iterable[UUID]) -> Dict[UUID, ListingPrices]:
+        out: Dict[UUID, ListingPrices] = {}
+        missing: List[UUID] = []
+        for lid in dict.fromkeys(listing_ids):
+            hit = self._cache.get(lid)
+            if hit is None:
+                missing.append(lid)
+            else:
+                out[lid] = hit
+        if not missing:
+            return out
+
+        generation = self._generation
+        rows = (await db.execute(
+            sa.select(
+                PricingRule.id, PricingRule.listing_id, PricingRule.unit, PricingRule.base_price,
+                PricingRule.min_qty, PricingRule.transport_flat_fee, PricingRule.transport_per_km,
+                PricingRule.currency, PricingRule.surcharges,
+            ).where(PricingRule.listing_id.in_(missing))
+        )).all()
+        grouped: Dict[UUID, List[CompiledRule]] = {}
+        for r in rows:
+            grouped.setdefault(r.listing_id, []).append(CompiledRule(
+                r.id, r.listing_id, getattr(r.unit, "value", r.unit), r.base_price, r.min_qty,
+                r.transport_flat_fee, r.transport_per_km, r.currency or "EUR", r.surcharges,
+            ))
+        store = generation == self._generation
+        for lid in missing:
+            out[lid] = compile_listing(grouped.get(lid, ()))
+            if store:
+                self._cache.set(lid, out[lid])
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._cache.stats(), "generation": self._generation}
+
+
+pricing_cache = PricingRuleCache(settings.PRICING_CACHE_MAXSIZE, settings.PRICING_CACHE_TTL_SECONDS)
+metrics.register("pricing_cache", pricing_cache.stats)
+pg_listener.subscribe(PRICING_CHANNEL, pricing_cache.on_notify)
+
+
+def announce_pricing_change(db: Session, *listing_ids: Optional[UUID]) -> List[UUID]:
+    """Queue a NOTIFY in the current transaction; call pricing_cache.invalidate(ids) after commit."""
+    ids = [lid for lid in dict.fromkeys(listing_ids) if lid is not None]
+    if ids:
+        db.execute(notify_stmt(PRICING_CHANNEL, ",".join(str(i) for i in ids)))
+    return ids
+
+
+# ---------------------------------------------------------------------------
+# Estimates
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class ListingPricing:
+    """What the estimator needs to know about one listing."""
+    listing_id: UUID
+    provider_id: UUID
+    base_lat: Optional[float]
+    base_lon: Optional[float]
+    max_distance_km: Optional[float]
+    capacity_ha_per_hour: Optional[float]
+    rules: Sequence[Any] = field(default_factory=list)  # PricingRule-like objects
+
+
+@dataclass
+class EstimateTarget:
+    area_ha: float
+    lat: Optional[float] = None
+    lon: Optional[float] = None
+    surcharges: Sequence[str] = ()  # surcharge keys that apply (e.g. "weekend")
+
+
+def surcharge_terms(surcharges: Any, applied: Iterable[str]) -> Tuple[float, float, List[Tuple[str, float, float]]]:
+    """(multiplier, flat amount, [(key, multiplier, amount)]) for the applied surcharge keys.
+
+    A number is a multiplier on the base amount ({"weekend": 1.15}); an object
+    may give {"pct": 15} and/or {"amount": 20}. Unknown shapes are ignored.
+    """
+    if not isinstance(surcharges, dict):
+        return 1.0, 0.0, []
+    wanted = {k.lower() for k in applied}
+    mult, flat, used = 1.0, 0.0, []
+    for key, value in surcharges.items():
+        if str(key).lower() not in wanted:
+            continue
+        m, a = 1.0, 0.0
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and value > 0:
+            m = float(value)
+        elif isinstance(value, dict):
+            try:
+                m = 1.0 + float(value.get("pct") or 0) / 100.0
+                a = float(value.get("amount") or 0)
+            except (TypeError, ValueError):
+                continue
+        else:
+            continue
+        mult *= m
+        flat += a
+        used.append((str(key), m, a))
+    return mult, flat, used
+
+
+def field_target(area_ha: Any, centroid: Any, surcharges: Sequence[str] = (), desired_date: Any = None) -> EstimateTarget:
+    """Estimate target for a field; a work request dated on a weekend also applies "weekend"."""
+    point = point_latlon(centroid)
+    applied = list(surcharges)
+    if desired_date is not None and desired_date.weekday() >= 5:
+        applied.append("weekend")
+    return EstimateTarget(
+        area_ha=float(area_ha or 0),
+        lat=point[0] if point else None,
+        lon=point[1] if point else None,
+        surcharges=applied,
+    )
+
+
+def _opt(v: Any) -> float:
+    return float(v) if v is not None else np.nan
+
+
+def estimate(listings: Sequence[ListingPricing], target: EstimateTarget) -> Dict[UUID, Dict[str, Any]]:
+    """listing_id -> itemised estimate (or a reason why none could be made)."""
+    out: Dict[UUID, Dict[str, Any]] = {}
+    if not listings:
+        return out
+
+    # per-listing vectors
+    base_lat = np.array([_opt(l.base_lat) for l in listings])
+    base_lon = np.array([_opt(l.base_lon) for l in listings])
+    if target.lat is not None and target.lon is not None:
+        dist = distance_matrix.to_point(base_lat, base_lon, target.lat, target.lon)  # NaN where no base
+    else:
+        dist = np.full(len(listings), np.nan)
+    cap = np.array([_opt(l.capacity_ha_per_hour) for l in listings])
+
+    # per-rule vectors
+    rules, owner = [], []
+    for i, l in enumerate(listings):
+        for r in l.rules:
+            unit = getattr(r.unit, "value", r.unit)
+            if unit in UNIT_CODES and r.base_price is not None:
+                rules.append(r)
+                owner.append(i)
+    if not rules:
+        for l in listings:
+            out[l.listing_id] = {"listing_id": l.listing_id, "total": None, "reason": "No pricing rules"}
+        return out
+
+    li = np.array(owner, dtype=np.intp)
+    unit = np.array([UNIT_CODES[getattr(r.unit, "value", r.unit)] for r in rules])
+    base_price = np.array([float(r.base_price) for r in rules])
+    min_qty = np.nan_to_num(np.array([_opt(r.min_qty) for r in rules]))
+    flat_fee = np.nan_to_num(np.array([_opt(r.transport_flat_fee) for r in rules]))
+    per_km = np.nan_to_num(np.array([_opt(r.transport_per_km) for r in rules]))
+    terms = [surcharge_terms(r.surcharges, target.surcharges) for r in rules]
+    s_mult = np.array([t[0] for t in terms])
+    s_flat = np.array([t[1] for t in terms])
+
+    r_dist, r_cap = dist[li], cap[li]
+    hours = work_hours(r_cap, target.area_ha)
+    qty = np.select(
+        [unit == 0, unit == 1, unit == 2, unit == 3],
+        [np.full(len(rules), target.area_ha), hours, np.ceil(hours / WORKDAY_HOURS), r_dist],
+        default=1.0,
+    )
+    qty = np.maximum(qty, min_qty)  # NaN (unknown quantity) propagates
+    base_total = qty * base_price
+    transport = flat_fee + per_km * np.nan_to_num(r_dist)
+    surcharge = base_total * (s_mult - 1.0) + s_flat
+    total = base_total + transport + surcharge
+    # a rule is only usable if every quantity it needs is known
+    priced = np.isfinite(total) & ((per_km == 0) | np.isfinite(r_dist))
+
+    # cheapest usable rule per listing: sort by (listing, total) and take each group's head
+    order = np.lexsort((np.where(priced, total, np.inf), li))
+    heads = order[np.unique(li[order], return_index=True)[1]]
+
+    chosen = {int(li[k]): int(k) for k in heads if priced[k]}
+    has_rules = set(owner)
+    for i, l in enumerate(listings):
+        d = float(dist[i]) if np.isfinite(dist[i]) else None
+        k = chosen.get(i)
+        if k is None:
+            reason = "No pricing rules" if i not in has_rules else (
+                "Distance unknown" if not np.isfinite(dist[i]) else "Machine capacity unknown"
+            )
+            out[l.listing_id] = {"listing_id": l.listing_id, "total": None, "distance_km": d, "reason": reason}
+            continue
+        r = rules[k]
+        cur = r.currency or "EUR"
+        unit_name = getattr(r.unit, "value", r.unit)
+        items = [{
+            "kind": "base",
+            "description": f"{unit_name} rate" + (f" (min {r.min_qty:g})" if r.min_qty else ""),
+            "unit": unit_name,
+            "qty": round(float(qty[k]), 2),
+            "unit_price": round(float(base_price[k]), 2),
+            "line_total": round(float(base_total[k]), 2),
+        }]
+        if flat_fee[k]:
+            items.append({"kind": "misc", "description": "Transport (flat)", "unit": None,
+                          "qty": None, "unit_price": None, "line_total": round(float(flat_fee[k]), 2)})
+        if per_km[k]:
+            items.append({"kind": "transport_km", "description": "Transport distance", "unit": "km",
+                          "qty": round(d, 2), "unit_price": round(float(per_km[k]), 2),
+                          "line_total": round(float(per_km[k] * dist[i]), 2)})
+        for key, m, a in terms[k][2]:
+            items.append({"kind": "surcharge", "description": f"Surcharge: {key}", "unit": None, "qty": None,
+                          "unit_price": None, "line_total": round(float(base_total[k] * (m - 1.0) + a), 2)})
+        out[l.listing_id] = {
+            "listing_id": l.listing_id,
+            "rule_id": r.id,
+            "currency": cur,
+            "subtotal": round(float(base_total[k] + surcharge[k]), 2),
+            "transport_fee": round(float(transport[k]), 2),
+            "total": round(float(total[k]), 2),
+            "distance_km": round(d, 2) if d is not None else None,
+            "out_of_range": bool(d is not None and l.max_distance_km is not None and d > float(l.max_distance_km)),
+            "items": items,
+        }
+    return out
+
+
+async def load_listing_pricing(db: AsyncSession, listing_ids: Sequence[UUID]) -> List[ListingPricing]:
+    """Listings with provider base and machine capacity (one query) plus their cached rules."""
+    if not listing_ids:
+        return []
+    rows = (await db.execute(
+        sa.select(
+            Listing.id, Listing.provider_id, Listing.max_distance_km,
+            ProviderProfile.base_lat, ProviderProfile.base_lon,
+            Machine.capacity_per_hour, Machine.working_width_m, Machine.power_hp,
+        )
+        .join(ProviderProfile, ProviderProfile.id == Listing.provider_id)
+        .outerjoin(Machine, Machine.id == Listing.ref_machine_id)
+        .where(Listing.id.in_(list(listing_ids)))
+    )).all()
+    compiled = await pricing_cache.get_many(db, [r.id for r in rows])
+    return [
+        ListingPricing(
+            listing_id=r.id,
+            provider_id=r.provider_id,
+            base_lat=r.base_lat,
+            base_lon=r.base_lon,
+            max_distance_km=r.max_distance_km,
+            capacity_ha_per_hour=machine_rate(r.capacity_per_hour, r.working_width_m, r.power_hp),
+            rules=compiled[r.id].rules,
+        )
+        for r in rows
+    ]
@@ -0,0 +1,148 @@
+"""In-memory grid index over provider base locations.
+
+Providers are bucketed into fixed lat/lon cells. A radius query only visits
+the cells overlapping the largest service radius around the point, then
+filters that candidate set with one vectorised haversine pass.
+
+Profile writes queue a NOTIFY on PROVIDER_CHANNEL (announce_provider_change)
+so every worker rebuilds, not only the one that served the edit.
+"""
+import asyncio
+import math
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+import numpy as np
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models.profile import ProviderProfile
+from ..utils import metrics
+from ..utils.geo import KM_PER_DEG_LAT, haversine_km
+from ..utils.pgnotify import notify_stmt, pg_listener
+
+PROVIDER_CHANNEL = "provider_locations"
+
+
+class ProviderGridIndex:
+    def __init__(self, cell_deg: float):
+        self.cell_deg = cell_deg
+        self.provider_ids: List[UUID] = []
+        self.lat = np.empty(0)
+        self.lon = np.empty(0)
+        self.radius_km = np.empty(0)
+        self.max_radius_km = 0.0
+        self._cells: Dict[Tuple[int, int], np.ndarray] = {}
+
+    @classmethod
+    def build(cls, rows: Iterable[Tuple[UUID, float, float, float]], cell_deg: float) -> "ProviderGridIndex":
+        idx = cls(cell_deg)
+        rows = list(rows)
+        if not rows:
+            return idx
+        idx.provider_ids = [r[0] for r in rows]
+        idx.lat = np.array([r[1] for r in rows], dtype=float)
+        idx.lon = np.array([r[2] for r in rows], dtype=float)
+        idx.radius_km = np.array([r[3] for r in rows], dtype=float)
+        idx.max_radius_km = float(idx.radius_km.max())
+
+        buckets: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        cy = np.floor(idx.lat / cell_deg).astype(int)
+        cx = np.floor(idx.lon / cell_deg).astype(int)
+        for i, key in enumerate(zip(cy.tolist(), cx.tolist())):
+            buckets[key].append(i)
+        idx._cells = {k: np.array(v, dtype=np.intp) for k, v in buckets.items()}
+        return idx
+
+    def __len__(self) -> int:
+        return len(self.provider_ids)
+
+    def _candidates(self, lat: float, lon: float, radius_km: float) -> np.ndarray:
+        dlat = radius_km / KM_PER_DEG_LAT
+        dlon = radius_km / (KM_PER_DEG_LAT * max(math.cos(math.radians(lat)), 0.01))
+        y0, y1 = math.floor((lat - dlat) / self.cell_deg), math.floor((lat + dlat) / self.cell_deg)
+        x0, x1 = math.floor((lon - dlon) / self.cell_deg), math.floor((lon + dlon) / self.cell_deg)
+        if (y1 - y0 + 1) * (x1 - x0 + 1) > len(self._cells):
+            # query box wider than the populated grid: scanning every cell is cheaper
+            parts = list(self._cells.values())
+        else:
+            parts = [
+                self._cells[(y, x)]
+                for y in range(y0, y1 + 1)
+                for x in range(x0, x1 + 1)
+                if (y, x) in self._cells
+            ]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.intp)
+
+    def reachable(self, lat: float, lon: float) -> Dict[UUID, float]:
+        """provider_id -> distance_km for every provider whose service radius covers the point."""
+        if not self.provider_ids:
+            return {}
+        cand = self._candidates(lat, lon, self.max_radius_km)
+        if cand.size == 0:
+            return {}
+        dist = haversine_km(lat, lon, self.lat[cand], self.lon[cand])
+        ok = dist <= self.radius_km[cand]
+        return {self.provider_ids[i]: float(d) for i, d in zip(cand[ok].tolist(), dist[ok].tolist())}
+
+
+class ProviderLocator:
+    """Holds the current ProviderGridIndex and rebuilds it when stale or invalidated."""
+
+    def __init__(self, ttl_seconds: float, cell_deg: float):
+        self.ttl_seconds = ttl_seconds
+        self.cell_deg = cell_deg
+        self._index: Optional[ProviderGridIndex] = None
+        self._built_at = 0.0
+        self._lock = asyncio.Lock()
+        self.rebuilds = 0
+
+    def invalidate(self, payload: Optional[str] = None) -> None:
+        self._built_at = 0.0
+
+    def _fresh(self) -> bool:
+        return self._index is not None and time.monotonic() - self._built_at < self.ttl_seconds
+
+    async def get(self, db: AsyncSession) -> ProviderGridIndex:
+        if self._fresh():
+            return self._index
+        async with self._lock:
+            if not self._fresh():
+                self._built_at = time.monotonic()  # changes during the load mark it stale again
+                result = await db.execute(
+                    sa.select(
+                        ProviderProfile.id,
+                        ProviderProfile.base_lat,
+                        ProviderProfile.base_lon,
+                        sa.func.coalesce(ProviderProfile.service_radius_km, 50),
+                    ).where(ProviderProfile.base_lat.is_not(None), ProviderProfile.base_lon.is_not(None))
+                )
+                rows = [(pid, float(la), float(lo), float(r)) for pid, la, lo, r in result.all()]
+                self._index = ProviderGridIndex.build(rows, self.cell_deg)
+                self.rebuilds += 1
+        return self._index
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "providers": len(self._index) if self._index is not None else 0,
+            "cells": len(self._index._cells) if self._index is not None else 0,
+            "age_seconds": round(time.monotonic() - self._built_at, 1) if self._index is not None else None,
+            "rebuilds": self.rebuilds,
+        }
+
+
+provider_locator = ProviderLocator(
+    ttl_seconds=settings.PROVIDER_INDEX_TTL_SECONDS,
+    cell_deg=settings.PROVIDER_INDEX_CELL_DEG,
+)
+metrics.register("provider_index", provider_locator.stats)
+pg_listener.subscribe(PROVIDER_CHANNEL, provider_locator.invalidate)
+
+
+def announce_provider_change(db: Session) -> None:
+    """Queue a NOTIFY in the current transaction; call provider_locator.invalidate() after commit."""
+    db.execute(notify_stmt(PROVIDER_CHANNEL, "1"))
@@ -0,0 +1,159 @@
+"""Background expiry of offered quotes past their expires_at.
+
+Every worker runs the loop, but each batch first takes a transaction-scoped
+advisory lock, so only one worker sweeps at a time and the others skip that
+round. A batch is one UPDATE ... RETURNING over at most
+QUOTE_EXPIRY_BATCH_SIZE rows picked through the partial index on offered
+quotes. Requests left with no live offer go back to 'open'.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..database import AsyncSessionLocal
+from ..models.workflow import Quote, QuoteStatus, RequestStatus, WorkRequest
+from ..utils import metrics
+
+log = logging.getLogger(__name__)
+
+# pg_try_advisory_xact_lock key; any constant unique within the database
+ADVISORY_LOCK_KEY = 0x71756F7465  # "quote"
+
+
+def is_lapsed(status: Any, expires_at: Optional[datetime]) -> bool:
+    """An offer past its expiry that the sweeper has not reached yet."""
+    return status == QuoteStatus.offered and expires_at is not None and expires_at <= datetime.now(timezone.utc)
+
+
+def live_status(quote: Dict[str, Any]) -> Dict[str, Any]:
+    """Report lapsed offers in a serialized quote as expired, so readers never act on them."""
+    if is_lapsed(quote.get("status"), quote.get("expires_at")):
+        quote["status"] = QuoteStatus.expired
+    return quote
+
+
+def expire_batch_stmt(batch_size: int) -> sa.Update:
+    overdue = (
+        sa.select(Quote.id)
+        .where(Quote.status == QuoteStatus.offered, Quote.expires_at <= sa.func.now())
+        .order_by(Quote.expires_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)  # don't wait on a quote being accepted right now
+    )
+    return (
+        sa.update(Quote)
+        .where(Quote.id.in_(overdue))
+        .values(status=QuoteStatus.expired, updated_at=sa.func.now())
+        .returning(Quote.id, Quote.request_id)
+    )
+
+
+def reopen_requests_stmt(request_ids: List[UUID]) -> sa.Update:
+    live_offer = sa.exists().where(Quote.request_id == WorkRequest.id, Quote.status == QuoteStatus.offered)
+    return (
+        sa.update(WorkRequest)
+        .where(WorkRequest.id.in_(request_ids), WorkRequest.status == RequestStatus.quoted, ~live_offer)
+        .values(status=RequestStatus.open, updated_at=sa.func.now())
+    )
+
+
+async def expire_batch(db: AsyncSession, batch_size: int) -> Optional[List[Tuple[UUID, UUID]]]:
+    """Expire one batch inside the caller's transaction; None when another worker holds the lock."""
+    locked = (await db.execute(sa.select(sa.func.pg_try_advisory_xact_lock(ADVISORY_LOCK_KEY)))).scalar()
+    if not locked:
+        return None
+    rows = [tuple(r) for r in (await db.execute(expire_batch_stmt(batch_size))).all()]
+    if rows:
+        await db.execute(reopen_requests_stmt(list({r[1] for r in rows})))
+    return rows
+
+
+class QuoteExpirySweeper:
+    def __init__(self, interval_seconds: float, batch_size: int, max_batches: int):
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+        self._task: Optional["asyncio.Task[None]"] = None
+        self.runs = 0
+        self.skipped = 0
+        self.errors = 0
+        self.expired_total = 0
+        self.last_run_expired = 0
+        self.last_run_batches = 0
+        self.last_run_ms = 0.0
+        self.last_run_at: Optional[float] = None
+
+    async def sweep(self) -> int:
+        """Expire overdue quotes in batches until none are left (or max_batches). Returns the count."""
+        started = time.perf_counter()
+        expired = batches = 0
+        while batches < self.max_batches:
+            async with AsyncSessionLocal() as db, db.begin():
+                rows = await expire_batch(db, self.batch_size)
+            if rows is None:
+                self.skipped += 1
+                break
+            batches += 1
+            expired += len(rows)
+            if len(rows) < self.batch_size:
+                break
+        self.runs += 1
+        self.expired_total += expired
+        self.last_run_expired = expired
+        self.last_run_batches = batches
+        self.last_run_ms = round((time.perf_counter() - started) * 1000, 2)
+        self.last_run_at = time.time()
+        if expired:
+            log.info("expired %d quotes in %d batches", expired, batches)
+        return expired
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.sweep()
+            except Exception:
+                self.errors += 1
+                log.warning("quote expiry sweep failed", exc_info=True)
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run(), name="quote-expiry")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None,
+            "interval_seconds": self.interval_seconds,
+            "runs": self.runs,
+            "skipped_locked": self.skipped,
+            "errors": self.errors,
+            "expired_total": self.expired_total,
+            "last_run_expired": self.last_run_expired,
+            "last_run_batches": self.last_run_batches,
+            "last_run_ms": self.last_run_ms,
+            "last_run_at": self.last_run_at,
+        }
+
+
+quote_expiry = QuoteExpirySweeper(
+    interval_seconds=settings.QUOTE_EXPIRY_INTERVAL_SECONDS,
+    batch_size=settings.QUOTE_EXPIRY_BATCH_SIZE,
+    max_batches=settings.QUOTE_EXPIRY_MAX_BATCHES,
+)
+metrics.register("quote_expiry", quote_expiry.stats)
@@ -0,0 +1,70 @@
+"""Who may read which work requests and quotes, as SQL predicates.
+
+A request is visible to its client, to the owner of the listing it was
+made on, and to providers the matcher paired it with. Quotes are narrower:
+the client reads every offer on their request, a provider only their own.
+`profiles` is anything with `client_id` / `provider_id`. Async routes pass a
+resolved ProfileIds (get_profile_ids): reading a lazy RequestProfiles may
+query the sync Session.
+
+`feed_select` is the provider's side of the same rule, split by how the
+request reached them, for feeds that page or count over one source.
+"""
+from typing import Any, Literal, Optional
+from uuid import UUID
+
+import sqlalchemy as sa
+
+from ..models.inventory import Listing
+from ..models.workflow import Quote, RequestMatch, WorkRequest
+
+
+def visible_requests(profiles: Any) -> sa.ColumnElement[bool]:
+    """Requests the caller may see: their own, those on their listings, or those they were matched to."""
+    conds = []
+    if profiles.client_id is not None:
+        conds.append(WorkRequest.client_id == profiles.client_id)
+    if profiles.provider_id is not None:
+        conds.append(WorkRequest.listing_id.in_(
+            sa.select(Listing.id).where(Listing.provider_id == profiles.provider_id)
+        ))
+        conds.append(WorkRequest.id.in_(
+            sa.select(RequestMatch.request_id).where(RequestMatch.provider_id == profiles.provider_id)
+        ))
+    return sa.or_(*conds) if conds else sa.false()
+
+
+def visible_quotes(profiles: Any) -> sa.ColumnElement[bool]:
+    """Quotes the caller may read: every quote on their own requests, otherwise only their own."""
+    conds = []
+    if profiles.client_id is not None:
+        conds.append(Quote.request_id.in_(
+            sa.select(WorkRequest.id).where(WorkRequest.client_id == profiles.client_id)
+        ))
+    if profiles.provider_id is not None:
+        conds.append(Quote.provider_id == profiles.provider_id)
+    return sa.or_(*conds) if conds else sa.false()
+
+
+FeedSource = Literal["listings", "matches"]
+
+
+def feed_select(source: FeedSource, provider_id: UUID, listing_id: Optional[UUID], *columns) -> sa.Select:
+    """`columns` over the provider's requests: on their listings, or those they were matched to."""
+    if source == "matches":
+        stmt = (
+            sa.select(*columns)
+            .select_from(WorkRequest)
+            .join(RequestMatch, sa.and_(
+                RequestMatch.request_id == WorkRequest.id, RequestMatch.provider_id == provider_id
+            ))
+            .outerjoin(Listing, Listing.id == WorkRequest.listing_id)
+        )
+        return stmt.where(RequestMatch.listing_id == listing_id) if listing_id is not None else stmt
+    stmt = (
+        sa.select(*columns)
+        .select_from(WorkRequest)
+        .join(Listing, Listing.id == WorkRequest.listing_id)
+        .where(Listing.provider_id == provider_id)
+    )
+    return stmt.where(Listing.id == listing_id) if listing_id is not None else stmt
@@ -0,0 +1,13 @@
+// Live updates over /events/stream, shared by the request pages.
+// The stream only carries events for the caller's own requests and quotes (and,
+// for providers, requests on their listings or matched to them).
+const LIVE_EVENTS = ["request.created","request.matched","quote.created","quote.withdrawn","quote.accepted","resync"];
+
+// Call onChange (debounced) whenever one of LIVE_EVENTS arrives
+function listenForChanges(token, onChange){
+  if (!window.EventSource || !token) return;
+  const es = new EventSource(`/api/v1/events/stream?token=${encodeURIComponent(token)}`);
+  let t = null;
+  const refresh = () => { clearTimeout(t); t = setTimeout(onChange, 250); };
+  LIVE_EVENTS.forEach(ev => es.addEventListener(ev, refresh));
+}
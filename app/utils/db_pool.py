@@ -0,0 +1,90 @@
+import threading
+import time
+from typing import Any, Dict, Type
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool
+
+from . import metrics
+
+
+class PoolStats:
+    def __init__(self):
+        self.wait_seconds = metrics.Histogram(metrics.LATENCY_BUCKETS)
+        self.timeouts = 0
+        self.pings = 0
+        self.ping_failures = 0
+        self._lock = threading.Lock()
+
+    def incr(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+
+def instrumented_pool_class(base: Type[Pool]) -> Type[Pool]:
+    """Subclass `base` so time spent waiting for a connection is recorded.
+
+    Stats live on the class, so they survive `pool.recreate()` after invalidation.
+    """
+    stats = PoolStats()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super(cls, self)._do_get()
+        except exc.TimeoutError:
+            stats.incr("timeouts")
+            raise
+        finally:
+            stats.wait_seconds.observe(time.perf_counter() - started)
+
+    cls = type(f"Instrumented{base.__name__}", (base,), {"_do_get": _do_get, "stats": stats})
+    return cls
+
+
+def install_idle_pre_ping(engine: Engine, idle_seconds: float) -> None:
+    """Ping only connections that sat idle in the pool longer than `idle_seconds`.
+
+    A failed ping raises DisconnectionError, which makes the pool discard the
+    connection and retry the checkout with a fresh one.
+    """
+    pool = engine.pool
+    stats: PoolStats = type(pool).stats
+
+    @event.listens_for(pool, "checkin")
+    def _mark_idle(dbapi_connection, connection_record):
+        connection_record.info["idle_since"] = time.monotonic()
+
+    @event.listens_for(pool, "checkout")
+    def _ping_if_idle(dbapi_connection, connection_record, connection_proxy):
+        idle_since = connection_record.info.get("idle_since")
+        if idle_since is None or time.monotonic() - idle_since < idle_seconds:
+            return
+        stats.incr("pings")
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("SELECT 1")
+        except Exception:
+            stats.incr("ping_failures")
+            raise exc.DisconnectionError()
+        finally:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+
+
+def pool_snapshot(engine: Engine) -> Dict[str, Any]:
+    pool = engine.pool
+    stats: PoolStats = type(pool).stats
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "timeouts": stats.timeouts,
+        "pings": stats.pings,
+        "ping_failures": stats.ping_failures,
+        "wait_seconds": stats.wait_seconds.snapshot(),
+    }
@@ -0,0 +1,174 @@
+"""Scoped change events for Server-Sent Events streams.
+
+Writers build an event with the scopes allowed to see it ("client:<profile
+id>", "provider:<profile id>"), queue it with `announce(db, event)` inside
+the transaction that made the change, and `event_broker.publish(event)`
+after commit. The local publish reaches this worker's subscribers at once;
+the NOTIFY on EVENTS_CHANNEL reaches every other worker through the
+PgListener. Events carry an id, so a worker that sees both copies delivers
+once.
+
+Delivery is best effort: a subscriber whose queue is full, or any subscriber
+after the listener reconnects, gets a "resync" event and should refetch.
+"""
+import asyncio
+import json
+import threading
+import uuid
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Iterable, Optional, Set
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+
+from . import metrics
+from .pgnotify import notify_stmt, pg_listener
+from .serialization import dumps
+
+EVENTS_CHANNEL = "app_events"
+RESYNC = "resync"
+
+
+def client_scope(client_id: Any) -> str:
+    return f"client:{client_id}"
+
+
+def provider_scope(provider_id: Any) -> str:
+    return f"provider:{provider_id}"
+
+
+def make_event(type_: str, scopes: Iterable[str], **data: Any) -> Dict[str, Any]:
+    return {"id": uuid.uuid4().hex, "type": type_, "scopes": sorted(set(scopes)), "data": data}
+
+
+def event_notify_stmt(event: Dict[str, Any]):
+    return notify_stmt(EVENTS_CHANNEL, dumps(event).decode())
+
+
+def announce(db: Session, event: Dict[str, Any]) -> None:
+    """Queue the cross-worker copy of `event` in the current transaction."""
+    db.execute(event_notify_stmt(event))
+
+
+class Subscription:
+    def __init__(self, scopes: Set[str], queue_size: int):
+        self.scopes = scopes
+        self.queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(maxsize=queue_size)
+        self.lagging = False
+
+
+class EventBroker:
+    def __init__(self, queue_size: int = 100, remember: int = 2048):
+        self.queue_size = queue_size
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._by_scope: Dict[str, Set[Subscription]] = defaultdict(set)
+        self._subs: Set[Subscription] = set()
+        self._seen: "OrderedDict[str, None]" = OrderedDict()  # recent event ids, for dedupe
+        self._remember = remember
+        self._lock = threading.Lock()
+        self.published = 0
+        self.delivered = 0
+        self.duplicates = 0
+        self.resyncs = 0
+
+    # -- subscribers (event loop only) ----------------------------------
+    def subscribe(self, scopes: Iterable[str]) -> Subscription:
+        self._loop = asyncio.get_running_loop()
+        sub = Subscription(set(scopes), self.queue_size)
+        self._subs.add(sub)
+        for scope in sub.scopes:
+            self._by_scope[scope].add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        self._subs.discard(sub)
+        for scope in sub.scopes:
+            subs = self._by_scope.get(scope)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._by_scope[scope]
+
+    # -- publishing (any thread) ----------------------------------------
+    def publish(self, event: Dict[str, Any]) -> None:
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return  # nobody has ever subscribed in this worker
+        self.published += 1
+        loop.call_soon_threadsafe(self._deliver, event)
+
+    def on_notify(self, payload: Optional[str]) -> None:
+        if payload is None:
+            # (re)connected: anything sent meanwhile is lost, have every stream refetch
+            self.publish({"id": uuid.uuid4().hex, "type": RESYNC, "scopes": None, "data": {}})
+            return
+        try:
+            self.publish(json.loads(payload))
+        except ValueError:
+            pass
+
+    def _first_sighting(self, event_id: str) -> bool:
+        with self._lock:
+            if event_id in self._seen:
+                return False
+            self._seen[event_id] = None
+            if len(self._seen) > self._remember:
+                self._seen.popitem(last=False)
+            return True
+
+    def _deliver(self, event: Dict[str, Any]) -> None:
+        if not self._first_sighting(event["id"]):
+            self.duplicates += 1
+            return
+        if event["scopes"] is None:
+            targets = set(self._subs)
+        else:
+            targets = set()
+            for scope in event["scopes"]:
+                targets |= self._by_scope.get(scope, set())
+        for sub in targets:
+            self._offer(sub, event)
+
+    def _offer(self, sub: Subscription, event: Dict[str, Any]) -> None:
+        if sub.lagging:
+            return  # a resync is already waiting at the head of the queue
+        try:
+            sub.queue.put_nowait(event)
+            self.delivered += 1
+        except asyncio.QueueFull:
+            # the client will refetch everything, so what is queued is moot
+            while not sub.queue.empty():
+                sub.queue.get_nowait()
+            sub.queue.put_nowait({"id": uuid.uuid4().hex, "type": RESYNC, "scopes": None, "data": {}})
+            sub.lagging = True
+            self.resyncs += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "subscribers": len(self._subs),
+            "scopes": len(self._by_scope),
+            "published": self.published,
+            "delivered": self.delivered,
+            "duplicates": self.duplicates,
+            "resyncs": self.resyncs,
+        }
+
+
+def sse_message(event: Dict[str, Any]) -> str:
+    """One text/event-stream message; scopes stay server-side."""
+    body = dumps({"type": event["type"], **event["data"]}).decode()
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {body}\n\n"
+
+
+def scopes_for(client_id: Optional[UUID], provider_id: Optional[UUID]) -> Set[str]:
+    scopes = set()
+    if client_id is not None:
+        scopes.add(client_scope(client_id))
+    if provider_id is not None:
+        scopes.add(provider_scope(provider_id))
+    return scopes
+
+
+event_broker = EventBroker()
+metrics.register("events", event_broker.stats)
+pg_listener.subscribe(EVENTS_CHANNEL, event_broker.on_notify)
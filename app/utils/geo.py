@@ -0,0 +1,32 @@
+from typing import Any, Optional, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088  # mean Earth radius (IUGG)
+KM_PER_DEG_LAT = 111.195
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Great-circle distance in km; arguments broadcast like NumPy arrays."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=float)) for v in (lat1, lon1, lat2, lon2))
+    a = (
+        np.sin((lat2 - lat1) / 2.0) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2.0) ** 2
+    )
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def point_latlon(point: Any) -> Optional[Tuple[float, float]]:
+    """(lat, lon) from a GeoJSON Point (or a Feature wrapping one); None if unusable."""
+    if not isinstance(point, dict):
+        return None
+    if point.get("type") == "Feature":
+        point = point.get("geometry") or {}
+    coords = point.get("coordinates") if point.get("type") == "Point" else None
+    try:
+        lon, lat = float(coords[0]), float(coords[1])
+    except (TypeError, ValueError, IndexError):
+        return None
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
+        return None
+    return lat, lon
@@ -0,0 +1,159 @@
+"""Incremental readers for GeoJSON uploads (FeatureCollection or newline-delimited Features).
+
+Both readers take the request body chunk by chunk and only ever hold the
+feature currently being read, so uploads of any size stream through.
+"""
+import json
+import re
+from typing import AsyncIterator, List, Tuple, Union
+
+# Structural bytes; UTF-8 continuation bytes never collide with these ASCII values
+_STRUCT = re.compile(rb'[\[\]{}"\\]')
+# directly inside the features array commas matter too: they end elements of any type
+_ELEMENTS = re.compile(rb'[\[\]{}",\\]')
+
+
+class StreamFormatError(ValueError):
+    """The upload cannot be read as GeoJSON at all (as opposed to one bad feature)."""
+
+
+class FeatureArraySplitter:
+    """Splits the top-level `features` array of a FeatureCollection into raw element bytes.
+
+    Every element is returned, objects or not, so a stray number or string
+    still takes its place in the feature numbering.
+    """
+
+    def __init__(self, max_feature_bytes: int):
+        self.max_feature_bytes = max_feature_bytes
+        self.buf = bytearray()
+        self.pos = 0
+        self.depth = 0
+        self.in_string = False
+        self.string_start = 0
+        self.last_key = b""
+        self.in_features = False
+        self.done = False
+        self.elem_start = -1
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        if self.done:
+            return []
+        self.buf += chunk
+        out: List[bytes] = []
+        buf = self.buf
+        while True:
+            top = self.in_features and self.depth == 2 and not self.in_string
+            m = (_ELEMENTS if top else _STRUCT).search(buf, self.pos)
+            if m is None:
+                self.pos = len(buf)
+                break
+            i, c = m.start(), buf[m.start()]
+            if self.in_string:
+                if c == 0x5C:  # backslash: skip the escaped byte (may be in the next chunk)
+                    if i + 1 >= len(buf):
+                        self.pos = i
+                        break
+                    self.pos = i + 2
+                    continue
+                if c == 0x22:
+                    self.in_string = False
+                    if self.depth == 1:
+                        self.last_key = bytes(buf[self.string_start + 1:i])
+                self.pos = i + 1
+                continue
+
+            if c == 0x22:
+                self.in_string = True
+                self.string_start = i
+            elif c == 0x2C:  # , (only searched for between elements)
+                self._element(i, out)
+                self.elem_start = i + 1
+            elif c in (0x7B, 0x5B):  # { [
+                if self.depth == 0 and c != 0x7B:
+                    raise StreamFormatError("expected a FeatureCollection object")
+                if self.depth == 1 and c == 0x5B and self.last_key == b"features":
+                    self.in_features = True
+                    self.elem_start = i + 1
+                self.depth += 1
+            else:  # } ]
+                self.depth -= 1
+                if self.depth < 0:
+                    raise StreamFormatError("unbalanced brackets")
+                if self.in_features and self.depth == 1:
+                    self._element(i, out)
+                    self.elem_start = -1
+                    self.in_features = False
+                    self.done = True
+                    self.pos = i + 1
+                    break
+            self.pos = i + 1
+
+        # drop everything that no longer belongs to a pending element or key
+        keep_from = self.elem_start if self.elem_start >= 0 else (
+            self.string_start if self.in_string else self.pos
+        )
+        if keep_from > 0:
+            del self.buf[:keep_from]
+            self.pos -= keep_from
+            self.string_start -= keep_from
+            if self.elem_start >= 0:
+                self.elem_start -= keep_from
+        if self.elem_start >= 0 and len(self.buf) - self.elem_start > self.max_feature_bytes:
+            raise StreamFormatError(f"a feature exceeds {self.max_feature_bytes} bytes")
+        if not self.in_features and not self.done and len(self.buf) > self.max_feature_bytes:
+            raise StreamFormatError("no features array found")
+        return out
+
+    def _element(self, end: int, out: List[bytes]) -> None:
+        raw = bytes(self.buf[self.elem_start:end]).strip()
+        if raw:
+            out.append(raw)
+
+    def close(self) -> None:
+        if not self.done:
+            raise StreamFormatError("upload ended before the features array was closed")
+
+
+FeatureOrError = Union[dict, Exception]
+
+
+def _decode(raw: bytes) -> FeatureOrError:
+    try:
+        obj = json.loads(raw)
+    except ValueError as e:
+        return e
+    if not isinstance(obj, dict) or obj.get("type") != "Feature":
+        return ValueError("not a GeoJSON Feature")
+    return obj
+
+
+async def iter_features(
+    chunks: AsyncIterator[bytes], ndjson: bool, max_feature_bytes: int
+) -> AsyncIterator[Tuple[int, FeatureOrError]]:
+    """Yield (index, Feature or per-feature error) as the upload streams in."""
+    index = 0
+    if ndjson:
+        pending = bytearray()
+        async for chunk in chunks:
+            pending += chunk
+            *lines, rest = pending.split(b"\n")
+            pending = bytearray(rest)
+            if len(pending) > max_feature_bytes:
+                raise StreamFormatError(f"a feature exceeds {max_feature_bytes} bytes")
+            for line in lines:
+                line = line.strip().lstrip(b"\x1e")  # tolerate RFC 8142 record separators
+                if line:
+                    yield index, _decode(line)
+                    index += 1
+        tail = bytes(pending).strip().lstrip(b"\x1e")
+        if tail:
+            yield index, _decode(tail)
+        return
+
+    splitter = FeatureArraySplitter(max_feature_bytes)
+    async for chunk in chunks:
+        for raw in splitter.feed(chunk):
+            yield index, _decode(raw)
+            index += 1
+    splitter.close()
@@ -0,0 +1,257 @@
+"""Server-side geometry for field boundaries (GeoJSON Polygon / MultiPolygon, WGS84).
+
+Ring math is done on NumPy arrays. Area uses the same spherical formula as
+turf.js (Chamberlain & Duquette), so server and browser numbers agree.
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+WGS84_RADIUS_M = 6378137.0  # turf.js earthRadius for area
+_SEGMENT_CHUNK = 512
+
+
+class GeometryError(ValueError):
+    """Invalid or unsupported field geometry."""
+
+
+@dataclass
+class FieldGeometry:
+    area_ha: float
+    centroid: Dict[str, Any]  # GeoJSON Point
+    bbox: List[float]         # [min_lon, min_lat, max_lon, max_lat]
+
+
+def extract_geometry(geojson: Any) -> Dict[str, Any]:
+    """Return the geometry object of a Feature, or the object itself if it already is one."""
+    if not isinstance(geojson, dict):
+        raise GeometryError("geojson must be an object")
+    geom = geojson.get("geometry") if geojson.get("type") == "Feature" else geojson
+    if not isinstance(geom, dict) or geom.get("type") not in ("Polygon", "MultiPolygon"):
+        raise GeometryError("geometry must be a Polygon or MultiPolygon")
+    return geom
+
+
+def polygons_of(geom: Dict[str, Any]) -> List[List[np.ndarray]]:
+    """Polygons as lists of validated rings, each an (n, 2) array of lon/lat."""
+    coords = geom.get("coordinates")
+    raw = [coords] if geom["type"] == "Polygon" else coords
+    if not isinstance(raw, list) or not raw:
+        raise GeometryError("geometry has no coordinates")
+    polygons = []
+    for p, poly in enumerate(raw):
+        if not isinstance(poly, list) or not poly:
+            raise GeometryError(f"polygon {p} has no rings")
+        polygons.append([_ring(r, f"polygon {p} ring {i}") for i, r in enumerate(poly)])
+    return polygons
+
+
+def _ring(raw: Any, where: str) -> np.ndarray:
+    try:
+        ring = np.asarray(raw, dtype=float)
+    except (TypeError, ValueError):
+        raise GeometryError(f"{where}: positions must be numeric")
+    if ring.ndim != 2 or ring.shape[1] < 2:
+        raise GeometryError(f"{where}: expected a list of [lon, lat] positions")
+    ring = ring[:, :2]
+    if not np.isfinite(ring).all():
+        raise GeometryError(f"{where}: non-finite coordinate")
+    if (np.abs(ring[:, 0]) > 180).any() or (np.abs(ring[:, 1]) > 90).any():
+        raise GeometryError(f"{where}: coordinate out of lon/lat range")
+    if len(ring) < 4:
+        raise GeometryError(f"{where}: a ring needs at least 4 positions")
+    if not np.array_equal(ring[0], ring[-1]):
+        raise GeometryError(f"{where}: ring is not closed")
+    return ring
+
+
+def ring_area_m2(ring: np.ndarray) -> float:
+    """Unsigned spherical area of a closed ring in m²."""
+    lon = np.radians(ring[:-1, 0])
+    lat = np.radians(ring[:-1, 1])
+    # sum over vertices of (lon[i+1] - lon[i-1]) * sin(lat[i])
+    total = np.sum((np.roll(lon, -1) - np.roll(lon, 1)) * np.sin(lat))
+    return abs(total) * WGS84_RADIUS_M ** 2 / 2.0
+
+
+def polygon_area_m2(rings: List[np.ndarray]) -> float:
+    return max(0.0, ring_area_m2(rings[0]) - sum(ring_area_m2(h) for h in rings[1:]))
+
+
+def _ring_planar_moments(ring: np.ndarray, kx: float):
+    """Signed shoelace area and first moments of a ring in a local equirectangular plane."""
+    x, y = ring[:, 0] * kx, ring[:, 1]
+    cross = x[:-1] * y[1:] - x[1:] * y[:-1]
+    a = cross.sum() / 2.0
+    cx = ((x[:-1] + x[1:]) * cross).sum() / 6.0
+    cy = ((y[:-1] + y[1:]) * cross).sum() / 6.0
+    return a, cx, cy
+
+
+def centroid_point(polygons: List[List[np.ndarray]]) -> Dict[str, Any]:
+    """Area-weighted centroid (holes subtracted) as a GeoJSON Point."""
+    all_pts = np.concatenate([r for poly in polygons for r in poly])
+    kx = float(np.cos(np.radians(all_pts[:, 1].mean())))
+    area = mx = my = 0.0
+    for poly in polygons:
+        for i, ring in enumerate(poly):
+            a, cx, cy = _ring_planar_moments(ring, kx)
+            # orient: shell counts positive, holes negative, whatever the winding
+            sign = (1.0 if i == 0 else -1.0) * (1.0 if a >= 0 else -1.0)
+            area += sign * a
+            mx += sign * cx
+            my += sign * cy
+    if abs(area) < 1e-18:
+        lon, lat = all_pts[:, 0].mean(), all_pts[:, 1].mean()
+    else:
+        lon, lat = mx / area / kx, my / area
+    return {"type": "Point", "coordinates": [round(float(lon), 7), round(float(lat), 7)]}
+
+
+def bbox_of(polygons: List[List[np.ndarray]]) -> List[float]:
+    pts = np.concatenate([r for poly in polygons for r in poly])
+    return [float(pts[:, 0].min()), float(pts[:, 1].min()), float(pts[:, 0].max()), float(pts[:, 1].max())]
+
+
+def _orient(ax, ay, bx, by, cx, cy):
+    return np.sign((bx - ax) * (cy - ay) - (by - ay) * (cx - ax))
+
+
+def find_self_intersection(rings: List[np.ndarray]) -> Optional[tuple]:
+    """First pair of crossing segments among a polygon's rings, or None.
+
+    Segments are sorted by min x so each one is only paired with segments whose
+    x-extent overlaps it (found with searchsorted), then the surviving pairs get
+    vectorised orientation tests. Neighbouring segments of a ring share a vertex
+    by construction and are skipped.
+    """
+    starts, ends, ring_id, seg_idx, ring_len = [], [], [], [], []
+    for r, ring in enumerate(rings):
+        n = len(ring) - 1
+        starts.append(ring[:-1])
+        ends.append(ring[1:])
+        ring_id.append(np.full(n, r))
+        seg_idx.append(np.arange(n))
+        ring_len.append(np.full(n, n))
+    p, q = np.concatenate(starts), np.concatenate(ends)
+    rid, sidx, rlen = np.concatenate(ring_id), np.concatenate(seg_idx), np.concatenate(ring_len)
+
+    min_x, max_x = np.minimum(p[:, 0], q[:, 0]), np.maximum(p[:, 0], q[:, 0])
+    min_y, max_y = np.minimum(p[:, 1], q[:, 1]), np.maximum(p[:, 1], q[:, 1])
+    order = np.argsort(min_x, kind="stable")
+    sorted_min_x = min_x[order]
+    # in sorted order, segment k can only meet segments k+1 .. upper[k]-1
+    upper = np.searchsorted(sorted_min_x, max_x[order], side="right")
+
+    for lo in range(0, len(order), _SEGMENT_CHUNK):
+        k = np.arange(lo, min(lo + _SEGMENT_CHUNK, len(order)))
+        counts = np.maximum(upper[k] - k - 1, 0)
+        if not counts.any():
+            continue
+        first = np.repeat(k, counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        i, j = order[first], order[first + 1 + offsets]
+
+        keep = (min_y[i] <= max_y[j]) & (min_y[j] <= max_y[i])
+        gap = np.abs(sidx[i] - sidx[j])
+        keep &= ~((rid[i] == rid[j]) & ((gap <= 1) | (gap == rlen[i] - 1)))
+        i, j = i[keep], j[keep]
+        if not i.size:
+            continue
+
+        o1 = _orient(p[i, 0], p[i, 1], q[i, 0], q[i, 1], p[j, 0], p[j, 1])
+        o2 = _orient(p[i, 0], p[i, 1], q[i, 0], q[i, 1], q[j, 0], q[j, 1])
+        o3 = _orient(p[j, 0], p[j, 1], q[j, 0], q[j, 1], p[i, 0], p[i, 1])
+        o4 = _orient(p[j, 0], p[j, 1], q[j, 0], q[j, 1], q[i, 0], q[i, 1])
+        hits = np.flatnonzero((o1 * o2 < 0) & (o3 * o4 < 0))
+        if hits.size:
+            a, b = sorted((int(i[hits[0]]), int(j[hits[0]])))
+            return a, b
+    return None
+
+
+def compute_field_geometry(geojson: Any, check_intersections: bool = True) -> FieldGeometry:
+    """Validate a field boundary and derive area (ha), centroid and bbox from it."""
+    polygons = polygons_of(extract_geometry(geojson))
+    if check_intersections:
+        for p, rings in enumerate(polygons):
+            hit = find_self_intersection(rings)
+            if hit is not None:
+                raise GeometryError(f"polygon {p} self-intersects (segments {hit[0]} and {hit[1]})")
+    area_m2 = sum(polygon_area_m2(rings) for rings in polygons)
+    if area_m2 <= 0:
+        raise GeometryError("geometry has zero area")
+    return FieldGeometry(
+        area_ha=round(float(area_m2) / 10_000.0, 4),
+        centroid=centroid_point(polygons),
+        bbox=bbox_of(polygons),
+    )
+
+
+# ---------------------------------------------------------------------------
+# Simplification (Douglas-Peucker) for list/overview rendering
+# ---------------------------------------------------------------------------
+M_PER_DEG = 111195.0
+
+# detail level -> tolerance in metres
+SIMPLIFY_LEVELS: Dict[str, float] = {"high": 1.0, "medium": 5.0, "low": 25.0}
+
+
+def _dp_keep(xy: np.ndarray, tolerance: float) -> np.ndarray:
+    """Boolean mask of the points Douglas-Peucker keeps on an open polyline."""
+    n = len(xy)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        lo, hi = stack.pop()
+        if hi - lo < 2:
+            continue
+        a, b = xy[lo], xy[hi]
+        seg = b - a
+        pts = xy[lo + 1:hi] - a
+        seg_len = float(np.hypot(*seg))
+        if seg_len == 0.0:
+            dist = np.hypot(pts[:, 0], pts[:, 1])
+        else:
+            dist = np.abs(seg[0] * pts[:, 1] - seg[1] * pts[:, 0]) / seg_len
+        k = int(np.argmax(dist))
+        if dist[k] > tolerance:
+            mid = lo + 1 + k
+            keep[mid] = True
+            stack.append((lo, mid))
+            stack.append((mid, hi))
+    return keep
+
+
+def simplify_ring(ring: np.ndarray, tolerance_m: float) -> np.ndarray:
+    """Simplify a closed ring; rings that would degenerate are returned unchanged."""
+    kx = float(np.cos(np.radians(ring[:, 1].mean())))
+    xy = np.column_stack((ring[:, 0] * kx, ring[:, 1])) * M_PER_DEG
+    # split the loop at the vertex farthest from the start so both halves are open polylines
+    far = int(np.argmax(np.hypot(*(xy[:-1] - xy[0]).T)))
+    if far == 0:
+        return ring
+    keep = np.zeros(len(ring), dtype=bool)
+    keep[:far + 1] |= _dp_keep(xy[:far + 1], tolerance_m)
+    keep[far:] |= _dp_keep(xy[far:], tolerance_m)
+    out = ring[keep]
+    return out if len(out) >= 4 else ring
+
+
+def simplify_geometry(geom: Dict[str, Any], tolerance_m: float) -> Dict[str, Any]:
+    polygons = polygons_of(geom)
+    simplified = [
+        [np.round(simplify_ring(r, tolerance_m), 7).tolist() for r in rings]
+        for rings in polygons
+    ]
+    if geom["type"] == "Polygon":
+        return {"type": "Polygon", "coordinates": simplified[0]}
+    return {"type": "MultiPolygon", "coordinates": simplified}
+
+
+def simplified_variants(geojson: Any) -> Dict[str, Dict[str, Any]]:
+    """Geometry per SIMPLIFY_LEVELS detail level, for storage next to the original."""
+    geom = extract_geometry(geojson)
+    return {level: simplify_geometry(geom, tol) for level, tol in SIMPLIFY_LEVELS.items()}
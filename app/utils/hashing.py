@@ -0,0 +1,176 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import BrokenExecutor, Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from ..config import settings
+from . import metrics
+from .security import get_password_hash, verify_password
+
+
+class HasherBusy(Exception):
+    """Raised when the password hashing pool is saturated; mapped to 503."""
+
+
+# Executed inside the pool: return the result together with the pure bcrypt time.
+def _timed(fn: Callable[..., Any], *args: Any) -> Tuple[Any, float]:
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+class PasswordHasher:
+    """Runs bcrypt on a dedicated, size-limited pool.
+
+    At most `max_pending` calls may be in flight (running or queued); further
+    callers are rejected immediately. `hash` / `verify` are awaited, so a
+    waiting caller holds no thread; `*_sync` block the calling thread. A call
+    that times out keeps its slot until the pool finishes or drops it.
+    """
+
+    def __init__(self, workers: int, max_pending: int, timeout: float, mode: str = "process"):
+        self.workers = workers
+        self.max_pending = max(max_pending, workers)
+        self.timeout = timeout
+        self.mode = mode
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.restarts = 0
+        self.wait_seconds = metrics.Histogram(metrics.LATENCY_BUCKETS)
+        self.hash_seconds = metrics.Histogram(metrics.LATENCY_BUCKETS)
+
+    def _get_executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.mode == "process":
+                    # spawn: forking a threaded server process is not safe
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pwhash")
+            return self._executor
+
+    def _release(self, _future: Any = None) -> None:
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def _discard(self, executor: Executor) -> None:
+        """Drop a broken pool; the next call starts a fresh one."""
+        with self._lock:
+            if self._executor is not executor:
+                return  # another caller already replaced it
+            self._executor = None
+            self.restarts += 1
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, fn: Callable[..., Any], *args: Any) -> Tuple[Future, Executor]:
+        """Admit one call and hand it to the pool; the slot is held until the job itself ends."""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HasherBusy()
+        with self._lock:
+            self.in_flight += 1
+        executor = self._get_executor()
+        try:
+            future = executor.submit(_timed, fn, *args)
+        except BrokenExecutor:
+            self._release()
+            self._discard(executor)
+            raise HasherBusy()
+        except BaseException:
+            self._release()
+            raise
+        # not until the caller gives up on it: a timed-out job still occupies a worker
+        future.add_done_callback(self._release)
+        return future, executor
+
+    def _timed_out(self) -> HasherBusy:
+        with self._lock:
+            self.timeouts += 1
+        return HasherBusy()
+
+    def _done(self, started: float, result: Any, spent: float) -> Any:
+        self.hash_seconds.observe(spent)
+        self.wait_seconds.observe(max(0.0, time.perf_counter() - started - spent))
+        return result
+
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Await the job on the event loop; no thread waits for bcrypt."""
+        started = time.perf_counter()
+        future, executor = self._submit(fn, *args)
+        try:
+            result, spent = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            raise self._timed_out()
+        except BrokenExecutor:
+            # a worker process died (OOM kill, crash): every job on this pool fails
+            self._discard(executor)
+            raise HasherBusy()
+        return self._done(started, result, spent)
+
+    def _run_sync(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Blocks the calling thread until the job ends; for scripts and sync callers."""
+        started = time.perf_counter()
+        future, executor = self._submit(fn, *args)
+        try:
+            result, spent = future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise self._timed_out()
+        except BrokenExecutor:
+            self._discard(executor)
+            raise HasherBusy()
+        return self._done(started, result, spent)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+
+    async def verify(self, plain: str, hashed: str) -> bool:
+        return await self._run(verify_password, plain, hashed)
+
+    def hash_sync(self, password: str) -> str:
+        return self._run_sync(get_password_hash, password)
+
+    def verify_sync(self, plain: str, hashed: str) -> bool:
+        return self._run_sync(verify_password, plain, hashed)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            in_flight = self.in_flight
+            rejected, timeouts, restarts = self.rejected, self.timeouts, self.restarts
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "in_flight": in_flight,
+            "queue_depth": max(0, in_flight - self.workers),
+            "rejected": rejected,
+            "timeouts": timeouts,
+            "restarts": restarts,
+            "wait_seconds": self.wait_seconds.snapshot(),
+            "hash_seconds": self.hash_seconds.snapshot(),
+        }
+
+
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+    timeout=settings.PASSWORD_HASH_TIMEOUT_SECONDS,
+    mode=settings.PASSWORD_HASH_EXECUTOR,
+)
+metrics.register("password_hasher", password_hasher.stats)
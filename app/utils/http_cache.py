@@ -0,0 +1,164 @@
+"""In-memory response cache for anonymous, read-mostly GET endpoints.
+
+Keys are (namespace, namespace version, path, sorted query). Writers bump a
+namespace's version instead of hunting down keys: old entries simply stop
+being addressed and age out of the LRU. Versions are per worker; bumps reach
+the other workers through NOTIFY on HTTP_CACHE_CHANNEL.
+
+Every response gets a strong ETag (hash of the body) and Cache-Control with
+stale-while-revalidate. Within `max_age` entries are served as is; for
+`stale_seconds` after that they are still served while one background task
+recomputes them. Concurrent misses for the same key share one computation.
+"""
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, NamedTuple, Optional, Tuple
+
+from sqlalchemy.orm import Session
+from starlette.requests import Request
+from starlette.responses import Response
+
+from ..config import settings
+from . import metrics
+from .cache import TTLCache
+from .pgnotify import notify_stmt, pg_listener
+from .serialization import dumps
+
+log = logging.getLogger(__name__)
+
+HTTP_CACHE_CHANNEL = "http_cache"
+
+# returns (JSON-able payload, extra response headers)
+Producer = Callable[[], Awaitable[Tuple[Any, Dict[str, str]]]]
+
+
+class CachedBody(NamedTuple):
+    body: bytes
+    etag: str
+    headers: Dict[str, str]
+    stored_at: float
+
+
+def strong_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so a W/ prefix still matches
+    return any(t.strip().removeprefix("W/") == etag for t in if_none_match.split(","))
+
+
+class ResponseCache:
+    def __init__(self, maxsize: int):
+        self._entries = TTLCache(maxsize=maxsize, ttl=3600.0)
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._inflight: Dict[tuple, "asyncio.Future[CachedBody]"] = {}
+        self._refreshing: Dict[tuple, "asyncio.Task[None]"] = {}  # strong refs keep tasks alive
+        self.served = {"hit": 0, "stale": 0, "miss": 0, "not_modified": 0}
+
+    # -- versions -------------------------------------------------------
+    def bump(self, *namespaces: str) -> None:
+        with self._lock:
+            for ns in namespaces or tuple(self._versions):
+                self._versions[ns] = self._versions.get(ns, 0) + 1
+
+    def on_notify(self, payload: Optional[str]) -> None:
+        self.bump(*(payload.split(",") if payload else ()))
+
+    def key(self, namespace: str, request: Request) -> tuple:
+        query = tuple(sorted(request.query_params.multi_items()))
+        with self._lock:
+            version = self._versions.setdefault(namespace, 0)
+        return namespace, version, request.url.path, query
+
+    # -- serving --------------------------------------------------------
+    async def _compute(self, key: tuple, produce: Producer, ttl: float) -> CachedBody:
+        payload, headers = await produce()
+        body = dumps(payload)
+        entry = CachedBody(body, strong_etag(body), headers, time.monotonic())
+        self._entries.set(key, entry, ttl=ttl)
+        return entry
+
+    async def _shared_compute(self, key: tuple, produce: Producer, ttl: float) -> CachedBody:
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            entry = await self._compute(key, produce, ttl)
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else was waiting
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        else:
+            future.set_result(entry)
+            return entry
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _refresh(self, key: tuple, produce: Producer, ttl: float) -> None:
+        try:
+            await self._compute(key, produce, ttl)
+        except Exception:
+            log.warning("background refresh of %s failed", key[2], exc_info=True)
+        finally:
+            self._refreshing.pop(key, None)
+
+    async def respond(
+        self,
+        request: Request,
+        namespace: str,
+        produce: Producer,
+        max_age: float,
+        stale_seconds: float,
+    ) -> Response:
+        """Serve `produce()`'s payload from the cache when possible. `produce` must not use request-scoped state."""
+        key = self.key(namespace, request)
+        ttl = max_age + stale_seconds
+        entry: Optional[CachedBody] = self._entries.get(key)
+        if entry is None:
+            entry = await self._shared_compute(key, produce, ttl)
+            state = "miss"
+        elif time.monotonic() - entry.stored_at > max_age:
+            state = "stale"
+            if key not in self._refreshing:
+                self._refreshing[key] = asyncio.get_running_loop().create_task(self._refresh(key, produce, ttl))
+        else:
+            state = "hit"
+
+        headers = {
+            "ETag": entry.etag,
+            "Cache-Control": f"public, max-age={int(max_age)}, stale-while-revalidate={int(stale_seconds)}",
+            "X-Cache": state.upper(),
+            **entry.headers,
+        }
+        if etag_matches(request.headers.get("if-none-match"), entry.etag):
+            self.served["not_modified"] += 1
+            return Response(status_code=304, headers=headers)
+        self.served[state] += 1
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._entries.stats(), "versions": dict(self._versions), "served": dict(self.served)}
+
+
+def announce(db: Session, *namespaces: str) -> None:
+    """Queue the cross-worker version bump in the current transaction; bump locally after commit."""
+    db.execute(notify_stmt(HTTP_CACHE_CHANNEL, ",".join(namespaces)))
+
+
+public_cache = ResponseCache(maxsize=settings.HTTP_CACHE_MAXSIZE)
+metrics.register("http_cache", public_cache.stats)
+pg_listener.subscribe(HTTP_CACHE_CHANNEL, public_cache.on_notify)
@@ -0,0 +1,51 @@
+import bisect
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+# name -> zero-arg callable returning a JSON-serialisable snapshot
+_sources: Dict[str, Callable[[], Any]] = {}
+
+
+def register(name: str, source: Callable[[], Any]) -> None:
+    _sources[name] = source
+
+
+def collect() -> Dict[str, Any]:
+    return {name: source() for name, source in _sources.items()}
+
+
+class Histogram:
+    """Cumulative bucket histogram (Prometheus-style `le` buckets)."""
+
+    def __init__(self, buckets: Iterable[float]):
+        self.buckets: Tuple[float, ...] = tuple(sorted(buckets))
+        self._counts: List[int] = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[idx] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        cumulative, buckets = 0, {}
+        for bound, n in zip(self.buckets, counts):
+            cumulative += n
+            buckets[f"le_{bound:g}"] = cumulative
+        buckets["le_inf"] = count
+        return {
+            "count": count,
+            "sum": round(total, 6),
+            "avg": round(total / count, 6) if count else None,
+            "buckets": buckets,
+        }
+
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
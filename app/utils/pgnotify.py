@@ -0,0 +1,114 @@
+"""Cross-worker signals over Postgres LISTEN/NOTIFY.
+
+Writers add `notify_stmt(channel, payload)` to the transaction that changed
+the data, so the signal is only delivered if that transaction commits. Each
+worker runs one PgListener thread on a dedicated autocommit connection and
+hands every notification to the callbacks subscribed to its channel.
+"""
+import logging
+import select
+import threading
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional
+
+import sqlalchemy as sa
+
+from . import metrics
+
+log = logging.getLogger(__name__)
+
+# payload is None after a (re)connect: notifications may have been missed, drop everything
+Callback = Callable[[Optional[str]], None]
+
+
+def notify_stmt(channel: str, payload: str) -> sa.Select:
+    return sa.select(sa.func.pg_notify(channel, payload))
+
+
+class PgListener:
+    def __init__(self, poll_seconds: float = 1.0, reconnect_seconds: float = 5.0):
+        self.poll_seconds = poll_seconds
+        self.reconnect_seconds = reconnect_seconds
+        self._subscribers: Dict[str, List[Callback]] = defaultdict(list)
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.connected = False
+        self.received = 0
+        self.reconnects = 0
+        self.callback_errors = 0
+
+    def subscribe(self, channel: str, callback: Callback) -> None:
+        """Register before start(); channels are LISTENed to on connect."""
+        self._subscribers[channel].append(callback)
+
+    def start(self, conninfo: str, connect_kwargs: Optional[Dict[str, Any]] = None) -> None:
+        if self._thread is not None or not self._subscribers:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(conninfo, connect_kwargs or {}), name="pg-listener", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_seconds * 2)
+            self._thread = None
+
+    def _dispatch(self, channel: str, payload: Optional[str]) -> None:
+        for cb in self._subscribers.get(channel, ()):
+            try:
+                cb(payload)
+            except Exception:
+                self.callback_errors += 1
+                log.exception("LISTEN callback for %s failed", channel)
+
+    def _run(self, conninfo: str, connect_kwargs: Dict[str, Any]) -> None:
+        import psycopg
+        from psycopg import sql
+
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = psycopg.connect(conninfo, autocommit=True, **connect_kwargs)
+                conn.add_notify_handler(self._on_notify)
+                for channel in self._subscribers:
+                    conn.execute(sql.SQL("LISTEN {}").format(sql.Identifier(channel)))
+                self.connected = True
+                for channel in self._subscribers:
+                    self._dispatch(channel, None)
+                while not self._stop.is_set():
+                    ready, _, _ = select.select([conn.fileno()], [], [], self.poll_seconds)
+                    if ready:
+                        conn.execute("SELECT 1")  # reads pending input; psycopg runs the notify handler
+            except Exception:
+                if not self._stop.is_set():
+                    log.warning("LISTEN connection lost, retrying in %ss", self.reconnect_seconds, exc_info=True)
+            finally:
+                self.connected = False
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            if self._stop.wait(self.reconnect_seconds):
+                break
+            self.reconnects += 1
+
+    def _on_notify(self, n) -> None:
+        self.received += 1
+        self._dispatch(n.channel, n.payload)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "channels": sorted(self._subscribers),
+            "connected": self.connected,
+            "received": self.received,
+            "reconnects": self.reconnects,
+            "callback_errors": self.callback_errors,
+        }
+
+
+pg_listener = PgListener()
+metrics.register("pg_listener", pg_listener.stats)
@@ -13,10 +13,14 @@ def verify_password(plain: str, hashed: str) -> bool:
     return pwd_context.verify(plain, hashed)
 
 def create_access_token(subject: str | int, extra: Optional[Dict[str, Any]] = None,
-                        expires_minutes: int | None = None) -> str:
+                        expires_minutes: int | None = None,
+                        client_profile_id: Any = None, provider_profile_id: Any = None) -> str:
     now = datetime.now(timezone.utc)
     exp = now + timedelta(minutes=expires_minutes or settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     payload: Dict[str, Any] = {"sub": str(subject), "iat": int(now.timestamp()), "exp": int(exp.timestamp())}
+    # Profile ids let routes scope queries without looking the profile up again
+    payload["cpid"] = str(client_profile_id) if client_profile_id else None
+    payload["ppid"] = str(provider_profile_id) if provider_profile_id else None
     if extra:
         payload.update(extra)
     return jwt.encode(payload, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
@@ -0,0 +1,55 @@
+"""orjson responses for hot read paths.
+
+A route that returns a FastJSONResponse skips FastAPI's response_model
+validation and jsonable_encoder pass; rows go from SQLAlchemy straight to
+one orjson.dumps call. Keep response_model on the route for the docs.
+"""
+import decimal
+from typing import Any, Iterable, Sequence
+
+import orjson
+from pydantic import BaseModel
+from starlette.responses import Response
+
+# OPT_UTC_Z: UTC datetimes end in "Z", as pydantic writes them
+_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_UTC_Z
+
+
+def _default(obj: Any) -> Any:
+    # the same shapes the Read schemas produce: Numeric columns are floats
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=_OPTIONS)
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def schema_fields(schema: type) -> Sequence[str]:
+    """Attribute names to copy off ORM objects for a Read schema."""
+    return tuple(schema.model_fields)
+
+
+def orm_dict(obj: Any, fields: Sequence[str]) -> dict:
+    return {f: getattr(obj, f) for f in fields}
+
+
+def orm_json(objs: Any, fields: Sequence[str], status_code: int = 200) -> FastJSONResponse:
+    """One ORM object (or Row) or an iterable of them, as a JSON response limited to `fields`."""
+    if isinstance(objs, Iterable) and not hasattr(objs, "_mapping"):
+        content = [orm_dict(o, fields) for o in objs]
+    else:
+        content = orm_dict(objs, fields)
+    return FastJSONResponse(content, status_code=status_code)
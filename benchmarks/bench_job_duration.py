@@ -0,0 +1,59 @@
+"""Job hours for every machine of a provider against every open request.
+
+Runs without a database; machines and field areas are synthetic. The matrix
+from job_hours() is checked against a pair-by-pair loop over the same
+formula.
+
+    python -m benchmarks.bench_job_duration
+"""
+import random
+import statistics
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.services.job_duration import SETUP_HOURS, job_hours, machine_rate, work_hours
+
+ROUNDS = 20
+
+
+def make_machines(rng: random.Random, n: int):
+    return [
+        SimpleNamespace(
+            capacity_per_hour=rng.choice([None, None, rng.uniform(1, 8)]),
+            working_width_m=rng.choice([None, rng.uniform(2, 12)]),
+            power_hp=rng.choice([None, rng.uniform(60, 350)]),
+        )
+        for _ in range(n)
+    ]
+
+
+def pairwise(machines, areas):
+    out = []
+    for m in machines:
+        rate = machine_rate(m.capacity_per_hour, m.working_width_m, m.power_hp)
+        out.append([float(work_hours(rate, a, SETUP_HOURS)) if rate else np.nan for a in areas])
+    return np.array(out)
+
+
+def main() -> None:
+    rng = random.Random(5)
+    for m, n in ((10, 500), (50, 2000), (100, 3000)):
+        machines = make_machines(rng, m)
+        areas = [rng.choice([None, rng.lognormvariate(1.5, 1.0)]) for _ in range(n)]
+        timings = []
+        for _ in range(ROUNDS):
+            started = time.perf_counter()
+            hours = job_hours(machines, areas)
+            timings.append((time.perf_counter() - started) * 1000)
+        started = time.perf_counter()
+        expected = pairwise(machines, areas)
+        loop_ms = (time.perf_counter() - started) * 1000
+        assert np.allclose(hours, expected, equal_nan=True)
+        print(f"  {m:>3} machines x {n:>5} requests: {statistics.median(timings):7.2f} ms "
+              f"(pair-by-pair {loop_ms:8.1f} ms), {np.isfinite(hours).mean():.0%} known")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Matching one work request against 50k listings with MatchIndex.
+
+Runs without a database; listings and rules are synthetic, spread over
+Iberia in 40 categories. Every run is checked against a brute-force scan.
+
+    python -m benchmarks.bench_matching
+"""
+import random
+import statistics
+import time
+import uuid
+
+import numpy as np
+
+from app.services.matching import MatchIndex, MatchTarget
+from app.utils.geo import haversine_km
+
+LISTINGS = 50_000
+PROVIDERS = 12_000
+CATEGORIES = 40
+REQUESTS = 500
+CELL_DEG = 0.5
+LAT, LON = (36.5, 43.5), (-9.3, 3.0)
+
+
+def make_index(rng: random.Random) -> MatchIndex:
+    categories = [uuid.uuid4() for _ in range(CATEGORIES)]
+    providers = [(uuid.uuid4(), rng.uniform(*LAT), rng.uniform(*LON), rng.choice([25.0, 50.0, 80.0]))
+                 for _ in range(PROVIDERS)]
+    listings, rules = [], []
+    for _ in range(LISTINGS):
+        pid, lat, lon, radius = rng.choice(providers)
+        lid = uuid.uuid4()
+        cap = rng.choice([None, 1.5, 3.0, 6.0])
+        listings.append((lid, pid, rng.choice(categories), lat, lon, radius, cap))
+        rules.append((lid, "hectare", rng.uniform(30, 90), 2.0, 25.0, 1.1, "EUR"))
+        if rng.random() < 0.5:
+            rules.append((lid, "hour", rng.uniform(60, 140), None, None, 1.3, "EUR"))
+    started = time.perf_counter()
+    index = MatchIndex.build(listings, rules, CELL_DEG)
+    print(f"  build: {(time.perf_counter() - started) * 1000:.0f} ms for {LISTINGS:,} listings, {len(rules):,} rules")
+    return index, categories
+
+
+def brute_force_providers(index: MatchIndex, target: MatchTarget) -> set:
+    """Providers with a listing in the category that reaches the field, by scanning every listing."""
+    dist = haversine_km(target.lat, target.lon, index.lat, index.lon)
+    ok = (index.category == index.category_codes[target.category_id]) & (dist <= index.reach_km)
+    return {index.provider_ids[c] for c in np.unique(index.provider_code[ok]).tolist()}
+
+
+def main() -> None:
+    rng = random.Random(7)
+    print(f"MatchIndex, {LISTINGS:,} listings / {PROVIDERS:,} providers / {CATEGORIES} categories")
+    index, categories = make_index(rng)
+
+    timings, sizes = [], []
+    for _ in range(REQUESTS):
+        target = MatchTarget(rng.choice(categories), rng.uniform(*LAT), rng.uniform(*LON), rng.uniform(2, 60))
+        started = time.perf_counter()
+        matches = index.match(target, top_k=20)
+        timings.append((time.perf_counter() - started) * 1000)
+        sizes.append(len(matches))
+        # one listing per provider, all reachable, and the cell pre-filter loses nobody
+        expected = brute_force_providers(index, target)
+        got = [m["provider_id"] for m in matches]
+        assert len(set(got)) == len(got) and set(got) <= expected
+        assert len(got) == min(20, len(expected))
+        assert all(a["score"] >= b["score"] for a, b in zip(matches, matches[1:]))
+
+    timings.sort()
+    print(f"  match: median {statistics.median(timings):.2f} ms, p95 {timings[int(len(timings) * 0.95)]:.2f} ms, "
+          f"max {timings[-1]:.2f} ms over {REQUESTS} requests (avg {statistics.mean(sizes):.1f} providers matched)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Response serialization: FastAPI's default path vs FastJSONResponse, on 200-listing pages.
+
+Runs without a database; rows are transient ORM objects.
+
+    python -m benchmarks.bench_serialization
+"""
+import asyncio
+import datetime as dt
+import decimal
+import time
+import uuid
+from typing import Any, Dict, List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.api.v1.listings import shape_listing_base
+from app.models.inventory import Listing, ListingType, Machine
+from app.schemas.machine import MachineRead
+from app.services.pricing import CompiledRule, compile_listing
+from app.utils.serialization import FastJSONResponse, orm_json, schema_fields
+
+PAGE = 200
+ROUNDS = 200
+
+
+def make_listings(n: int) -> List[Listing]:
+    now = dt.datetime.now(dt.timezone.utc)
+    return [
+        Listing(
+            id=uuid.uuid4(), provider_id=uuid.uuid4(), type=ListingType.equipment,
+            ref_machine_id=uuid.uuid4(), title=f"Tractor {i} with 6 m disc harrow",
+            description="Well maintained, operator included. " * 4, status="active",
+            created_at=now, updated_at=now,
+        )
+        for i in range(n)
+    ]
+
+
+def make_machines(n: int) -> List[Machine]:
+    d = decimal.Decimal
+    return [
+        Machine(
+            id=uuid.uuid4(), provider_id=uuid.uuid4(), category_id=uuid.uuid4(), make="John Deere",
+            model=f"6R {i}", year=2019, power_hp=d("155.00"), working_width_m=d("6.00"),
+            capacity_per_hour=d("3.50"), hours_meter=d("1234.50"), is_road_legal=True,
+            telemetry_enabled=False, status="active",
+        )
+        for i in range(n)
+    ]
+
+
+def listing_page(listings: List[Listing]) -> List[Dict[str, Any]]:
+    page = []
+    for l in listings:
+        item = shape_listing_base(l)
+        compiled = compile_listing([
+            CompiledRule(uuid.uuid4(), l.id, "hectare", 45.0, 2.0, 30.0, 1.2, "EUR", {"weekend": 1.15}),
+            CompiledRule(uuid.uuid4(), l.id, "hour", 85.0, None, None, None, "EUR", None),
+        ])
+        item["pricing"] = compiled.prices
+        item["prices_text"] = compiled.summary
+        page.append(item)
+    return page
+
+
+def bench(label: str, fn) -> float:
+    fn()  # warm up
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        body = fn()
+    per_page_ms = (time.perf_counter() - started) / ROUNDS * 1000
+    print(f"  {label:<46} {per_page_ms:8.3f} ms/page  ({len(body):,} bytes)")
+    return per_page_ms
+
+
+_loop = asyncio.new_event_loop()
+
+
+def default_path(field, content) -> bytes:
+    # what FastAPI does for a route with response_model: validate, jsonable_encoder, JSONResponse
+    encoded = _loop.run_until_complete(serialize_response(field=field, response_content=content, is_coroutine=True))
+    return JSONResponse(encoded).body
+
+
+def main() -> None:
+    page = listing_page(make_listings(PAGE))
+    machines = make_machines(PAGE)
+
+    print(f"/listings (dict rows + pricing), {PAGE} per page")
+    dict_field = create_response_field(name="Response", type_=List[Dict[str, Any]])
+    assert default_path(dict_field, page) == FastJSONResponse(page).body  # same bytes on the wire
+    a = bench("response_model=List[Dict] (current)", lambda: default_path(dict_field, page))
+    b = bench("FastJSONResponse", lambda: FastJSONResponse(page).body)
+    print(f"  speed-up x{a / b:.1f}\n")
+
+    print(f"/machines (ORM -> MachineRead), {PAGE} per page")
+    machine_field = create_response_field(name="Response", type_=List[MachineRead])
+    fields = schema_fields(MachineRead)
+    assert default_path(machine_field, machines) == orm_json(machines, fields).body
+    a = bench("response_model=list[MachineRead] (current)", lambda: default_path(machine_field, machines))
+    b = bench("orm_json", lambda: orm_json(machines, fields).body)
+    print(f"  speed-up x{a / b:.1f}")
+
+
+if __name__ == "__main__":
+    main()
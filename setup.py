@@ -1,13 +1,63 @@
+from sqlalchemy import Enum, inspect, text
+from sqlalchemy.schema import CreateColumn
 from app.database import Base, engine
+from app.services.category_tree import notify_trigger_ddl
 from app.models import user  # ensure models are imported
 from app.models import profile as profile_model     # noqa
 from app.models import catalog as catalog_model     # <-- ADD
 from app.models import inventory as inventory_model # noqa
+from app.models import geo as geo_model             # noqa
+from app.models import workflow as workflow_model   # noqa
 
 Base.metadata.create_all(bind=engine)
 
 
+def ensure_columns():
+    """Add columns declared on existing tables (ADD COLUMN IF NOT EXISTS, so it is re-runnable)."""
+    insp = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not insp.has_table(table.name):
+                continue
+            existing = {c["name"] for c in insp.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN IF NOT EXISTS {ddl}'))
+
+
+def ensure_enum_values():
+    """create_all skips existing enum types, so add labels declared after they were created."""
+    enums = {c.type.name: c.type for t in Base.metadata.sorted_tables for c in t.columns
+             if isinstance(c.type, Enum) and c.type.name}
+    # ALTER TYPE ... ADD VALUE cannot be used in the transaction that adds it
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for name, enum in enums.items():
+            for label in enum.enums:
+                conn.execute(text(f"ALTER TYPE {name} ADD VALUE IF NOT EXISTS '{label}'"))
+
+
+def ensure_indexes():
+    """create_all skips existing tables, so add indexes declared after they were created."""
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
+
+
+def ensure_triggers():
+    """NOTIFY triggers that keep the workers' in-memory caches in step with direct table edits."""
+    with engine.begin() as conn:
+        for ddl in notify_trigger_ddl():
+            conn.execute(text(ddl))
+
+
 if __name__ == "__main__":
     print("📦 Creating tables in Postgres...")
     Base.metadata.create_all(bind=engine)
+    ensure_enum_values()
+    ensure_columns()
+    ensure_indexes()
+    ensure_triggers()
     print("✅ Done. Tables are ready.")